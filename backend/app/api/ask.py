@@ -1,10 +1,20 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import Any, Dict, Optional
+import asyncio
+import json
 import logging
 
-from app.core.dependencies import get_faiss_store
-from app.services.embedding_service import embed_texts
-from app.services.answer_service import generate_answer
+from app.core.dependencies import get_faiss_store_async, get_answer_cache
+from app.api.search import SearchMode, check_filters, check_mode
+from app.services.retrieval import retrieve
+from app.services.answer_service import (
+    RAGResponse,
+    generate_answer_async,
+    generate_answer_streaming,
+    chunk_token_counts,
+)
 
 # ✅ ROUTER MUST BE DEFINED FIRST
 router = APIRouter(prefix="/ask", tags=["Ask"])
@@ -13,6 +23,9 @@ logger = logging.getLogger(__name__)
 
 class AskRequest(BaseModel):
     question: str
+    # Restrict retrieval to matching chunks, same syntax as /search
+    filters: Optional[Dict[str, Any]] = None
+    mode: Optional[SearchMode] = None
 
 
 class AskResponse(BaseModel):
@@ -23,7 +36,7 @@ class AskResponse(BaseModel):
 
 
 @router.post("/", response_model=AskResponse)
-def ask_question(payload: AskRequest):
+async def ask_question(payload: AskRequest):
     logger.info(f"Received question: {payload.question[:100]}...")  # Log first 100 chars
     
     if not payload.question.strip():
@@ -36,9 +49,9 @@ def ask_question(payload: AskRequest):
             }
         )
 
-    faiss_store = get_faiss_store()
+    faiss_store = await get_faiss_store_async()
 
-    if len(faiss_store) == 0:
+    if faiss_store.is_empty():
         logger.warning("No documents indexed in FAISS store")
         raise HTTPException(
             status_code=400,
@@ -48,19 +61,39 @@ def ask_question(payload: AskRequest):
             }
         )
 
+    check_filters(faiss_store, payload.filters)
+    mode = check_mode(faiss_store, payload.mode)
+
     try:
-        query_embedding = embed_texts([payload.question])[0]
-        results = faiss_store.search(query_embedding, k=5)
+        # Nothing here holds a thread while waiting on OpenAI
+        results, query_embedding = await retrieve(
+            faiss_store, payload.question, k=5, filters=payload.filters, mode=mode
+        )
 
         context_chunks = [text for text, _, _ in results]
         sources_used = [meta.get("chunk_id", 0) for _, _, meta in results]
+        chunk_keys = [(meta.get("source"), meta.get("chunk_id")) for _, _, meta in results]
 
-        rag_response = generate_answer(
-            question=payload.question,
-            context_chunks=context_chunks
-        )
-        
-        logger.info(f"Generated answer with confidence: {rag_response.confidence}")
+        # Paraphrases of answered questions over the same chunks skip the LLM;
+        # lexical mode has no question embedding to match on. The cache is a
+        # locked FAISS index, so lookups and stores run on worker threads
+        answer_cache = get_answer_cache() if query_embedding is not None else None
+        rag_response = None
+        if answer_cache is not None:
+            rag_response = await asyncio.to_thread(answer_cache.lookup, query_embedding, chunk_keys)
+
+        if rag_response is None:
+            rag_response = await generate_answer_async(
+                question=payload.question,
+                context_chunks=context_chunks,
+                context_token_counts=chunk_token_counts([meta for _, _, meta in results])
+            )
+            if answer_cache is not None:
+                await asyncio.to_thread(
+                    answer_cache.store, query_embedding, payload.question, chunk_keys, rag_response
+                )
+
+            logger.info(f"Generated answer with confidence: {rag_response.confidence}")
 
         return {
             "answer": rag_response.answer,
@@ -78,3 +111,126 @@ def ask_question(payload: AskRequest):
                 "message": "Failed to generate answer"
             }
         )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _citations(rag_response: RAGResponse, results) -> list[dict]:
+    """Where each [Source N] in the answer came from."""
+    citations = []
+    for label, idx in enumerate(rag_response.sources_used, 1):
+        meta = results[idx][2]
+        citations.append({
+            "label": f"Source {label}",
+            "source": meta.get("source"),
+            "chunk_id": meta.get("chunk_id"),
+            "page_start": meta.get("page_start"),
+            "page_end": meta.get("page_end"),
+        })
+    return citations
+
+
+@router.post("/stream")
+async def ask_question_stream(payload: AskRequest):
+    """
+    Server-sent events version of ``/ask``: ``token`` events carry answer
+    text as it is generated, then one ``done`` event carries the citations,
+    confidence and token usage (or an ``error`` event if generation fails).
+    """
+    logger.info(f"Received streaming question: {payload.question[:100]}...")
+
+    if not payload.question.strip():
+        logger.warning("Empty question received")
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error_code": "EMPTY_QUESTION",
+                "message": "Question cannot be empty"
+            }
+        )
+
+    faiss_store = await get_faiss_store_async()
+
+    if faiss_store.is_empty():
+        logger.warning("No documents indexed in FAISS store")
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error_code": "NO_DOCUMENTS",
+                "message": "No documents indexed yet"
+            }
+        )
+
+    check_filters(faiss_store, payload.filters)
+    mode = check_mode(faiss_store, payload.mode)
+
+    try:
+        results, query_embedding = await retrieve(
+            faiss_store, payload.question, k=5, filters=payload.filters, mode=mode
+        )
+    except Exception as e:
+        logger.error(f"Failed to retrieve context: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error_code": "ASK_FAILED",
+                "message": "Failed to generate answer"
+            }
+        )
+
+    context_chunks = [text for text, _, _ in results]
+    sources_used = [meta.get("chunk_id", 0) for _, _, meta in results]
+    chunk_keys = [(meta.get("source"), meta.get("chunk_id")) for _, _, meta in results]
+
+    answer_cache = get_answer_cache() if query_embedding is not None else None
+    cached = None
+    if answer_cache is not None:
+        cached = await asyncio.to_thread(answer_cache.lookup, query_embedding, chunk_keys)
+
+    async def events():
+        rag_response = cached
+        try:
+            if rag_response is not None:
+                yield _sse("token", {"content": rag_response.answer})
+            else:
+                async for item in generate_answer_streaming(
+                    question=payload.question,
+                    context_chunks=context_chunks,
+                    context_token_counts=chunk_token_counts([meta for _, _, meta in results])
+                ):
+                    if isinstance(item, RAGResponse):
+                        rag_response = item
+                    else:
+                        yield _sse("token", {"content": item})
+
+                if answer_cache is not None:
+                    await asyncio.to_thread(
+                        answer_cache.store, query_embedding, payload.question, chunk_keys, rag_response
+                    )
+
+        except Exception as e:
+            logger.error(f"Failed to stream answer: {e}", exc_info=True)
+            yield _sse("error", {
+                "error_code": "ASK_FAILED",
+                "message": "Failed to generate answer"
+            })
+            return
+
+        yield _sse("done", {
+            "answer": rag_response.answer,
+            "confidence": rag_response.confidence,
+            "sources_used": sources_used,
+            "citations": _citations(rag_response, results),
+            "tokens_used": rag_response.tokens_used,
+            "model": rag_response.model,
+            "cached": cached is not None,
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
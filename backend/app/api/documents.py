@@ -1,11 +1,15 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Header
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Header
+from typing import Optional
 import os
 import shutil
 
-from app.utils.text_extractor import extract_text_from_pdf
-from app.utils.text_splitter import split_text
-from app.services.embedding_service import embed_texts
-from app.core.dependencies import get_faiss_store
+from app.api.ingest import job_response
+from app.core.dependencies import (
+    get_document_registry,
+    get_faiss_store,
+    get_ingest_queue,
+    invalidate_cached_answers,
+)
 from app.core.config import ADMIN_SECRET_KEY
 
 router = APIRouter(prefix="/documents", tags=["Documents"])
@@ -14,9 +18,10 @@ UPLOAD_DIR = "uploaded_files"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
-@router.post("/upload")
+@router.post("/upload", status_code=202)
 async def upload_document(
     file: UploadFile = File(...),
+    department: Optional[str] = Form(None),
     x_admin_key: str = Header(None, alias="X-Admin-Key")
 ):
     # Validate admin key
@@ -37,27 +42,11 @@ async def upload_document(
     with open(file_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
 
-    # 1️⃣ Extract text
-    text = extract_text_from_pdf(file_path)
+    # Extraction, splitting, embedding and indexing run in the background
+    metadata = {"department": department} if department else None
+    job = get_ingest_queue().enqueue(file.filename, file_path, metadata)
 
-    # 2️⃣ Split into chunks
-    chunks = split_text(text)
-
-    # 3️⃣ Embed chunks
-    embeddings = embed_texts(chunks)
-
-    # 4️⃣ Store in FAISS
-    faiss_store = get_faiss_store()
-    metadata = [
-        {"source": file.filename, "chunk_id": i}
-        for i in range(len(chunks))
-    ]
-    faiss_store.add(embeddings, chunks, metadata)
-
-    return {
-        "filename": file.filename,
-        "chunks_indexed": len(chunks),
-    }
+    return job_response(job)
 
 
 @router.get("/")
@@ -80,13 +69,22 @@ def list_documents():
 @router.delete("/{filename}")
 def delete_document(filename: str):
     """
-    Delete a document file (vectors cleanup comes later)
+    Delete a document file and remove its chunks from the index
     """
     file_path = os.path.join(UPLOAD_DIR, filename)
+    file_exists = os.path.exists(file_path)
+    faiss_store = get_faiss_store()
 
-    if not os.path.exists(file_path):
+    # Before any write: a read-only worker answers 404, not 503, for unknown files
+    if not file_exists and not faiss_store.chunk_ids(filename):
         raise HTTPException(status_code=404, detail="File not found")
 
-    os.remove(file_path)
+    chunks_removed = faiss_store.remove(filename)
+    # Otherwise uploading the same file again would be skipped as unchanged
+    get_document_registry().remove(filename)
+
+    if file_exists:
+        os.remove(file_path)
+    invalidate_cached_answers(filename)
 
-    return {"deleted": filename}
+    return {"deleted": filename, "chunks_removed": chunks_removed}
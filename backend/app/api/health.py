@@ -1,7 +1,30 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.core.dependencies import loaded_faiss_store
+from app.core.warmup import readiness
 
 router = APIRouter(prefix="/health", tags=["Health"])
 
+
+def _status() -> dict:
+    store = loaded_faiss_store()
+    index = {"loaded": store is not None}
+    if store is not None:
+        index["vectors"] = store.index_stats()["vectors"]
+    return {"status": "ok", **readiness.as_dict(), "index": index}
+
+
 @router.get("/")
 def health_check():
-    return {"status": "ok"}
+    """Liveness: answers as soon as the server is up, with warm-up progress."""
+    return _status()
+
+
+@router.get("/ready")
+def readiness_check():
+    """Readiness: 503 until the FAISS store is open, for load balancers and orchestrators."""
+    status = _status()
+    if not readiness.ready:
+        return JSONResponse(status_code=503, content=status)
+    return status
@@ -1,12 +1,21 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Header
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+import asyncio
 import os
 import shutil
 import logging
+import uuid
 
-from app.utils.text_extractor import extract_text_from_pdf
-from app.utils.text_splitter import split_text
-from app.services.embedding_service import embed_texts
-from app.core.dependencies import get_faiss_store
+from app.core.concurrency import ReadOnlyStoreError
+from app.core.config import ADMIN_SECRET_KEY, INGEST_BULK_ROOT, INGEST_INCREMENTAL
+from app.core.dependencies import (
+    get_document_registry,
+    get_faiss_store_async,
+    get_ingest_queue,
+    invalidate_cached_answers,
+)
+from app.services.bulk_ingest import BulkIngest, Checkpoint, default_checkpoint_path
 
 router = APIRouter(prefix="/documents", tags=["Documents"])
 logger = logging.getLogger(__name__)
@@ -15,11 +24,29 @@ UPLOAD_DIR = "uploaded_files"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
-@router.post("/upload")
+def job_response(job: dict) -> dict:
+    return {
+        "job_id": job["id"],
+        "filename": job["filename"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": job["progress"],
+        "chunks_indexed": job["chunks_indexed"],
+        "error": job["error"],
+    }
+
+
+@router.post("/upload", status_code=202)
 async def upload_document(
     file: UploadFile = File(...),
-    faiss_store=Depends(get_faiss_store)  # ✅ SAME INSTANCE AS /ask
+    department: Optional[str] = Form(None),
+    ingest_queue=Depends(get_ingest_queue)
 ):
+    """
+    Save the PDF and queue it for ingestion. Poll /documents/jobs/{job_id}
+    for progress. An optional ``department`` is stored on every chunk so
+    searches can filter on it.
+    """
     logger.info(f"Received upload request for file: {file.filename}")
     
     if not file.filename.endswith(".pdf"):
@@ -33,30 +60,159 @@ async def upload_document(
         
         logger.info(f"File saved to: {file_path}")
 
-        text = extract_text_from_pdf(file_path)
-        chunks = split_text(text)
-        
-        logger.info(f"Extracted {len(chunks)} chunks from {file.filename}")
-        
-        embeddings = embed_texts(chunks)
+        metadata = {"department": department} if department else None
+        job = ingest_queue.enqueue(file.filename, file_path, metadata)
+        return job_response(job)
+    
+    except Exception as e:
+        logger.error(f"Failed to queue document {file.filename}: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to queue document: {str(e)}"
+        )
 
-        metadata = [
-            {"source": file.filename, "chunk_id": i}
-            for i in range(len(chunks))
-        ]
 
-        faiss_store.add(embeddings, chunks, metadata)
-        
-        logger.info(f"Successfully indexed {len(chunks)} chunks for {file.filename}")
+@router.get("/jobs/{job_id}")
+def get_ingest_job(job_id: str, ingest_queue=Depends(get_ingest_queue)):
+    """
+    Report stage and progress of an ingestion job
+    """
+    job = ingest_queue.store.get(job_id)
 
-        return {
-            "filename": file.filename,
-            "chunks_indexed": len(chunks)
-        }
-    
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "error_code": "JOB_NOT_FOUND",
+                "message": f"No ingestion job {job_id}"
+            }
+        )
+
+    return job_response(job)
+
+
+# -------------------------
+# BULK INGESTION
+# -------------------------
+class BulkIngestRequest(BaseModel):
+    # Directory or zip archive on the server, relative to INGEST_BULK_ROOT
+    path: str
+    department: Optional[str] = None
+    # Skip documents that an interrupted run over the same path finished
+    resume: bool = True
+
+
+# Bulk runs started by this process; after a restart, post again to resume
+_bulk_runs: Dict[str, BulkIngest] = {}
+_bulk_tasks = set()
+
+
+def _bulk_path(path: str) -> str:
+    root = os.path.realpath(INGEST_BULK_ROOT)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise HTTPException(
+            status_code=403,
+            detail={
+                "error_code": "PATH_NOT_ALLOWED",
+                "message": "Bulk ingestion only reads from INGEST_BULK_ROOT"
+            }
+        )
+    if not os.path.exists(resolved):
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "error_code": "PATH_NOT_FOUND",
+                "message": f"No directory or archive at {path}"
+            }
+        )
+    return resolved
+
+
+def _invalidate_answers(sources: List[str]):
+    for source in sources:
+        invalidate_cached_answers(source)
+
+
+async def _run_bulk(run_id: str, ingest: BulkIngest, path: str):
+    try:
+        await ingest.run(path)
     except Exception as e:
-        logger.error(f"Failed to process document {file.filename}: {e}", exc_info=True)
+        logger.error(f"Bulk ingestion run {run_id} failed: {e}", exc_info=True)
+    finally:
+        ingest.checkpoint.close()
+
+
+@router.post("/bulk", status_code=202)
+async def start_bulk_ingest(
+    payload: BulkIngestRequest,
+    x_admin_key: str = Header(None, alias="X-Admin-Key")
+):
+    """
+    Index every PDF of a directory or zip archive on the server in the
+    background (see BulkIngest). Poll /documents/bulk/{run_id} for progress
+    and throughput.
+    """
+    if x_admin_key != ADMIN_SECRET_KEY:
         raise HTTPException(
-            status_code=500,
-            detail=f"Failed to process document: {str(e)}"
+            status_code=401,
+            detail={
+                "error_code": "UNAUTHORIZED",
+                "message": "Invalid or missing admin key"
+            }
         )
+
+    path = _bulk_path(payload.path)
+    faiss_store = await get_faiss_store_async()
+    if faiss_store.read_only:
+        raise ReadOnlyStoreError(f"{faiss_store.index_path} is written by another process")
+
+    # No await from here until the run is registered, so concurrent
+    # requests cannot both pass this check
+    if any(run.state in ("pending", "running") for run in _bulk_runs.values()):
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "error_code": "BULK_INGEST_RUNNING",
+                "message": "A bulk ingestion run is already in progress"
+            }
+        )
+
+    checkpoint_path = default_checkpoint_path(path)
+    if not payload.resume and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    ingest = BulkIngest(
+        faiss_store=faiss_store,
+        registry=get_document_registry() if INGEST_INCREMENTAL else None,
+        checkpoint=Checkpoint(checkpoint_path),
+        document_metadata={"department": payload.department} if payload.department else None,
+        on_commit=_invalidate_answers,
+    )
+    run_id = uuid.uuid4().hex
+    _bulk_runs[run_id] = ingest
+    task = asyncio.create_task(_run_bulk(run_id, ingest, path))
+    _bulk_tasks.add(task)
+    task.add_done_callback(_bulk_tasks.discard)
+
+    logger.info(f"Started bulk ingestion run {run_id} over {path}")
+    return {"run_id": run_id, "path": payload.path, **ingest.status()}
+
+
+@router.get("/bulk/{run_id}")
+def get_bulk_ingest(run_id: str):
+    """
+    Report progress and throughput of a bulk ingestion run
+    """
+    ingest = _bulk_runs.get(run_id)
+
+    if ingest is None:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "error_code": "BULK_RUN_NOT_FOUND",
+                "message": f"No bulk ingestion run {run_id}"
+            }
+        )
+
+    return {"run_id": run_id, **ingest.status()}
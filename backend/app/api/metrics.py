@@ -0,0 +1,68 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.dependencies import get_answer_cache, loaded_faiss_store
+from app.core.metrics import CONTENT_TYPE, REGISTRY, counter, gauge
+from app.services.embedding_service import get_embedding_cache
+
+router = APIRouter(tags=["Metrics"])
+
+
+# -------------------------
+# SCRAPE-TIME METRICS
+# -------------------------
+# Read from the store and caches when /metrics is scraped, so the request
+# paths pay nothing for them. Nothing is reported for a store that no
+# request has opened yet.
+
+def _index_stat(key: str):
+    store = loaded_faiss_store()
+    if store is None:
+        return None
+    return store.index_stats()[key]
+
+
+def _cache_stats() -> dict:
+    caches = {"embedding": get_embedding_cache(), "answer": get_answer_cache()}
+    return {name: cache.stats() for name, cache in caches.items() if cache is not None}
+
+
+def _cache_lookups() -> dict:
+    lookups = {}
+    for name, stats in _cache_stats().items():
+        if name == "embedding":
+            lookups[(name, "memory_hit")] = stats["memory_hits"]
+            lookups[(name, "disk_hit")] = stats["disk_hits"]
+        else:
+            lookups[(name, "hit")] = stats["hits"]
+        lookups[(name, "miss")] = stats["misses"]
+    return lookups
+
+
+gauge(
+    "faiss_index_vectors",
+    "Live vectors in the FAISS store (opened shards only when sharded)",
+    collect=lambda: _index_stat("vectors"),
+)
+gauge(
+    "faiss_index_bytes",
+    "Approximate memory held by the FAISS index: codes, graph links, centroids and ids",
+    collect=lambda: _index_stat("bytes"),
+)
+gauge(
+    "cache_hit_ratio",
+    "Share of lookups served from the cache since startup",
+    labels=("cache",),
+    collect=lambda: {(name,): stats["hit_ratio"] for name, stats in _cache_stats().items()},
+)
+counter(
+    "cache_lookups_total",
+    "Cache lookups by result",
+    labels=("cache", "result"),
+    collect=_cache_lookups,
+)
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
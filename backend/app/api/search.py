@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List
+from typing import Any, Dict, List, Literal, Optional
 
-from app.services.embedding_service import embed_texts
-from app.core.dependencies import get_faiss_store
+from app.services.metadata_index import FilterError
+from app.services.retrieval import retrieve, retrieve_batch
+from app.core.dependencies import get_faiss_store_async
+from app.core.config import SEARCH_BATCH_MAX_QUERIES, SEARCH_DEFAULT_MODE
+
+SearchMode = Literal["dense", "lexical", "hybrid"]
 
 router = APIRouter(prefix="/search", tags=["Search"])
 
@@ -11,16 +15,48 @@ router = APIRouter(prefix="/search", tags=["Search"])
 class SearchRequest(BaseModel):
     query: str
     top_k: int = 5
+    # e.g. {"source": "handbook.pdf"} or {"department": ["hr", "legal"]}
+    filters: Optional[Dict[str, Any]] = None
+    # dense (embeddings), lexical (BM25) or hybrid (both, rank-fused)
+    mode: Optional[SearchMode] = None
 
 
-@router.post("/")
-def semantic_search(
-    request: SearchRequest,
-    faiss_store=Depends(get_faiss_store)
-):
-    query_embedding = embed_texts([request.query])[0]
-    results = faiss_store.search(query_embedding, request.top_k)
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    top_k: int = 5
+    filters: Optional[Dict[str, Any]] = None
+    mode: Optional[SearchMode] = None
+
+
+def check_filters(faiss_store, filters: Optional[Dict[str, Any]]):
+    """Reject a bad filter before any embedding is paid for."""
+    try:
+        faiss_store.check_filters(filters)
+    except FilterError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error_code": "INVALID_FILTER",
+                "message": str(e)
+            }
+        )
+
+
+def check_mode(faiss_store, mode: Optional[str]) -> str:
+    """Resolve the search mode, rejecting lexical modes without an index."""
+    mode = mode or SEARCH_DEFAULT_MODE
+    if mode != "dense" and not faiss_store.has_lexical_index:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error_code": "LEXICAL_DISABLED",
+                "message": f"Search mode '{mode}' needs the lexical index, which is disabled"
+            }
+        )
+    return mode
 
+
+def _format_results(results):
     return [
         {
             "text": text,
@@ -29,3 +65,70 @@ def semantic_search(
         }
         for text, score, metadata in results
     ]
+
+
+@router.post("/")
+async def semantic_search(request: SearchRequest):
+    faiss_store = await get_faiss_store_async()
+
+    check_filters(faiss_store, request.filters)
+    mode = check_mode(faiss_store, request.mode)
+
+    results, _ = await retrieve(
+        faiss_store, request.query, request.top_k, request.filters, mode
+    )
+
+    return _format_results(results)
+
+
+@router.post("/batch")
+async def semantic_search_batch(request: BatchSearchRequest):
+    """
+    Search many queries at once: one embeddings call for all queries and
+    one FAISS call over the whole query matrix (lexical queries are scored
+    one by one).
+    """
+    if not request.queries:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error_code": "EMPTY_BATCH",
+                "message": "At least one query is required"
+            }
+        )
+
+    if len(request.queries) > SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error_code": "BATCH_TOO_LARGE",
+                "message": f"At most {SEARCH_BATCH_MAX_QUERIES} queries per batch"
+            }
+        )
+
+    # The embedder drops blank inputs, which would misalign results
+    if any(not query.strip() for query in request.queries):
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error_code": "EMPTY_QUERY",
+                "message": "Queries cannot be empty"
+            }
+        )
+
+    faiss_store = await get_faiss_store_async()
+
+    check_filters(faiss_store, request.filters)
+    mode = check_mode(faiss_store, request.mode)
+
+    batch_results, _ = await retrieve_batch(
+        faiss_store, request.queries, request.top_k, request.filters, mode
+    )
+
+    return [
+        {
+            "query": query,
+            "results": _format_results(results)
+        }
+        for query, results in zip(request.queries, batch_results)
+    ]
@@ -0,0 +1,134 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Optional, TypeVar
+
+from app.core.config import SEARCH_EXECUTOR_WORKERS
+
+T = TypeVar("T")
+
+_search_executor: Optional[ThreadPoolExecutor] = None
+_search_executor_lock = threading.Lock()
+
+
+class RWLock:
+    """
+    Writer-preferring readers/writer lock.
+
+    Any number of readers may hold the lock together; a writer waits for
+    them to drain and new readers queue behind a waiting writer so ingestion
+    cannot be starved by a steady stream of searches. Not reentrant.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class StoreLockedError(RuntimeError):
+    """Another process holds the write lock of a store."""
+
+
+class ReadOnlyStoreError(RuntimeError):
+    """A write was attempted on a store opened read-only."""
+
+
+class StoreLock:
+    """
+    Exclusive advisory lock (``flock``) on ``path``, held by the one process
+    that may write a store. The kernel drops it when that process exits, so
+    a crashed writer never leaves it behind. No-op where ``fcntl`` is
+    unavailable.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def acquire(self) -> bool:
+        """Take the lock without waiting; False if another process holds it."""
+        if self._file is not None:
+            return True
+        try:
+            import fcntl
+        except ImportError:
+            return True
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        f = open(self.path, "a+b")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is not None:
+            # Closing the descriptor releases the flock
+            self._file.close()
+            self._file = None
+
+
+def get_search_executor() -> ThreadPoolExecutor:
+    """
+    Dedicated, fixed-size pool for FAISS searches. Keeps index work off the
+    event loop without competing with the default pool used by
+    ``asyncio.to_thread``, and caps how many searches run at once.
+    """
+    global _search_executor
+
+    if _search_executor is None:
+        with _search_executor_lock:
+            if _search_executor is None:
+                workers = SEARCH_EXECUTOR_WORKERS or min(8, os.cpu_count() or 1)
+                _search_executor = ThreadPoolExecutor(
+                    max_workers=workers,
+                    thread_name_prefix="faiss-search",
+                )
+
+    return _search_executor
+
+
+async def run_search(fn: Callable[..., T], *args, **kwargs) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_search_executor(), functools.partial(fn, *args, **kwargs)
+    )
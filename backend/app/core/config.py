@@ -16,8 +16,97 @@ class Settings(BaseSettings):
 
     # Embeddings / Vector DB
     EMBEDDING_DIMENSION: int = 1536
+    EMBEDDING_REQUEST_DIMENSIONS: int = 0  # Shortened text-embedding-3 vectors (set EMBEDDING_DIMENSION to match), 0 = full size
     FAISS_INDEX_PATH: str = "data/faiss_index"
+    FAISS_COMPACT_THRESHOLD_BYTES: int = 32 * 1024 * 1024  # Append log size that triggers compaction
+    FAISS_TOMBSTONE_COMPACT_RATIO: float = 0.2  # Share of removed vectors that triggers a purge
+    FAISS_INDEX_TYPE: str = "flat"  # flat, ivf_flat, ivf_pq or hnsw
+    FAISS_IVF_NLIST: int = 1024
+    FAISS_IVF_NPROBE: int = 16
+    FAISS_PQ_M: int = 64  # Must divide EMBEDDING_DIMENSION
+    FAISS_PQ_NBITS: int = 8
+    FAISS_HNSW_M: int = 32
+    FAISS_HNSW_EF_CONSTRUCTION: int = 200
+    FAISS_HNSW_EF_SEARCH: int = 64
+    FAISS_VECTOR_STORAGE: str = "float32"  # float32, float16 or int8 (scalar quantization); flat, ivf_flat and hnsw
+    FAISS_PCA_DIMENSION: int = 0  # Reduce vectors to this many dimensions with PCA before indexing, 0 = off
+    FAISS_SHARDS: int = 1  # Shards searched in parallel (source partitioning), 1 = unsharded
+    FAISS_SHARD_PARTITION: str = "source"  # source (hash of the document name) or time (newest shard takes writes)
+    FAISS_SHARD_MAX_VECTORS: int = 1_000_000  # Time partitioning starts a new shard past this size
+    FAISS_SHARD_SEARCH_WORKERS: int = 0  # Threads fanning searches out to shards, 0 = one per shard or CPU
+    FAISS_MMAP: bool = False  # Memory-map flat/HNSW vectors on load instead of reading them (copied on first write)
+    FAISS_FOLLOW_INTERVAL_SECONDS: float = 2.0  # How often worker processes that don't write the store pick up its writes
+    SEARCH_BATCH_MAX_QUERIES: int = 1000
+    SEARCH_EXECUTOR_WORKERS: int = 0  # Threads running FAISS searches, 0 = one per CPU (max 8)
+    SEARCH_FILTER_FIELDS: str = "source,department"  # Comma-separated metadata fields searches can filter on
+    SEARCH_DEFAULT_MODE: str = "dense"  # dense, lexical or hybrid when a request names none
+
+    # Lexical (BM25) index
+    LEXICAL_INDEX_ENABLED: bool = True
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    HYBRID_RRF_K: int = 60  # Reciprocal-rank fusion constant
+    HYBRID_CANDIDATES: int = 50  # Hits taken from each index before fusing
+
+    # Embedding cache
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "data/embedding_cache.sqlite3"  # Empty = memory only
+    EMBEDDING_CACHE_MEMORY_ITEMS: int = 10000
+    EMBEDDING_CACHE_DISK_ITEMS: int = 200000
+
+    # Embedding requests
+    EMBEDDING_BATCH_MAX_TOKENS: int = 100000  # tiktoken tokens per request
+    EMBEDDING_BATCH_MAX_ITEMS: int = 512
+    EMBEDDING_MAX_CONCURRENCY: int = 4  # Batches in flight per call
+    EMBEDDING_MAX_RETRIES: int = 5
+    EMBEDDING_RATE_LIMIT_RPM: int = 3000  # Starting budget, synced from response headers
+    EMBEDDING_RATE_LIMIT_TPM: int = 1000000
+
+    # Ingestion jobs
+    INGEST_JOBS_DB_PATH: str = "data/ingest_jobs.sqlite3"
+    INGEST_MAX_CONCURRENT_JOBS: int = 2
+    INGEST_POLL_SECONDS: float = 2.0  # How often the writing process checks for jobs queued by other workers
+    INGEST_EMBED_BATCH_CHUNKS: int = 256  # Chunks handed to the embedder at a time
+    INGEST_INCREMENTAL: bool = True  # Skip unchanged uploads, re-embed only changed chunks of revisions
+    DOCUMENT_REGISTRY_PATH: str = "data/documents.sqlite3"  # Content and chunk hashes of ingested documents
+    INGEST_BULK_DOCUMENTS_PER_WRITE: int = 64  # Bulk ingestion: documents embedded together and indexed in one write
+    INGEST_BULK_GROUPS_IN_FLIGHT: int = 2  # Bulk ingestion: document groups being embedded at once
+    INGEST_BULK_ROOT: str = "data/bulk_import"  # POST /documents/bulk only reads directories/archives under here
+    INGEST_BULK_CHECKPOINT_DIR: str = "data/bulk_checkpoints"
+
+    # Chunking
+    CHUNK_MAX_TOKENS: int = 256
+    CHUNK_OVERLAP_TOKENS: int = 32
+
+    # Tokenization
+    TOKEN_COUNT_CACHE_ITEMS: int = 20000  # Per-chunk token counts kept in memory
+
+    # PDF extraction
+    PDF_EXTRACT_BACKEND: str = "pdfplumber"  # pdfplumber | pypdfium2 | pypdf
+    PDF_EXTRACT_WORKERS: int = 0  # Extraction processes, 0 = one per CPU
+    PDF_PAGES_PER_TASK: int = 8
     
+    # Answer cache
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY: float = 0.95  # Min cosine similarity between questions
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+
+    # OpenAI HTTP client (shared by all async calls)
+    OPENAI_MAX_CONNECTIONS: int = 500
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 100
+    OPENAI_TIMEOUT_SECONDS: float = 60.0
+
+    # Startup
+    WARMUP_ON_STARTUP: bool = True  # Open the index and load slow imports in the background once the server is up
+
+    # Observability
+    METRICS_ENABLED: bool = True  # Serve Prometheus metrics on GET /metrics
+    LOG_FORMAT: str = "auto"  # text, json, or auto (json unless ENV=development)
+    PROFILING_ENABLED: bool = False  # Allow sampling profiles of requests sent with X-Profile and the admin key
+    PROFILE_INTERVAL_MS: float = 5.0  # Stack sampling period while profiling
+    PROFILE_DIR: str = "data/profiles"  # Collapsed-stack output, one file per profiled request
+
     # LLM / RAG
     DEFAULT_LLM_MODEL: str = "gpt-4o-mini"
     MAX_CONTEXT_TOKENS: int = 3000
@@ -33,6 +122,11 @@ class Settings(BaseSettings):
         """Parse comma-separated origins into a list"""
         return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",")]
 
+    @property
+    def search_filter_fields(self) -> list[str]:
+        """Parse comma-separated filterable metadata fields into a list"""
+        return [field.strip() for field in self.SEARCH_FILTER_FIELDS.split(",") if field.strip()]
+
 
 @lru_cache()
 def get_settings():
@@ -47,7 +141,84 @@ ALLOWED_ORIGINS = settings.cors_origins
 ADMIN_SECRET_KEY = settings.ADMIN_SECRET_KEY
 OPENAI_API_KEY = settings.OPENAI_API_KEY
 EMBEDDING_DIMENSION = settings.EMBEDDING_DIMENSION
+EMBEDDING_REQUEST_DIMENSIONS = settings.EMBEDDING_REQUEST_DIMENSIONS
 FAISS_INDEX_PATH = settings.FAISS_INDEX_PATH
+FAISS_COMPACT_THRESHOLD_BYTES = settings.FAISS_COMPACT_THRESHOLD_BYTES
+FAISS_TOMBSTONE_COMPACT_RATIO = settings.FAISS_TOMBSTONE_COMPACT_RATIO
+FAISS_INDEX_TYPE = settings.FAISS_INDEX_TYPE
+FAISS_IVF_NLIST = settings.FAISS_IVF_NLIST
+FAISS_IVF_NPROBE = settings.FAISS_IVF_NPROBE
+FAISS_PQ_M = settings.FAISS_PQ_M
+FAISS_PQ_NBITS = settings.FAISS_PQ_NBITS
+FAISS_HNSW_M = settings.FAISS_HNSW_M
+FAISS_HNSW_EF_CONSTRUCTION = settings.FAISS_HNSW_EF_CONSTRUCTION
+FAISS_HNSW_EF_SEARCH = settings.FAISS_HNSW_EF_SEARCH
+FAISS_VECTOR_STORAGE = settings.FAISS_VECTOR_STORAGE
+FAISS_PCA_DIMENSION = settings.FAISS_PCA_DIMENSION
+FAISS_SHARDS = settings.FAISS_SHARDS
+FAISS_SHARD_PARTITION = settings.FAISS_SHARD_PARTITION
+FAISS_SHARD_MAX_VECTORS = settings.FAISS_SHARD_MAX_VECTORS
+FAISS_SHARD_SEARCH_WORKERS = settings.FAISS_SHARD_SEARCH_WORKERS
+FAISS_MMAP = settings.FAISS_MMAP
+FAISS_FOLLOW_INTERVAL_SECONDS = settings.FAISS_FOLLOW_INTERVAL_SECONDS
+SEARCH_BATCH_MAX_QUERIES = settings.SEARCH_BATCH_MAX_QUERIES
+SEARCH_EXECUTOR_WORKERS = settings.SEARCH_EXECUTOR_WORKERS
+SEARCH_FILTER_FIELDS = settings.search_filter_fields
+SEARCH_DEFAULT_MODE = settings.SEARCH_DEFAULT_MODE
+
+LEXICAL_INDEX_ENABLED = settings.LEXICAL_INDEX_ENABLED
+BM25_K1 = settings.BM25_K1
+BM25_B = settings.BM25_B
+HYBRID_RRF_K = settings.HYBRID_RRF_K
+HYBRID_CANDIDATES = settings.HYBRID_CANDIDATES
+
+EMBEDDING_CACHE_ENABLED = settings.EMBEDDING_CACHE_ENABLED
+EMBEDDING_CACHE_PATH = settings.EMBEDDING_CACHE_PATH
+EMBEDDING_CACHE_MEMORY_ITEMS = settings.EMBEDDING_CACHE_MEMORY_ITEMS
+EMBEDDING_CACHE_DISK_ITEMS = settings.EMBEDDING_CACHE_DISK_ITEMS
+EMBEDDING_BATCH_MAX_TOKENS = settings.EMBEDDING_BATCH_MAX_TOKENS
+EMBEDDING_BATCH_MAX_ITEMS = settings.EMBEDDING_BATCH_MAX_ITEMS
+EMBEDDING_MAX_CONCURRENCY = settings.EMBEDDING_MAX_CONCURRENCY
+EMBEDDING_MAX_RETRIES = settings.EMBEDDING_MAX_RETRIES
+EMBEDDING_RATE_LIMIT_RPM = settings.EMBEDDING_RATE_LIMIT_RPM
+EMBEDDING_RATE_LIMIT_TPM = settings.EMBEDDING_RATE_LIMIT_TPM
+
+INGEST_JOBS_DB_PATH = settings.INGEST_JOBS_DB_PATH
+INGEST_MAX_CONCURRENT_JOBS = settings.INGEST_MAX_CONCURRENT_JOBS
+INGEST_POLL_SECONDS = settings.INGEST_POLL_SECONDS
+INGEST_EMBED_BATCH_CHUNKS = settings.INGEST_EMBED_BATCH_CHUNKS
+INGEST_INCREMENTAL = settings.INGEST_INCREMENTAL
+DOCUMENT_REGISTRY_PATH = settings.DOCUMENT_REGISTRY_PATH
+INGEST_BULK_DOCUMENTS_PER_WRITE = settings.INGEST_BULK_DOCUMENTS_PER_WRITE
+INGEST_BULK_GROUPS_IN_FLIGHT = settings.INGEST_BULK_GROUPS_IN_FLIGHT
+INGEST_BULK_ROOT = settings.INGEST_BULK_ROOT
+INGEST_BULK_CHECKPOINT_DIR = settings.INGEST_BULK_CHECKPOINT_DIR
+
+CHUNK_MAX_TOKENS = settings.CHUNK_MAX_TOKENS
+CHUNK_OVERLAP_TOKENS = settings.CHUNK_OVERLAP_TOKENS
+
+TOKEN_COUNT_CACHE_ITEMS = settings.TOKEN_COUNT_CACHE_ITEMS
+
+PDF_EXTRACT_BACKEND = settings.PDF_EXTRACT_BACKEND
+PDF_EXTRACT_WORKERS = settings.PDF_EXTRACT_WORKERS
+PDF_PAGES_PER_TASK = settings.PDF_PAGES_PER_TASK
+
+ANSWER_CACHE_ENABLED = settings.ANSWER_CACHE_ENABLED
+ANSWER_CACHE_SIMILARITY = settings.ANSWER_CACHE_SIMILARITY
+ANSWER_CACHE_TTL_SECONDS = settings.ANSWER_CACHE_TTL_SECONDS
+ANSWER_CACHE_MAX_ENTRIES = settings.ANSWER_CACHE_MAX_ENTRIES
+
+OPENAI_MAX_CONNECTIONS = settings.OPENAI_MAX_CONNECTIONS
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS
+OPENAI_TIMEOUT_SECONDS = settings.OPENAI_TIMEOUT_SECONDS
+
+WARMUP_ON_STARTUP = settings.WARMUP_ON_STARTUP
+
+METRICS_ENABLED = settings.METRICS_ENABLED
+LOG_FORMAT = settings.LOG_FORMAT
+PROFILING_ENABLED = settings.PROFILING_ENABLED
+PROFILE_INTERVAL_MS = settings.PROFILE_INTERVAL_MS
+PROFILE_DIR = settings.PROFILE_DIR
 
 DEFAULT_LLM_MODEL = settings.DEFAULT_LLM_MODEL
 MAX_CONTEXT_TOKENS = settings.MAX_CONTEXT_TOKENS
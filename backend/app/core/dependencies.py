@@ -1,17 +1,261 @@
-from app.services.faiss_service import FaissStore
-from app.core.config import EMBEDDING_DIMENSION, FAISS_INDEX_PATH
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+from app.core.concurrency import StoreLockedError
+from app.services.document_registry import DocumentRegistry
+from app.services.ingest_jobs import IngestQueue, JobStore
+from app.services.ingest_service import ingest_document
+from app.core.config import (
+    EMBEDDING_DIMENSION,
+    FAISS_INDEX_PATH,
+    FAISS_COMPACT_THRESHOLD_BYTES,
+    FAISS_TOMBSTONE_COMPACT_RATIO,
+    FAISS_INDEX_TYPE,
+    FAISS_IVF_NLIST,
+    FAISS_IVF_NPROBE,
+    FAISS_PQ_M,
+    FAISS_PQ_NBITS,
+    FAISS_HNSW_M,
+    FAISS_HNSW_EF_CONSTRUCTION,
+    FAISS_HNSW_EF_SEARCH,
+    FAISS_VECTOR_STORAGE,
+    FAISS_PCA_DIMENSION,
+    FAISS_SHARDS,
+    FAISS_SHARD_PARTITION,
+    FAISS_SHARD_MAX_VECTORS,
+    FAISS_SHARD_SEARCH_WORKERS,
+    FAISS_MMAP,
+    FAISS_FOLLOW_INTERVAL_SECONDS,
+    SEARCH_FILTER_FIELDS,
+    LEXICAL_INDEX_ENABLED,
+    BM25_K1,
+    BM25_B,
+    INGEST_JOBS_DB_PATH,
+    INGEST_MAX_CONCURRENT_JOBS,
+    INGEST_POLL_SECONDS,
+    INGEST_INCREMENTAL,
+    DOCUMENT_REGISTRY_PATH,
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_SIMILARITY,
+    ANSWER_CACHE_TTL_SECONDS,
+    ANSWER_CACHE_MAX_ENTRIES,
+)
+
+# FAISS (and the stores built on it) is imported when the store is first
+# opened, normally by the startup warm-up, not when the app is imported
+if TYPE_CHECKING:
+    from app.services.answer_cache import AnswerCache
+    from app.services.faiss_service import FaissStore
+    from app.services.index_factory import IndexOptions
+
+logger = logging.getLogger(__name__)
 
 _faiss_store = None
+_faiss_store_lock = threading.Lock()
+_ingest_queue = None
+_document_registry = None
+_answer_cache = None
+
+
+def get_index_options() -> "IndexOptions":
+    from app.services.index_factory import IndexOptions
+
+    return IndexOptions(
+        index_type=FAISS_INDEX_TYPE,
+        nlist=FAISS_IVF_NLIST,
+        nprobe=FAISS_IVF_NPROBE,
+        pq_m=FAISS_PQ_M,
+        pq_nbits=FAISS_PQ_NBITS,
+        hnsw_m=FAISS_HNSW_M,
+        ef_construction=FAISS_HNSW_EF_CONSTRUCTION,
+        ef_search=FAISS_HNSW_EF_SEARCH,
+        storage=FAISS_VECTOR_STORAGE,
+        pca_dimension=FAISS_PCA_DIMENSION,
+    )
 
 
-def get_faiss_store() -> FaissStore:
+def open_faiss_store(
+    index_path: str = FAISS_INDEX_PATH,
+    dimension: int = EMBEDDING_DIMENSION,
+    index_options: Optional["IndexOptions"] = None,
+    read_only: bool = False,
+):
+    """
+    FaissStore at ``index_path``, or a ShardedFaissStore when sharding is
+    configured or the saved store is already sharded. Unless ``read_only``
+    this takes the store's write lock: StoreLockedError while another
+    process (API worker or script) holds it.
+    """
+    from app.services.faiss_service import FaissStore
+    from app.services.sharded_store import ShardedFaissStore, is_sharded
+
+    options = dict(
+        dimension=dimension,
+        use_cosine=True,
+        index_path=index_path,
+        compact_threshold_bytes=FAISS_COMPACT_THRESHOLD_BYTES,
+        index_options=index_options or get_index_options(),
+        tombstone_compact_ratio=FAISS_TOMBSTONE_COMPACT_RATIO,
+        filter_fields=SEARCH_FILTER_FIELDS,
+        lexical_index=LEXICAL_INDEX_ENABLED,
+        bm25_k1=BM25_K1,
+        bm25_b=BM25_B,
+        mmap=FAISS_MMAP,
+        read_only=read_only,
+    )
+    if FAISS_SHARDS > 1 or FAISS_SHARD_PARTITION != "source" or is_sharded(index_path):
+        return ShardedFaissStore(
+            num_shards=FAISS_SHARDS,
+            partition=FAISS_SHARD_PARTITION,
+            shard_max_vectors=FAISS_SHARD_MAX_VECTORS,
+            search_workers=FAISS_SHARD_SEARCH_WORKERS,
+            **options,
+        )
+    return FaissStore(**options)
+
+
+def get_faiss_store() -> "FaissStore":
+    """
+    The process-wide store. The first worker process to open it becomes its
+    writer; the others (several uvicorn workers) open it read-only and
+    follow the writer's commits, taking over if it goes away.
+    """
     global _faiss_store
 
     if _faiss_store is None:
-        _faiss_store = FaissStore(
+        # Concurrent first requests must not each load their own copy
+        with _faiss_store_lock:
+            if _faiss_store is None:
+                try:
+                    _faiss_store = open_faiss_store()
+                except StoreLockedError as e:
+                    logger.info(f"{e}; serving it read-only")
+                    _faiss_store = open_faiss_store(read_only=True)
+                    threading.Thread(
+                        target=_follow_writer, name="faiss-follower", daemon=True
+                    ).start()
+
+    return _faiss_store
+
+
+def _follow_writer():
+    """Keep the read-only store in step with the writing process, or replace it once free."""
+    global _faiss_store
+
+    while True:
+        time.sleep(FAISS_FOLLOW_INTERVAL_SECONDS)
+        store = _faiss_store
+        try:
+            changed = store.refresh()
+        except Exception as e:
+            # e.g. the writer died mid-rotation; this process still serves
+            # what it last followed, and taking over below recovers
+            logger.warning(f"Could not follow the FAISS store: {e}")
+        else:
+            if changed is None:
+                _clear_cached_answers()
+            else:
+                for source in changed:
+                    invalidate_cached_answers(source)
+
+        try:
+            writer = open_faiss_store()
+        except StoreLockedError:
+            continue
+        except Exception as e:
+            logger.warning(f"Could not take over writing the FAISS store: {e}")
+            continue
+        # The old store is left to the garbage collector: requests may still hold it
+        _faiss_store = writer
+        # Answers were built on what this process last followed, not on the store as written
+        _clear_cached_answers()
+        logger.info("Took over writing the FAISS store from a process that has exited")
+        return
+
+
+async def get_faiss_store_async() -> "FaissStore":
+    """``get_faiss_store`` for async code: a cold load runs on a worker thread, not the event loop."""
+    if _faiss_store is not None:
+        return _faiss_store
+    return await asyncio.to_thread(get_faiss_store)
+
+
+def loaded_faiss_store() -> Optional["FaissStore"]:
+    """The store if it has been opened already; for readers that must not trigger the load."""
+    return _faiss_store
+
+
+def get_answer_cache() -> Optional["AnswerCache"]:
+    global _answer_cache
+
+    if ANSWER_CACHE_ENABLED and _answer_cache is None:
+        from app.services.answer_cache import AnswerCache
+
+        _answer_cache = AnswerCache(
             dimension=EMBEDDING_DIMENSION,
-            use_cosine=True,
-            index_path=FAISS_INDEX_PATH
+            threshold=ANSWER_CACHE_SIMILARITY,
+            ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+            max_entries=ANSWER_CACHE_MAX_ENTRIES,
         )
 
-    return _faiss_store
+    return _answer_cache
+
+
+def _clear_cached_answers():
+    answer_cache = get_answer_cache()
+    if answer_cache is not None:
+        answer_cache.clear()
+
+
+def invalidate_cached_answers(source: str):
+    """Forget answers built on ``source``; call whenever its chunks change."""
+    answer_cache = get_answer_cache()
+    if answer_cache is not None:
+        answer_cache.invalidate_source(source)
+
+
+def get_document_registry() -> DocumentRegistry:
+    global _document_registry
+
+    if _document_registry is None:
+        _document_registry = DocumentRegistry(DOCUMENT_REGISTRY_PATH)
+
+    return _document_registry
+
+
+async def _writes_index() -> bool:
+    store = await get_faiss_store_async()
+    return not store.read_only
+
+
+async def _run_ingest_job(job: dict, report) -> int:
+    return await ingest_document(
+        file_path=job["file_path"],
+        source=job["filename"],
+        faiss_store=await get_faiss_store_async(),
+        report=report,
+        document_metadata=json.loads(job["metadata"]) if job.get("metadata") else None,
+        registry=get_document_registry() if INGEST_INCREMENTAL else None,
+        # Not for an unchanged re-upload: its cached answers are still right
+        on_commit=invalidate_cached_answers,
+    )
+
+
+def get_ingest_queue() -> IngestQueue:
+    global _ingest_queue
+
+    if _ingest_queue is None:
+        _ingest_queue = IngestQueue(
+            store=JobStore(INGEST_JOBS_DB_PATH),
+            handler=_run_ingest_job,
+            concurrency=INGEST_MAX_CONCURRENT_JOBS,
+            # Jobs queued by any worker process run in the one writing the index
+            accepts_jobs=_writes_index,
+            poll_interval=INGEST_POLL_SECONDS,
+        )
+
+    return _ingest_queue
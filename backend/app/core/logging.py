@@ -1,40 +1,82 @@
+import json
 import logging
 import sys
-from app.core.config import ENV
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from app.core.config import ENV, LOG_FORMAT
+
+# Set per request by app.core.middleware; added to every JSON log line
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed with ``extra=``
+_RECORD_ATTRIBUTES = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", (), None))
+) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, name, message, the request id
+    and any ``extra=`` fields. Built with json.dumps, so quotes, newlines
+    and tracebacks in messages stay valid JSON.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+            + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "name": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = request_id_var.get()
+        if request_id is not None:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
 
 def setup_logging():
     """Configure structured logging based on environment"""
-    
+
     # Set log level based on environment
     log_level = logging.DEBUG if ENV == "development" else logging.INFO
-    
+
     # Create formatter
-    if ENV == "development":
-        # Colored, human-readable format for development
+    log_format = LOG_FORMAT
+    if log_format == "auto":
+        log_format = "text" if ENV == "development" else "json"
+    if log_format == "json":
+        # One JSON object per line for log shippers
+        formatter = JsonFormatter()
+    else:
+        # Human-readable format for development
         formatter = logging.Formatter(
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
             datefmt='%Y-%m-%d %H:%M:%S'
         )
-    else:
-        # JSON-like structured format for production
-        formatter = logging.Formatter(
-            '{"time": "%(asctime)s", "name": "%(name)s", "level": "%(levelname)s", "message": "%(message)s"}',
-            datefmt='%Y-%m-%dT%H:%M:%S'
-        )
-    
+
     # Configure root logger
     root_logger = logging.getLogger()
     root_logger.setLevel(log_level)
-    
+
     # Remove existing handlers
     root_logger.handlers.clear()
-    
+
     # Add console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(log_level)
     console_handler.setFormatter(formatter)
     root_logger.addHandler(console_handler)
-    
+
     return root_logger
 
 # Initialize logging on module import
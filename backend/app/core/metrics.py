@@ -0,0 +1,293 @@
+import bisect
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Default latency buckets in seconds, 1 ms to 30 s
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class Metric:
+    """Base for metrics kept in a Registry and rendered in the Prometheus text format."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._collect: Optional[Callable[[], object]] = None
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self) -> Iterable[Sample]:
+        """
+        The stored values, or those read at scrape time from ``collect``: a
+        number (no labels), ``{label values tuple: number}`` or None (no sample).
+        """
+        if self._collect is not None:
+            collected = self._collect()
+            if collected is None:
+                return
+            values = collected.items() if isinstance(collected, dict) else [((), collected)]
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        for key, value in values:
+            yield self.name, dict(zip(self.labels, key)), float(value)
+
+
+class Counter(Metric):
+    """Incremented by the code, or read from ``collect`` (e.g. totals kept by a cache)."""
+
+    type = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        collect: Optional[Callable[[], object]] = None,
+    ):
+        super().__init__(name, help, labels)
+        self._collect = collect
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    """Value set by the code, or read at scrape time from ``collect``."""
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        collect: Optional[Callable[[], object]] = None,
+    ):
+        super().__init__(name, help, labels)
+        self._collect = collect
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: per-bucket (non-cumulative) counts + overflow, sum
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[slot] += 1
+            self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the ``with`` block, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            snapshot = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        for key, counts, total in snapshot:
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            cumulative += counts[-1]
+            yield f"{self.name}_bucket", {**labels, "le": "+Inf"}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)."""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                if labels:
+                    rendered = ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels.items())
+                    lines.append(f"{name}{{{rendered}}} {_format_value(value)}")
+                else:
+                    lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def counter(
+    name: str,
+    help: str,
+    labels: Sequence[str] = (),
+    collect: Optional[Callable[[], object]] = None,
+) -> Counter:
+    return REGISTRY.register(Counter(name, help, labels, collect))
+
+
+def gauge(
+    name: str,
+    help: str,
+    labels: Sequence[str] = (),
+    collect: Optional[Callable[[], object]] = None,
+) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labels, collect))
+
+
+def histogram(
+    name: str,
+    help: str,
+    labels: Sequence[str] = (),
+    buckets: Sequence[float] = LATENCY_BUCKETS,
+) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labels, buckets))
+
+
+def resident_memory_bytes() -> Optional[float]:
+    """Current RSS from /proc, or the peak RSS where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return float(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE"))
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return float(peak if os.uname().sysname == "Darwin" else peak * 1024)
+
+
+# -------------------------
+# PIPELINE METRICS
+# -------------------------
+# Instruments shared by the request and ingest paths; scrape-time gauges
+# for the FAISS store and caches are registered by app.api.metrics.
+
+HTTP_REQUEST_SECONDS = histogram(
+    "http_request_duration_seconds",
+    "Time to serve an HTTP request, until the last body byte is sent",
+    labels=("method", "route", "status"),
+)
+
+RAG_STAGE_SECONDS = histogram(
+    "rag_stage_seconds",
+    "Time spent per /ask and /search stage: embed, search, prompt (context truncation) and completion",
+    labels=("stage",),
+)
+
+EMBEDDING_REQUEST_SECONDS = histogram(
+    "embedding_request_seconds",
+    "Latency of one embeddings API request (one batch of texts)",
+)
+
+RAG_TOKENS = histogram(
+    "rag_tokens",
+    "Tokens per answered question, by kind (prompt or completion)",
+    labels=("kind",),
+    buckets=(50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+
+INGEST_PAGES_PER_SECOND = histogram(
+    "ingest_pages_per_second",
+    "Extraction throughput per ingested document",
+    buckets=(0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+
+INGEST_CHUNKS_PER_SECOND = histogram(
+    "ingest_chunks_per_second",
+    "End-to-end indexing throughput per ingested document",
+    buckets=(0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+
+INGEST_PAGES = counter("ingest_pages_total", "Pages extracted from ingested documents")
+INGEST_CHUNKS = counter("ingest_chunks_total", "Chunks indexed from ingested documents")
+INGEST_CHUNKS_REUSED = counter(
+    "ingest_chunks_reused_total", "Unchanged chunks of re-ingested documents kept without re-embedding"
+)
+INGEST_DOCUMENTS = counter(
+    "ingest_documents_total", "Ingested documents by outcome", labels=("outcome",)
+)
+
+PROCESS_RSS = gauge(
+    "process_resident_memory_bytes",
+    "Resident memory of this process",
+    collect=resident_memory_bytes,
+)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import re
+import time
+import uuid
+
+from app.core.config import (
+    ADMIN_SECRET_KEY,
+    METRICS_ENABLED,
+    PROFILE_DIR,
+    PROFILE_INTERVAL_MS,
+    PROFILING_ENABLED,
+)
+from app.core.logging import request_id_var
+from app.core.metrics import HTTP_REQUEST_SECONDS
+from app.core.profiling import SamplingProfiler, profile_path
+
+logger = logging.getLogger(__name__)
+
+# Client-supplied request ids are reused only when safe as a file name
+_REQUEST_ID = re.compile(r"[A-Za-z0-9._-]{1,64}")
+
+
+class RequestContextMiddleware:
+    """
+    Per request: a request id (``X-Request-ID``, echoed back and added to
+    JSON logs), a latency observation labelled by route template, and, when
+    PROFILING_ENABLED and the request carries ``X-Profile`` plus the admin
+    key, a sampling profile saved to PROFILE_DIR/<request id>.folded.
+
+    Plain ASGI rather than BaseHTTPMiddleware so streamed responses pass
+    through untouched and are timed to their last byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")
+        if not _REQUEST_ID.fullmatch(request_id):
+            request_id = uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        profiler = None
+        if (
+            PROFILING_ENABLED
+            and b"x-profile" in headers
+            and headers.get(b"x-admin-key", b"").decode("latin-1") == ADMIN_SECRET_KEY
+        ):
+            profiler = SamplingProfiler(PROFILE_INTERVAL_MS / 1000)
+            if not profiler.start():
+                logger.warning("Profile requested while another is running; not profiling")
+                profiler = None
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_headers(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                extra = [(b"x-request-id", request_id.encode())]
+                if profiler is not None:
+                    extra.append((b"x-profile-id", request_id.encode()))
+                message = {**message, "headers": [*message.get("headers", []), *extra]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            if METRICS_ENABLED:
+                # Route template, not the raw path, to keep label values bounded
+                route = getattr(scope.get("route"), "path", "unmatched")
+                HTTP_REQUEST_SECONDS.observe(
+                    time.perf_counter() - started,
+                    method=scope["method"],
+                    route=route,
+                    status=str(status),
+                )
+            if profiler is not None:
+                profiler.stop()
+                path = profile_path(PROFILE_DIR, request_id)
+                await asyncio.to_thread(profiler.write, path)
+                logger.info(f"Saved profile of {profiler.samples} samples to {path}")
+            request_id_var.reset(token)
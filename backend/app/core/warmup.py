@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from app.core.config import DEFAULT_LLM_MODEL
+
+logger = logging.getLogger(__name__)
+
+# Embedding requests are batched by this model's tokenizer (embed_texts default)
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+class Readiness:
+    """
+    Startup progress reported by /health. The server accepts connections
+    straight away; it is ``ready`` once the FAISS store is open.
+    ``starting`` -> ``warming`` -> ``ready`` or ``failed``.
+    """
+
+    def __init__(self):
+        self.state = "starting"
+        self.error: Optional[str] = None
+        self.started = time.monotonic()
+        self.ready_after: Optional[float] = None
+        # Seconds spent per warm-up step
+        self.steps: Dict[str, float] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def mark_ready(self):
+        self.state = "ready"
+        self.ready_after = time.monotonic() - self.started
+
+    def as_dict(self) -> dict:
+        status = {"state": self.state, "ready": self.ready}
+        if self.ready_after is not None:
+            status["ready_after_seconds"] = round(self.ready_after, 3)
+        if self.steps:
+            status["warmup_seconds"] = {step: round(s, 3) for step, s in self.steps.items()}
+        if self.error:
+            status["error"] = self.error
+        return status
+
+
+readiness = Readiness()
+
+
+@contextmanager
+def _step(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        readiness.steps[name] = time.perf_counter() - start
+
+
+def _warm_up():
+    # Imported here: these are the modules kept out of app import time
+    from app.core.dependencies import get_faiss_store
+    from app.services.openai_client import get_async_openai, get_openai
+    from app.utils.tokenizer import get_encoding
+
+    with _step("index"):
+        store = get_faiss_store()
+    readiness.mark_ready()
+    # Loaded vectors only: a sharded store opens the rest on first use
+    logger.info(
+        f"FAISS store ready ({store.index_stats()['vectors']} vectors loaded) "
+        f"after {readiness.ready_after:.2f}s"
+    )
+
+    # Not needed to serve searches from the index; a failure only means the
+    # first request pays for it
+    try:
+        with _step("openai"):
+            get_openai()
+            get_async_openai()
+        with _step("tokenizers"):
+            get_encoding(DEFAULT_LLM_MODEL)
+            get_encoding(EMBEDDING_MODEL)
+    except Exception as e:
+        logger.warning(f"Warm-up left some modules cold: {e}")
+
+
+async def warm_up():
+    """Open the FAISS store, then load the OpenAI clients and tokenizers, off the event loop."""
+    readiness.state = "warming"
+    try:
+        await asyncio.to_thread(_warm_up)
+    except Exception as e:
+        readiness.state = "failed"
+        readiness.error = str(e)
+        logger.error(f"Warm-up failed: {e}", exc_info=True)
@@ -1,5 +1,7 @@
 print("🔥🔥🔥 THIS IS THE REAL APP.MAIN 🔥🔥🔥")
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -8,18 +10,62 @@ from app.api.documents import router as documents_router
 from app.api.health import router as health_router
 from app.api.ingest import router as ingest_router
 from app.api.ask import router as ask_router
-from app.core.config import APP_NAME, ALLOWED_ORIGINS, ENV
+from app.api.search import router as search_router
+from app.api.metrics import router as metrics_router
+from app.core.concurrency import ReadOnlyStoreError
+from app.core.config import APP_NAME, ALLOWED_ORIGINS, ENV, METRICS_ENABLED, WARMUP_ON_STARTUP
+from app.core.dependencies import get_ingest_queue
 from app.core.logging import setup_logging
+from app.core.middleware import RequestContextMiddleware
+from app.core.warmup import readiness, warm_up
+from app.services.openai_client import close_async_clients
 
 # Initialize logging
 setup_logging()
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The index loads in the background so the server is up (and /health
+    # answers) at once; /health/ready turns 200 when the index is usable
+    warmup = None
+    if WARMUP_ON_STARTUP:
+        warmup = asyncio.create_task(warm_up())
+    else:
+        readiness.mark_ready()  # the index opens on first use
+
+    # Background ingestion workers (resumes jobs left over from a restart)
+    ingest_queue = get_ingest_queue()
+    await ingest_queue.start()
+    yield
+    await ingest_queue.stop()
+    if warmup is not None:
+        await warmup
+    await close_async_clients()
+
+
 app = FastAPI(
     title=APP_NAME,
     version="0.1.0",
+    lifespan=lifespan,
 )
 
+# Writes (e.g. deletes) that reach a worker process not writing the index;
+# the load balancer sends the retry to any worker, usually the writer
+@app.exception_handler(ReadOnlyStoreError)
+async def read_only_store_handler(request: Request, exc: ReadOnlyStoreError):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "1"},
+        content={
+            "detail": {
+                "error_code": "STORE_READ_ONLY",
+                "message": "This worker process does not write the index; retry the request"
+            }
+        }
+    )
+
 # Global exception handler for production-ready error responses
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -40,12 +86,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "X-Profile-Id"],
 )
 
+# Request ids, latency metrics and opt-in profiling (outermost, so CORS
+# preflights are timed too)
+app.add_middleware(RequestContextMiddleware)
+
 app.include_router(health_router)
 app.include_router(ingest_router)
 app.include_router(ask_router)
+app.include_router(search_router)
 app.include_router(documents_router)
+if METRICS_ENABLED:
+    app.include_router(metrics_router)
 
 @app.get("/")
 def root():
@@ -0,0 +1,147 @@
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.services.answer_service import RAGResponse
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    def __init__(self, question: str, chunk_keys: Tuple, response: RAGResponse):
+        self.question = question
+        self.chunk_keys = chunk_keys
+        self.sources = {key[0] for key in chunk_keys}
+        self.response = response
+        self.created_at = time.time()
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers.
+
+    Past questions are kept in a small in-memory FAISS index. A new question
+    reuses a stored answer when its embedding is within ``threshold`` cosine
+    similarity of a cached question *and* retrieval returned the same chunks,
+    so a paraphrase is only served from cache when it was grounded on the
+    same context. Entries expire after ``ttl_seconds``, the least recently
+    used are evicted beyond ``max_entries``, and ``invalidate_source`` drops
+    every answer built on a document that changed.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        threshold: float = 0.95,
+        ttl_seconds: float = 3600,
+        max_entries: int = 1000,
+        candidates: int = 4,
+    ):
+        self.dimension = dimension
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.candidates = candidates
+
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, embedding, chunk_keys: List[Hashable]) -> Optional[RAGResponse]:
+        """Cached answer for a question similar to this one over the same chunks."""
+        query = self._normalize(embedding)
+        chunk_keys = tuple(chunk_keys)
+
+        with self._lock:
+            self._expire()
+            if self.index.ntotal == 0:
+                self.misses += 1
+                return None
+
+            scores, ids = self.index.search(query, min(self.candidates, self.index.ntotal))
+            for score, entry_id in zip(scores[0], ids[0]):
+                if entry_id == -1 or score < self.threshold:
+                    break
+                entry = self._entries[int(entry_id)]
+                if entry.chunk_keys == chunk_keys:
+                    self._entries.move_to_end(int(entry_id))
+                    self.hits += 1
+                    logger.info(
+                        f"Answer cache hit (similarity {score:.3f}) for: {entry.question[:100]}"
+                    )
+                    return entry.response
+
+            self.misses += 1
+            return None
+
+    def store(self, embedding, question: str, chunk_keys: List[Hashable], response: RAGResponse):
+        vector = self._normalize(embedding)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self.index.add_with_ids(vector, np.array([entry_id], dtype=np.int64))
+            self._entries[entry_id] = _Entry(question, tuple(chunk_keys), response)
+
+            if len(self._entries) > self.max_entries:
+                excess = len(self._entries) - self.max_entries
+                self._remove(list(itertools.islice(self._entries, excess)))
+
+    def invalidate_source(self, source: str) -> int:
+        """Drop every cached answer that used chunks of ``source``."""
+        with self._lock:
+            stale = [
+                entry_id for entry_id, entry in self._entries.items()
+                if source in entry.sources
+            ]
+            self._remove(stale)
+
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached answers for {source}")
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._remove(list(self._entries))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+    # -------------------------
+    # INTERNAL
+    # -------------------------
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        # Insertion order is not recency order, so check every entry
+        expired = [
+            entry_id for entry_id, entry in self._entries.items()
+            if entry.created_at < cutoff
+        ]
+        self._remove(expired)
+
+    def _remove(self, entry_ids: List[int]):
+        if not entry_ids:
+            return
+        for entry_id in entry_ids:
+            del self._entries[entry_id]
+        self.index.remove_ids(np.array(entry_ids, dtype=np.int64))
+
+    def _normalize(self, embedding) -> np.ndarray:
+        vector = np.array(embedding, dtype=np.float32).reshape(1, self.dimension)
+        faiss.normalize_L2(vector)
+        return vector
@@ -1,20 +1,26 @@
-from openai import OpenAI, OpenAIError, RateLimitError, APITimeoutError
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any, Union
 import logging
-import tiktoken
+import time
 from tenacity import (
     retry,
     stop_after_attempt,
     wait_exponential,
-    retry_if_exception_type
+    retry_if_exception
 )
 
-from app.core.config import OPENAI_API_KEY, DEFAULT_LLM_MODEL, MAX_CONTEXT_TOKENS
+from app.core.config import DEFAULT_LLM_MODEL, MAX_CONTEXT_TOKENS, LLM_MAX_RETRIES
+from app.core.metrics import RAG_STAGE_SECONDS, RAG_TOKENS
+from app.services.openai_client import get_async_openai, get_openai
+from app.utils.tokenizer import (
+    count_tokens,
+    count_tokens_cached,
+    cached_token_count,
+    remember_token_count,
+    get_encoding,
+)
 
 logger = logging.getLogger(__name__)
 
-client = OpenAI(api_key=OPENAI_API_KEY)
-
 
 class AnswerGenerationError(Exception):
     """Custom exception for answer generation failures."""
@@ -47,30 +53,58 @@ class RAGResponse:
         }
 
 
-def count_tokens(text: str, model: str = "gpt-4") -> int:
-    """Count tokens in text for a given model."""
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-    except KeyError:
-        encoding = tiktoken.get_encoding("cl100k_base")
-    return len(encoding.encode(text))
+def chunk_token_counts(metadata: List[dict], model: str = DEFAULT_LLM_MODEL) -> List[Optional[int]]:
+    """
+    Token counts recorded at ingest, where they were counted with ``model``'s
+    tokenizer; ``None`` where they are missing or from another tokenizer.
+    """
+    encoding_name = get_encoding(model).name
+    return [
+        meta.get("token_count") if meta.get("token_encoding") == encoding_name else None
+        for meta in metadata
+    ]
 
 
 def truncate_context(
     chunks: List[str],
     max_tokens: int = 3000,
-    model: str = "gpt-4"
+    model: str = "gpt-4",
+    token_counts: Optional[List[Optional[int]]] = None
 ) -> tuple[List[str], List[int]]:
     """
     Truncate context to fit within token limit.
     Returns: (truncated_chunks, indices_used)
     """
+    selected_chunks, indices_used, _ = _fit_context(chunks, max_tokens, model, token_counts)
+    return selected_chunks, indices_used
+
+
+def _fit_context(
+    chunks: List[str],
+    max_tokens: int,
+    model: str,
+    token_counts: Optional[List[Optional[int]]] = None
+) -> tuple[List[str], List[int], int]:
+    """
+    ``truncate_context`` that also returns the tokens used. Each chunk is
+    encoded at most once: counts come from ``token_counts`` (ingest-time
+    metadata) or the process-wide count cache when known, and the tokens of
+    a freshly encoded chunk are reused if it has to be cut.
+    """
+    encoding = get_encoding(model)
     selected_chunks = []
     indices_used = []
     total_tokens = 0
     
     for idx, chunk in enumerate(chunks):
-        chunk_tokens = count_tokens(chunk, model)
+        tokens = None
+        chunk_tokens = token_counts[idx] if token_counts else None
+        if chunk_tokens is None:
+            chunk_tokens = cached_token_count(chunk, model)
+        if chunk_tokens is None:
+            tokens = encoding.encode_ordinary(chunk)
+            chunk_tokens = len(tokens)
+            remember_token_count(chunk, chunk_tokens, model)
         
         if total_tokens + chunk_tokens <= max_tokens:
             selected_chunks.append(chunk)
@@ -80,19 +114,208 @@ def truncate_context(
             # Try to fit a truncated version of this chunk
             remaining_tokens = max_tokens - total_tokens
             if remaining_tokens > 100:  # Only if meaningful space left
-                encoding = tiktoken.encoding_for_model(model)
-                tokens = encoding.encode(chunk)
+                if tokens is None:
+                    tokens = encoding.encode_ordinary(chunk)
                 truncated = encoding.decode(tokens[:remaining_tokens])
                 selected_chunks.append(truncated + "...")
                 indices_used.append(idx)
+                total_tokens += remaining_tokens
             break
     
     logger.info(f"Using {len(selected_chunks)}/{len(chunks)} chunks ({total_tokens} tokens)")
-    return selected_chunks, indices_used
+    return selected_chunks, indices_used, total_tokens
+
+
+NO_CONTEXT_ANSWER = "I don't have any relevant documents to answer this question."
+
+
+class PromptPlan:
+    """Chat messages for one question, plus which context chunks made it in."""
+    def __init__(self, messages: List[dict], indices_used: List[int], prompt_tokens: int):
+        self.messages = messages
+        self.indices_used = indices_used
+        self.prompt_tokens = prompt_tokens
+
+
+def build_prompt(
+    question: str,
+    context_chunks: List[str],
+    model: str = DEFAULT_LLM_MODEL,
+    max_context_tokens: int = MAX_CONTEXT_TOKENS,
+    include_citations: bool = True,
+    context_token_counts: Optional[List[Optional[int]]] = None
+) -> PromptPlan:
+    """
+    Fit the context into the token budget and build the chat messages.
+    Shared by ``generate_answer`` and its async and streaming variants;
+    ``indices_used`` index into ``context_chunks``.
+    """
+    # Filter out empty chunks, remembering where each one came from
+    if context_token_counts is None:
+        context_token_counts = [None] * len(context_chunks)
+    kept = [
+        (idx, chunk.strip(), tokens)
+        for idx, (chunk, tokens) in enumerate(zip(context_chunks, context_token_counts))
+        if chunk and chunk.strip()
+    ]
+    
+    # Truncate context to fit token limits
+    truncated_chunks, kept_used, context_tokens = _fit_context(
+        [chunk for _, chunk, _ in kept],
+        max_tokens=max_context_tokens,
+        model=model,
+        token_counts=[tokens for _, _, tokens in kept]
+    )
+    indices_used = [kept[i][0] for i in kept_used]
+    
+    # Build numbered context for citations
+    if include_citations:
+        context_parts = []
+        for idx, chunk in enumerate(truncated_chunks, 1):
+            context_parts.append(f"[Source {idx}]\n{chunk}")
+        context = "\n\n".join(context_parts)
+        citation_instruction = (
+            "When using information from the context, cite the source number "
+            "like [Source 1] or [Source 2]."
+        )
+    else:
+        context = "\n\n".join(truncated_chunks)
+        citation_instruction = ""
+    
+    # Enhanced system prompt
+    system_prompt = (
+        "You are an expert organizational knowledge assistant. "
+        "Your role is to provide accurate, helpful answers based STRICTLY on the provided context. "
+        "\n\nRules:\n"
+        "1. Answer ONLY using information from the provided context\n"
+        "2. If the answer is not in the context, clearly state: "
+        "'I don't have enough information in the provided documents to answer this question.'\n"
+        "3. Be concise but complete\n"
+        "4. If the context is ambiguous or contradictory, acknowledge this\n"
+        f"5. {citation_instruction}\n"
+        "6. Do not make assumptions or add information not in the context"
+    )
+    
+    user_prompt = f"""Context:
+{context}
+
+Question: {question}
+
+Please provide a clear, accurate answer based solely on the context above."""
+    
+    # Estimate prompt tokens from the parts already counted; the exact
+    # figure comes back in the response usage
+    prompt_tokens = (
+        context_tokens
+        + count_tokens_cached(system_prompt, model)
+        + count_tokens(question, model)
+    )
+    
+    return PromptPlan(
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        indices_used=indices_used,
+        prompt_tokens=prompt_tokens
+    )
+
+
+def _is_overloaded(error: BaseException) -> bool:
+    from openai import APITimeoutError, RateLimitError
+
+    return isinstance(error, (RateLimitError, APITimeoutError))
+
+
+def _plan_prompt(
+    question: str,
+    context_chunks: List[str],
+    model: str,
+    max_context_tokens: int,
+    include_citations: bool,
+    context_token_counts: Optional[List[Optional[int]]]
+) -> Optional[PromptPlan]:
+    """
+    Validate the question and build its prompt; ``None`` when there is no
+    context to answer from.
+    """
+    if not question or not question.strip():
+        raise ValueError("Question cannot be empty")
+    
+    if not context_chunks:
+        logger.warning("No context chunks provided")
+        return None
+    
+    with RAG_STAGE_SECONDS.time(stage="prompt"):
+        plan = build_prompt(
+            question,
+            context_chunks,
+            model=model,
+            max_context_tokens=max_context_tokens,
+            include_citations=include_citations,
+            context_token_counts=context_token_counts
+        )
+    
+    logger.info(f"Generating answer with ~{plan.prompt_tokens} prompt tokens")
+    return plan
+
+
+def _completion_request(plan: PromptPlan, model: str, temperature: float) -> Dict[str, Any]:
+    return {
+        "model": model,
+        "messages": plan.messages,
+        "temperature": temperature,
+        "max_tokens": 1000,  # Limit response length
+        "presence_penalty": 0.0,
+        "frequency_penalty": 0.0,
+    }
+
+
+def _to_rag_response(answer: str, usage, plan: PromptPlan, model: str) -> RAGResponse:
+    answer = answer.strip()
+    
+    # Determine confidence based on response content
+    confidence = determine_confidence(answer)
+    tokens_used = _tokens_used(usage)
+    
+    logger.info(
+        f"Answer generated successfully. "
+        f"Tokens: {tokens_used['total']}, Confidence: {confidence}"
+    )
+    
+    return RAGResponse(
+        answer=answer,
+        sources_used=plan.indices_used,
+        confidence=confidence,
+        tokens_used=tokens_used,
+        model=model
+    )
+
+
+def _map_openai_error(error: Exception) -> AnswerGenerationError:
+    """The AnswerGenerationError to raise for a failed completion."""
+    from openai import APITimeoutError, OpenAIError, RateLimitError
+
+    if isinstance(error, (RateLimitError, APITimeoutError)):
+        logger.error(f"OpenAI API error after retries: {str(error)}")
+        return AnswerGenerationError(
+            "The service is currently experiencing high load. Please try again in a moment."
+        )
+    
+    if isinstance(error, OpenAIError):
+        logger.error(f"OpenAI API error: {str(error)}", exc_info=error)
+        return AnswerGenerationError(
+            f"Failed to generate answer due to API error: {str(error)}"
+        )
+    
+    logger.error(f"Unexpected error in answer generation: {str(error)}", exc_info=error)
+    return AnswerGenerationError(
+        "An unexpected error occurred while generating the answer."
+    )
 
 
 @retry(
-    retry=retry_if_exception_type((RateLimitError, APITimeoutError)),
+    retry=retry_if_exception(_is_overloaded),
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=2, max=10)
 )
@@ -102,7 +325,8 @@ def generate_answer(
     model: str = DEFAULT_LLM_MODEL,
     temperature: float = 0.2,
     max_context_tokens: int = MAX_CONTEXT_TOKENS,
-    include_citations: bool = True
+    include_citations: bool = True,
+    context_token_counts: Optional[List[Optional[int]]] = None
 ) -> RAGResponse:
     """
     Generate an answer using retrieved document context with proper error handling.
@@ -114,6 +338,7 @@ def generate_answer(
         temperature: Generation temperature (0.0-1.0)
         max_context_tokens: Maximum tokens for context
         include_citations: Whether to include source references
+        context_token_counts: Known token counts of the chunks (see chunk_token_counts)
     
     Returns:
         RAGResponse object with answer and metadata
@@ -121,127 +346,72 @@ def generate_answer(
     Raises:
         AnswerGenerationError: If generation fails after retries
     """
-    # Input validation
-    if not question or not question.strip():
-        raise ValueError("Question cannot be empty")
-    
-    if not context_chunks:
-        logger.warning("No context chunks provided")
-        return RAGResponse(
-            answer="I don't have any relevant documents to answer this question.",
-            sources_used=[],
-            confidence="none",
-            tokens_used={"prompt": 0, "completion": 0, "total": 0},
-            model=model
-        )
-    
-    # Filter out empty chunks
-    context_chunks = [chunk.strip() for chunk in context_chunks if chunk and chunk.strip()]
+    plan = _plan_prompt(
+        question, context_chunks, model, max_context_tokens, include_citations, context_token_counts
+    )
+    if plan is None:
+        return _no_context_response(model)
     
     try:
-        # Truncate context to fit token limits
-        truncated_chunks, indices_used = truncate_context(
-            context_chunks,
-            max_tokens=max_context_tokens,
-            model=model
-        )
-        
-        # Build numbered context for citations
-        if include_citations:
-            context_parts = []
-            for idx, chunk in enumerate(truncated_chunks, 1):
-                context_parts.append(f"[Source {idx}]\n{chunk}")
-            context = "\n\n".join(context_parts)
-            citation_instruction = (
-                "When using information from the context, cite the source number "
-                "like [Source 1] or [Source 2]."
+        with RAG_STAGE_SECONDS.time(stage="completion"):
+            response = get_openai().chat.completions.create(
+                **_completion_request(plan, model, temperature)
             )
-        else:
-            context = "\n\n".join(truncated_chunks)
-            citation_instruction = ""
-        
-        # Enhanced system prompt
-        system_prompt = (
-            "You are an expert organizational knowledge assistant. "
-            "Your role is to provide accurate, helpful answers based STRICTLY on the provided context. "
-            "\n\nRules:\n"
-            "1. Answer ONLY using information from the provided context\n"
-            "2. If the answer is not in the context, clearly state: "
-            "'I don't have enough information in the provided documents to answer this question.'\n"
-            "3. Be concise but complete\n"
-            "4. If the context is ambiguous or contradictory, acknowledge this\n"
-            f"5. {citation_instruction}\n"
-            "6. Do not make assumptions or add information not in the context"
-        )
-        
-        user_prompt = f"""Context:
-{context}
+        return _to_rag_response(response.choices[0].message.content, response.usage, plan, model)
+    except Exception as e:
+        raise _map_openai_error(e) from e
 
-Question: {question}
 
-Please provide a clear, accurate answer based solely on the context above."""
-        
-        # Calculate prompt tokens
-        prompt_text = system_prompt + user_prompt
-        prompt_tokens = count_tokens(prompt_text, model)
-        
-        logger.info(f"Generating answer with {prompt_tokens} prompt tokens")
-        
-        # Call OpenAI API
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=temperature,
-            max_tokens=1000,  # Limit response length
-            presence_penalty=0.0,
-            frequency_penalty=0.0,
-        )
-        
-        answer = response.choices[0].message.content.strip()
-        
-        # Determine confidence based on response content
-        confidence = determine_confidence(answer)
-        
-        # Token usage
-        tokens_used = {
-            "prompt": response.usage.prompt_tokens,
-            "completion": response.usage.completion_tokens,
-            "total": response.usage.total_tokens
-        }
-        
-        logger.info(
-            f"Answer generated successfully. "
-            f"Tokens: {tokens_used['total']}, Confidence: {confidence}"
-        )
-        
-        return RAGResponse(
-            answer=answer,
-            sources_used=indices_used,
-            confidence=confidence,
-            tokens_used=tokens_used,
-            model=model
-        )
-    
-    except (RateLimitError, APITimeoutError) as e:
-        logger.error(f"OpenAI API error after retries: {str(e)}")
-        raise AnswerGenerationError(
-            "The service is currently experiencing high load. Please try again in a moment."
-        )
-    
-    except OpenAIError as e:
-        logger.error(f"OpenAI API error: {str(e)}", exc_info=True)
-        raise AnswerGenerationError(
-            f"Failed to generate answer due to API error: {str(e)}"
-        )
+async def generate_answer_async(
+    question: str,
+    context_chunks: List[str],
+    model: str = DEFAULT_LLM_MODEL,
+    temperature: float = 0.2,
+    max_context_tokens: int = MAX_CONTEXT_TOKENS,
+    include_citations: bool = True,
+    context_token_counts: Optional[List[Optional[int]]] = None
+) -> RAGResponse:
+    """
+    ``generate_answer`` on the shared async client: same prompt, context
+    budget and errors, but waiting on the completion does not hold a thread.
+    Rate-limit and timeout retries are left to the client (LLM_MAX_RETRIES).
+    """
+    plan = _plan_prompt(
+        question, context_chunks, model, max_context_tokens, include_citations, context_token_counts
+    )
+    if plan is None:
+        return _no_context_response(model)
     
+    try:
+        with RAG_STAGE_SECONDS.time(stage="completion"):
+            response = await get_async_openai(max_retries=LLM_MAX_RETRIES).chat.completions.create(
+                **_completion_request(plan, model, temperature)
+            )
+        return _to_rag_response(response.choices[0].message.content, response.usage, plan, model)
     except Exception as e:
-        logger.error(f"Unexpected error in answer generation: {str(e)}", exc_info=True)
-        raise AnswerGenerationError(
-            "An unexpected error occurred while generating the answer."
-        )
+        raise _map_openai_error(e) from e
+
+
+def _no_context_response(model: str) -> RAGResponse:
+    return RAGResponse(
+        answer=NO_CONTEXT_ANSWER,
+        sources_used=[],
+        confidence="none",
+        tokens_used={"prompt": 0, "completion": 0, "total": 0},
+        model=model
+    )
+
+
+def _tokens_used(usage) -> Dict[str, int]:
+    if usage is None:
+        return {"prompt": 0, "completion": 0, "total": 0}
+    RAG_TOKENS.observe(usage.prompt_tokens, kind="prompt")
+    RAG_TOKENS.observe(usage.completion_tokens, kind="completion")
+    return {
+        "prompt": usage.prompt_tokens,
+        "completion": usage.completion_tokens,
+        "total": usage.total_tokens
+    }
 
 
 def determine_confidence(answer: str) -> str:
@@ -283,43 +453,53 @@ async def generate_answer_streaming(
     question: str,
     context_chunks: List[str],
     model: str = DEFAULT_LLM_MODEL,
-    **kwargs
-):
+    temperature: float = 0.2,
+    max_context_tokens: int = MAX_CONTEXT_TOKENS,
+    include_citations: bool = True,
+    context_token_counts: Optional[List[Optional[int]]] = None
+) -> AsyncIterator[Union[str, RAGResponse]]:
     """
-    Streaming version for better UX.
-    Yields answer chunks as they're generated.
+    Streaming version of ``generate_answer`` for better UX.
+
+    Yields answer text deltas as they arrive, then one final ``RAGResponse``
+    carrying the full answer, sources used, confidence and token usage.
+    Same prompt and context budget as ``generate_answer``; the request runs
+    on the async client so the event loop is never blocked.
     """
-    # Similar setup to generate_answer...
-    truncated_chunks, indices_used = truncate_context(context_chunks)
-    
-    context_parts = []
-    for idx, chunk in enumerate(truncated_chunks, 1):
-        context_parts.append(f"[Source {idx}]\n{chunk}")
-    context = "\n\n".join(context_parts)
-    
-    system_prompt = "You are an organizational knowledge assistant..."  # Same as above
-    user_prompt = f"Context:\n{context}\n\nQuestion: {question}\n\nAnswer:"
+    from openai import OpenAIError
+
+    plan = _plan_prompt(
+        question, context_chunks, model, max_context_tokens, include_citations, context_token_counts
+    )
+    if plan is None:
+        response = _no_context_response(model)
+        yield response.answer
+        yield response
+        return
     
+    started = time.perf_counter()
     try:
-        stream = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.2,
-            stream=True
+        stream = await get_async_openai(max_retries=LLM_MAX_RETRIES).chat.completions.create(
+            **_completion_request(plan, model, temperature),
+            stream=True,
+            stream_options={"include_usage": True},
         )
         
-        full_answer = ""
-        for chunk in stream:
-            if chunk.choices[0].delta.content:
+        parts = []
+        usage = None
+        async for chunk in stream:
+            # The usage chunk comes last and has no choices
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
                 content = chunk.choices[0].delta.content
-                full_answer += content
+                parts.append(content)
                 yield content
-        
-        logger.info(f"Streamed answer of length {len(full_answer)}")
-        
-    except Exception as e:
-        logger.error(f"Streaming error: {str(e)}")
-        raise AnswerGenerationError(f"Streaming failed: {str(e)}")
\ No newline at end of file
+    
+    except OpenAIError as e:
+        logger.error(f"Streaming error: {str(e)}", exc_info=True)
+        raise AnswerGenerationError(f"Streaming failed: {str(e)}")
+    
+    # Until the last chunk; time spent by the client between chunks is included
+    RAG_STAGE_SECONDS.observe(time.perf_counter() - started, stage="completion")
+    yield _to_rag_response("".join(parts), usage, plan, model)
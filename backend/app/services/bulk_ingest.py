@@ -0,0 +1,460 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import BrokenExecutor
+from typing import TYPE_CHECKING, Callable, Container, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import (
+    DEFAULT_LLM_MODEL,
+    INGEST_BULK_CHECKPOINT_DIR,
+    INGEST_BULK_DOCUMENTS_PER_WRITE,
+    INGEST_BULK_GROUPS_IN_FLIGHT,
+    PDF_EXTRACT_BACKEND,
+    PDF_EXTRACT_WORKERS,
+)
+from app.core.metrics import INGEST_CHUNKS, INGEST_CHUNKS_REUSED, INGEST_DOCUMENTS, INGEST_PAGES
+from app.services.document_registry import DocumentRegistry, chunk_hash, file_hash
+from app.services.embedding_service import embed_texts_async
+from app.services.ingest_service import (
+    DocumentRevision,
+    IngestionError,
+    chunk_metadata,
+    indexed_version,
+)
+from app.utils.text_extractor import extract_pages, get_extraction_pool
+from app.utils.text_splitter import split_pages
+from app.utils.tokenizer import get_encoding
+
+if TYPE_CHECKING:
+    from app.services.faiss_service import FaissStore
+
+logger = logging.getLogger(__name__)
+
+# Seconds between progress log lines
+PROGRESS_INTERVAL = 10.0
+# Failed documents listed in a run's status (all are logged)
+_MAX_ERRORS = 100
+
+
+# -------------------------
+# INPUT
+# -------------------------
+def iter_documents(
+    path: str,
+    work_dir: str,
+    skip: Container[str] = (),
+) -> Iterator[Tuple[str, str, bool]]:
+    """
+    ``(source, file_path, temporary)`` for every PDF in directory ``path``
+    (recursively) or zip archive ``path``, in name order. Sources are paths
+    relative to the directory or archive root. Archive members are written
+    to ``work_dir`` one at a time as they are reached, under generated names
+    (``temporary``); sources in ``skip`` are not read at all.
+    """
+    if os.path.isfile(path) and zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            members = sorted(
+                (m for m in archive.infolist() if not m.is_dir() and _is_pdf(m.filename)),
+                key=lambda m: m.filename,
+            )
+            for i, member in enumerate(members):
+                if member.filename in skip:
+                    continue
+                file_path = os.path.join(work_dir, f"{i}.pdf")
+                with archive.open(member) as src, open(file_path, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                yield member.filename, file_path, True
+        return
+
+    if not os.path.isdir(path):
+        raise IngestionError(f"{path} is neither a directory nor a zip archive")
+
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if not _is_pdf(name):
+                continue
+            file_path = os.path.join(root, name)
+            source = os.path.relpath(file_path, path).replace(os.sep, "/")
+            if source not in skip:
+                yield source, file_path, False
+
+
+def _is_pdf(name: str) -> bool:
+    # __MACOSX/ holds resource forks that zips made on macOS carry along
+    return name.lower().endswith(".pdf") and not name.startswith("__MACOSX/")
+
+
+def prepare_document(file_path: str, backend: str, model: str) -> Tuple[int, List[dict]]:
+    """
+    Extract and split one whole PDF. Runs on the extraction process pool, so
+    different documents are parsed and tokenised in parallel. Returns the
+    page count and the chunks, each carrying its ``chunk_hash``.
+    """
+    pages = extract_pages(file_path, backend)
+    token_encoding = get_encoding(model).name
+    chunks = list(split_pages(pages, model=model))
+    for chunk in chunks:
+        chunk["chunk_hash"] = chunk_hash(chunk, token_encoding)
+    return len(pages), chunks
+
+
+# -------------------------
+# CHECKPOINT
+# -------------------------
+def default_checkpoint_path(path: str) -> str:
+    """Checkpoint file of runs over ``path`` (a directory or archive)."""
+    key = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(INGEST_BULK_CHECKPOINT_DIR, f"{key}.jsonl")
+
+
+class Checkpoint:
+    """
+    Sources a bulk run has finished, one JSON line each, appended and
+    fsynced after every index write. A run given the same checkpoint again
+    skips them, so an interrupted backfill resumes where it stopped. A run
+    that completes clears it, so the next run over the same path looks at
+    every document again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        torn = False
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self.done.add(json.loads(line)["source"])
+                    except (ValueError, KeyError):
+                        torn = True  # last line of a run killed mid-write
+
+        self._file = open(path, "a", encoding="utf-8")
+        if torn:
+            self._file.write("\n")
+
+    def record(self, entries: List[dict]):
+        for entry in entries:
+            self._file.write(json.dumps(entry) + "\n")
+            self.done.add(entry["source"])
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def clear(self):
+        """Forget every source: the run they belonged to is complete."""
+        self._file.close()
+        os.remove(self.path)
+        self.done = set()
+
+    def close(self):
+        self._file.close()
+
+
+# -------------------------
+# PIPELINE
+# -------------------------
+class _Document:
+    def __init__(
+        self,
+        source: str,
+        content_hash: Optional[str] = None,
+        page_count: int = 0,
+        revision: Optional[DocumentRevision] = None,
+        chunks: Optional[List[dict]] = None,
+    ):
+        self.source = source
+        self.content_hash = content_hash
+        self.page_count = page_count
+        # None when the document is unchanged and nothing is written
+        self.revision = revision
+        # Chunks to embed and add
+        self.chunks = chunks or []
+
+
+class BulkStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.indexed = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.pages = 0
+        self.chunks = 0
+        self.chunks_reused = 0
+        self.errors: Dict[str, str] = {}
+
+    def as_dict(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+
+        def rate(count: int) -> float:
+            return round(count / elapsed, 2) if elapsed > 0 else 0.0
+
+        return {
+            "documents_indexed": self.indexed,
+            "documents_unchanged": self.unchanged,
+            "documents_failed": self.failed,
+            "pages": self.pages,
+            "chunks_indexed": self.chunks,
+            "chunks_reused": self.chunks_reused,
+            "elapsed_seconds": round(elapsed, 2),
+            "documents_per_second": rate(self.indexed + self.unchanged),
+            "pages_per_second": rate(self.pages),
+            "chunks_per_second": rate(self.chunks),
+            "errors": self.errors,
+        }
+
+
+class BulkIngest:
+    """
+    Ingest every PDF of a directory or zip archive as a bounded pipeline:
+
+    - extract: whole documents are extracted and split on the extraction
+      process pool, ``extract_concurrency`` at a time
+    - embed: the new chunks of ``documents_per_write`` documents are
+      embedded together (token-packed, concurrent requests), with up to
+      ``groups_in_flight`` groups embedding at once
+    - index: each group is one ``write_batch`` on the store, then recorded
+      in the registry and the checkpoint
+
+    Every stage hands over through a bounded queue, so memory stays flat
+    however many files there are. With a ``registry`` unchanged documents
+    are skipped and revised ones re-embed only their changed chunks, as in
+    ingest_document; other documents replace any chunks of the same source.
+    A document that fails is logged and skipped; the run goes on.
+    ``on_commit(sources)`` is called after each write.
+    """
+
+    def __init__(
+        self,
+        faiss_store: "FaissStore",
+        registry: Optional[DocumentRegistry] = None,
+        checkpoint: Optional[Checkpoint] = None,
+        document_metadata: Optional[dict] = None,
+        documents_per_write: int = INGEST_BULK_DOCUMENTS_PER_WRITE,
+        groups_in_flight: int = INGEST_BULK_GROUPS_IN_FLIGHT,
+        extract_concurrency: int = 0,
+        on_commit: Optional[Callable[[List[str]], None]] = None,
+    ):
+        self.faiss_store = faiss_store
+        self.registry = registry
+        self.checkpoint = checkpoint
+        self.document_metadata = document_metadata
+        self.documents_per_write = max(1, documents_per_write)
+        self.groups_in_flight = max(1, groups_in_flight)
+        # Two documents per extraction process keep the pool busy
+        self.extract_concurrency = extract_concurrency or 2 * (PDF_EXTRACT_WORKERS or os.cpu_count() or 1)
+        self.on_commit = on_commit
+
+        self.state = "pending"
+        self.error: Optional[str] = None
+        self.stats = BulkStats()
+        self._token_encoding = None
+        self._last_progress = 0.0
+
+    def status(self) -> dict:
+        status = {"state": self.state, **self.stats.as_dict()}
+        if self.error:
+            status["error"] = self.error
+        return status
+
+    async def run(self, path: str) -> dict:
+        """Ingest everything under ``path``; returns the final ``status()``."""
+        self.state = "running"
+        self.stats = BulkStats()
+        self._token_encoding = (await asyncio.to_thread(get_encoding, DEFAULT_LLM_MODEL)).name
+        logger.info(f"Bulk ingestion of {path} started")
+
+        try:
+            with tempfile.TemporaryDirectory(prefix="bulk-ingest-", ignore_cleanup_errors=True) as work_dir:
+                skip = self.checkpoint.done if self.checkpoint is not None else ()
+                if skip:
+                    logger.info(f"Resuming: {len(skip)} documents already done")
+                await self._pipeline(iter_documents(path, work_dir, skip))
+            if self.checkpoint is not None:
+                await asyncio.to_thread(self.checkpoint.clear)
+        except BaseException as e:
+            self.state = "failed"
+            self.error = str(e) or type(e).__name__
+            raise
+        finally:
+            self.stats.finished = time.perf_counter()
+            self._log_progress("stopped" if self.state == "failed" else "finished")
+
+        self.state = "completed"
+        return self.status()
+
+    async def _pipeline(self, documents: Iterator[Tuple[str, str, bool]]):
+        loop = asyncio.get_running_loop()
+        prepared: asyncio.Queue = asyncio.Queue(maxsize=self.documents_per_write)
+        next_lock = asyncio.Lock()
+
+        async def next_document():
+            # The generator may only be advanced by one thread at a time
+            async with next_lock:
+                return await asyncio.to_thread(next, documents, None)
+
+        async def extract_worker():
+            while (item := await next_document()) is not None:
+                document = await self._prepare(loop, *item)
+                if document is not None:
+                    await prepared.put(document)
+
+        async def produce():
+            workers = [asyncio.create_task(extract_worker()) for _ in range(self.extract_concurrency)]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers:
+                    task.cancel()
+            await prepared.put(None)
+
+        stages = [asyncio.create_task(produce()), asyncio.create_task(self._index(prepared))]
+        try:
+            # Whichever stage fails first stops the other
+            for stage in asyncio.as_completed(stages):
+                await stage
+        finally:
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+
+    async def _prepare(self, loop, source: str, file_path: str, temporary: bool) -> Optional[_Document]:
+        try:
+            revision = DocumentRevision()
+            content_hash = None
+            if self.registry is not None:
+                content_hash = await asyncio.to_thread(file_hash, file_path)
+                previous = await asyncio.to_thread(
+                    indexed_version, self.registry, self.faiss_store, source, content_hash
+                )
+                if previous is not None and previous["metadata"] == (self.document_metadata or None):
+                    if previous["content_hash"] == content_hash:
+                        self.stats.unchanged += 1
+                        INGEST_DOCUMENTS.inc(outcome="unchanged")
+                        return _Document(source)
+                    revision = DocumentRevision(previous["chunks"], previous["next_chunk_id"])
+
+            pool = get_extraction_pool()
+            args = (file_path, PDF_EXTRACT_BACKEND, DEFAULT_LLM_MODEL)
+            if pool is not None:
+                page_count, chunks = await loop.run_in_executor(pool, prepare_document, *args)
+            else:
+                page_count, chunks = await asyncio.to_thread(prepare_document, *args)
+            if not chunks:
+                raise IngestionError(f"No text could be extracted from {source}")
+
+            # Chunks already in the index are neither embedded nor re-added
+            new_chunks = [chunk for chunk in chunks if revision.assign(chunk)]
+            return _Document(source, content_hash, page_count, revision, new_chunks)
+        except BrokenExecutor:
+            # A dead extraction pool would fail every document after this one
+            raise
+        except Exception as e:
+            self.stats.failed += 1
+            if len(self.stats.errors) < _MAX_ERRORS:
+                self.stats.errors[source] = str(e)
+            logger.warning(f"Skipping {source}: {e}")
+            return None
+        finally:
+            if temporary:
+                os.remove(file_path)
+
+    async def _index(self, prepared: asyncio.Queue):
+        group: List[_Document] = []
+        in_flight: deque = deque()
+
+        def embed(group: List[_Document]):
+            texts = [chunk["text"] for document in group for chunk in document.chunks]
+            task = asyncio.create_task(embed_texts_async(texts)) if texts else None
+            in_flight.append((group, task))
+
+        try:
+            while (document := await prepared.get()) is not None:
+                group.append(document)
+                if len(group) >= self.documents_per_write:
+                    embed(group)
+                    group = []
+                    if len(in_flight) >= self.groups_in_flight:
+                        await self._commit(*in_flight.popleft())
+            if group:
+                embed(group)
+            while in_flight:
+                await self._commit(*in_flight.popleft())
+        finally:
+            for _, task in in_flight:
+                if task is not None:
+                    task.cancel()
+
+    async def _commit(self, group: List[_Document], embed_task: Optional[asyncio.Task]):
+        embeddings = await embed_task if embed_task is not None else []
+
+        indexed = [document for document in group if document.revision is not None]
+        texts: List[str] = []
+        metadata: List[dict] = []
+        retire: Dict[str, Optional[List[int]]] = {}
+        for document in indexed:
+            texts.extend(chunk.pop("text") for chunk in document.chunks)
+            metadata.extend(chunk_metadata(
+                document.chunks, document.source, self.document_metadata, self._token_encoding
+            ))
+            revision = document.revision
+            # A document new to the registry replaces any chunks of the same name
+            retire[document.source] = revision.retired() if revision.incremental else None
+
+        if indexed:
+            await asyncio.to_thread(self.faiss_store.write_batch, embeddings, texts, metadata, retire)
+            if self.registry is not None:
+                await asyncio.to_thread(self._register, indexed)
+        if self.checkpoint is not None:
+            await asyncio.to_thread(self.checkpoint.record, [
+                {"source": document.source, "chunks": len(document.chunks)} for document in group
+            ])
+
+        for document in indexed:
+            kept = document.revision.kept
+            self.stats.indexed += 1
+            self.stats.pages += document.page_count
+            self.stats.chunks += len(document.chunks)
+            self.stats.chunks_reused += kept
+            INGEST_PAGES.inc(document.page_count)
+            INGEST_CHUNKS.inc(len(document.chunks))
+            INGEST_CHUNKS_REUSED.inc(kept)
+            INGEST_DOCUMENTS.inc(outcome="incremental" if document.revision.incremental else "full")
+
+        if indexed and self.on_commit is not None:
+            self.on_commit([document.source for document in indexed])
+        if time.perf_counter() - self._last_progress >= PROGRESS_INTERVAL:
+            self._log_progress("progress")
+
+    def _register(self, documents: List[_Document]):
+        for document in documents:
+            self.registry.put(
+                document.source,
+                document.content_hash,
+                self.document_metadata,
+                document.revision.chunks,
+                document.revision.next_id,
+            )
+
+    def _log_progress(self, label: str):
+        self._last_progress = time.perf_counter()
+        stats = self.stats.as_dict()
+        logger.info(
+            f"Bulk ingestion {label}: {stats['documents_indexed']} documents indexed, "
+            f"{stats['documents_unchanged']} unchanged, {stats['documents_failed']} failed, "
+            f"{stats['chunks_indexed']} chunks in {stats['elapsed_seconds']:.1f}s "
+            f"({stats['documents_per_second']:.1f} docs/s, {stats['pages_per_second']:.1f} pages/s, "
+            f"{stats['chunks_per_second']:.1f} chunks/s)"
+        )
@@ -0,0 +1,368 @@
+import json
+import mmap
+import os
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class ChunkStore:
+    """
+    Append-only columnar store for chunk texts and metadata.
+
+    Rows live in flat files under ``directory`` and are read through mmap,
+    so only the rows a search returns are ever decoded and several worker
+    processes share the same pages through the OS page cache:
+
+    - ``text.bin`` / ``text.end``   UTF-8 blob and uint64 end offsets
+    - ``source.col``               uint32 ids into the interned source table
+    - ``chunk_id.col``             int64 chunk ids
+    - ``id.col``                   int64 vector ids, ascending
+    - ``extra.bin`` / ``extra.end`` JSON for any other metadata keys
+    - ``sources.jsonl``            interned source names, one per line
+
+    Rows are addressed by the id of their vector in the FAISS index. Ids are
+    handed out in increasing order (``next_id``) and never reused, so a row
+    is found by binary search in ``id.col``. Rows of removed chunks stay in
+    place until the owner copies the live ones into a fresh store with
+    ``copy_to``. Stores written before ``id.col`` existed have no such
+    column: there the row number is the id, until the first flush adds it.
+
+    Appended rows stay in memory until ``flush`` writes them. The returned
+    state (row and source counts, next id) must be committed by the caller;
+    bytes past the committed state are ignored on open and overwritten by the
+    next flush.
+
+    The store does no locking of its own. ``flush`` is split into
+    ``write_pending`` (disk I/O, invisible to readers) and ``publish`` (swap
+    in the new maps) so the owner only excludes readers for the swap.
+    """
+
+    def __init__(self, directory: Optional[str] = None, state: Optional[dict] = None):
+        self.directory = directory
+        state = state or {}
+        self._count = state.get("count", 0)
+        self._committed_sources = state.get("sources", 0)
+        self._next_id = state.get("next_id", self._count)
+        # Set for stores written before id.col: the row number is the id
+        self._ids_are_rows = "next_id" not in state and self._count > 0
+
+        self.sources: List[str] = []
+        self._source_ids: Dict[str, int] = {}
+
+        self._pending_texts: List[str] = []
+        self._pending_metadata: List[dict] = []
+        self._pending_ids: List[int] = []
+
+        self._maps: List[mmap.mmap] = []
+        self._text_end = self._source_col = self._chunk_id_col = self._extra_end = None
+        self._id_col = None
+        self._text_blob = self._extra_blob = None
+
+        if directory:
+            self._load_sources()
+            self._open_columns()
+
+    # -------------------------
+    # READ
+    # -------------------------
+    def __len__(self):
+        """Number of rows, including those of removed chunks not yet dropped."""
+        return self._count + len(self._pending_texts)
+
+    @property
+    def next_id(self) -> int:
+        """Id for the next appended row."""
+        return self._pending_ids[-1] + 1 if self._pending_ids else self._next_id
+
+    def get(self, idx: int) -> Tuple[str, dict]:
+        """Text and metadata of the row with id ``idx``; KeyError if absent."""
+        row = self._row(idx)
+        if row >= self._count:
+            pending = row - self._count
+            return self._pending_texts[pending], self._pending_metadata[pending]
+
+        start = int(self._text_end[row - 1]) if row else 0
+        text = bytes(self._text_blob[start:int(self._text_end[row])]).decode("utf-8")
+
+        metadata = self._extra(row)
+
+        source_id = int(self._source_col[row])
+        if source_id != _NO_SOURCE:
+            metadata["source"] = self.sources[source_id]
+        chunk_id = int(self._chunk_id_col[row])
+        if chunk_id != _NO_CHUNK_ID:
+            metadata["chunk_id"] = chunk_id
+
+        return text, metadata
+
+    def values_of(self, ids: np.ndarray, field: str) -> List[Any]:
+        """
+        Value of metadata ``field`` (None if absent) for each row in ``ids``,
+        without decoding texts. ``source`` is read from its column alone.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if field == "source":
+            return self._sources_of(ids)
+
+        values = []
+        for idx in ids.tolist():
+            row = self._row(idx)
+            if row >= self._count:
+                values.append(self._pending_metadata[row - self._count].get(field))
+            elif field == "chunk_id":
+                chunk_id = int(self._chunk_id_col[row])
+                values.append(None if chunk_id == _NO_CHUNK_ID else chunk_id)
+            else:
+                values.append(self._extra(row).get(field))
+        return values
+
+    def ids(self) -> np.ndarray:
+        """Id of every row, ascending."""
+        if self._ids_are_rows:
+            committed = np.arange(self._count, dtype=np.int64)
+        else:
+            committed = np.array(self._id_col if self._count else [], dtype=np.int64)
+        return np.concatenate([committed, np.array(self._pending_ids, dtype=np.int64)])
+
+    def pending(self) -> Tuple[List[str], List[dict], List[int]]:
+        """Texts, metadata and ids of the rows not flushed yet."""
+        return self._pending_texts, self._pending_metadata, self._pending_ids
+
+    def _row(self, idx: int) -> int:
+        if self._pending_ids and idx >= self._pending_ids[0]:
+            pending = bisect_left(self._pending_ids, idx)
+            if pending < len(self._pending_ids) and self._pending_ids[pending] == idx:
+                return self._count + pending
+        elif self._ids_are_rows:
+            if 0 <= idx < self._count:
+                return idx
+        elif self._count:
+            row = int(np.searchsorted(self._id_col, idx))
+            if row < self._count and self._id_col[row] == idx:
+                return row
+        raise KeyError(idx)
+
+    def _committed_rows(self, ids: np.ndarray) -> np.ndarray:
+        if self._ids_are_rows:
+            rows = ids
+            found = (ids >= 0) & (ids < self._count)
+        elif self._count:
+            rows = np.searchsorted(self._id_col, ids)
+            found = rows < self._count
+            found[found] = self._id_col[rows[found]] == ids[found]
+        else:
+            rows, found = ids, np.zeros(len(ids), dtype=bool)
+        if not found.all():
+            raise KeyError(int(ids[~found][0]))
+        return rows
+
+    def _sources_of(self, ids: np.ndarray) -> List[Optional[str]]:
+        if self._pending_ids:
+            committed = ids < self._pending_ids[0]
+        else:
+            committed = np.ones(len(ids), dtype=bool)
+        result: List[Optional[str]] = [None] * len(ids)
+
+        if committed.any():
+            source_ids = self._source_col[self._committed_rows(ids[committed])]
+            for position, source_id in zip(np.flatnonzero(committed), source_ids.tolist()):
+                if source_id != _NO_SOURCE:
+                    result[position] = self.sources[source_id]
+
+        for position in np.flatnonzero(~committed):
+            pending = self._row(int(ids[position])) - self._count
+            result[position] = self._pending_metadata[pending].get("source")
+        return result
+
+    def _extra(self, row: int) -> dict:
+        start = int(self._extra_end[row - 1]) if row else 0
+        end = int(self._extra_end[row])
+        if end > start:
+            return json.loads(bytes(self._extra_blob[start:end]))
+        return {}
+
+    # -------------------------
+    # WRITE
+    # -------------------------
+    def append(self, texts: List[str], metadata: List[dict], ids: Optional[Sequence[int]] = None):
+        """Add rows under ``ids`` (default: the next ones), which must exceed every id held."""
+        if ids is None:
+            ids = range(self.next_id, self.next_id + len(texts))
+        self._pending_texts.extend(texts)
+        self._pending_metadata.extend(metadata)
+        self._pending_ids.extend(int(idx) for idx in ids)
+
+    def flush(self) -> dict:
+        """Write pending rows to disk and return the state to commit."""
+        self.publish(self.write_pending())
+        return self.state()
+
+    def write_pending(self) -> int:
+        """Append pending rows to the column files; returns the rows written."""
+        if not self.directory or not self._pending_texts:
+            return 0
+        return self._write_pending()
+
+    def publish(self, written: int):
+        """Make ``written`` rows from ``write_pending`` readable through mmap."""
+        if not written:
+            return
+        self.close()
+        self._count += written
+        self._next_id = max(self._next_id, self._pending_ids[written - 1] + 1)
+        self._ids_are_rows = False
+        del self._pending_texts[:written]
+        del self._pending_metadata[:written]
+        del self._pending_ids[:written]
+        self._open_columns()
+
+    def state(self) -> dict:
+        if self._ids_are_rows:
+            return {"count": self._count, "sources": len(self.sources)}
+        return {"count": self._count, "sources": len(self.sources), "next_id": self._next_id}
+
+    def copy_to(self, directory: str, ids: Optional[np.ndarray] = None) -> dict:
+        """
+        Write every row, or only those of ``ids``, into a fresh store at
+        ``directory`` under the same ids. The copy hands out ids after this
+        store's, so ids of dropped rows are not reused.
+        """
+        target = ChunkStore(directory)
+        target._next_id = self.next_id
+        for idx in (self.ids() if ids is None else np.sort(ids)).tolist():
+            text, metadata = self.get(idx)
+            target.append([text], [metadata], [idx])
+        state = target.flush()
+        target.close()
+        return state
+
+    def close(self):
+        # Drop the views first so the maps have no exported buffers left
+        self._text_end = self._source_col = self._chunk_id_col = self._extra_end = None
+        self._id_col = None
+        self._text_blob = self._extra_blob = None
+        for m in self._maps:
+            try:
+                m.close()
+            except BufferError:
+                pass  # still referenced by a reader; closed when released
+        self._maps = []
+
+    def _write_pending(self) -> int:
+        texts = [t.encode("utf-8") for t in self._pending_texts]
+        extras, source_ids, chunk_ids = [], [], []
+        for metadata in self._pending_metadata:
+            extra = dict(metadata)
+            source = extra.pop("source", None)
+            chunk_id = extra.pop("chunk_id", None)
+            source_ids.append(_NO_SOURCE if source is None else self._intern(source))
+            chunk_ids.append(_NO_CHUNK_ID if chunk_id is None else chunk_id)
+            extras.append(json.dumps(extra).encode("utf-8") if extra else b"")
+
+        text_base = int(self._text_end[-1]) if self._count else 0
+        extra_base = int(self._extra_end[-1]) if self._count else 0
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Drop anything written after the last committed state, then append
+        self._append_file("text.bin", b"".join(texts), text_base)
+        self._append_file(
+            "text.end",
+            (text_base + np.cumsum([len(t) for t in texts], dtype=np.uint64)).tobytes(),
+            self._count * 8,
+        )
+        self._append_file(
+            "source.col", np.array(source_ids, dtype=np.uint32).tobytes(), self._count * 4
+        )
+        self._append_file(
+            "chunk_id.col", np.array(chunk_ids, dtype=np.int64).tobytes(), self._count * 8
+        )
+        ids = np.array(self._pending_ids, dtype=np.int64).tobytes()
+        if self._ids_are_rows:
+            # First flush since id.col was added: existing rows get theirs
+            self._append_file("id.col", np.arange(self._count, dtype=np.int64).tobytes() + ids, 0)
+        else:
+            self._append_file("id.col", ids, self._count * 8)
+        self._append_file("extra.bin", b"".join(extras), extra_base)
+        self._append_file(
+            "extra.end",
+            (extra_base + np.cumsum([len(e) for e in extras], dtype=np.uint64)).tobytes(),
+            self._count * 8,
+        )
+        self._write_sources()
+        return len(texts)
+
+    def _append_file(self, name: str, data: bytes, committed_size: int):
+        path = os.path.join(self.directory, name)
+        with open(path, "ab") as f:
+            f.truncate(committed_size)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    # -------------------------
+    # SOURCE INTERNING
+    # -------------------------
+    def _intern(self, source: str) -> int:
+        source_id = self._source_ids.get(source)
+        if source_id is None:
+            source_id = len(self.sources)
+            self.sources.append(source)
+            self._source_ids[source] = source_id
+        return source_id
+
+    def _load_sources(self):
+        path = os.path.join(self.directory, "sources.jsonl")
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if len(self.sources) == self._committed_sources:
+                    break
+                self._intern(json.loads(line))
+
+    def _write_sources(self):
+        new_sources = self.sources[self._committed_sources:]
+        if not new_sources and os.path.exists(os.path.join(self.directory, "sources.jsonl")):
+            return
+        # The source table is tiny, so it is simply rewritten
+        path = os.path.join(self.directory, "sources.jsonl")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            for source in self.sources:
+                f.write(json.dumps(source) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+        self._committed_sources = len(self.sources)
+
+    # -------------------------
+    # MMAP
+    # -------------------------
+    def _open_columns(self):
+        if not self._count:
+            return
+        self._text_end = self._map_array("text.end", np.uint64, self._count)
+        self._source_col = self._map_array("source.col", np.uint32, self._count)
+        self._chunk_id_col = self._map_array("chunk_id.col", np.int64, self._count)
+        self._extra_end = self._map_array("extra.end", np.uint64, self._count)
+        if not self._ids_are_rows:
+            self._id_col = self._map_array("id.col", np.int64, self._count)
+        self._text_blob = self._map_bytes("text.bin", int(self._text_end[-1]))
+        self._extra_blob = self._map_bytes("extra.bin", int(self._extra_end[-1]))
+
+    def _map_array(self, name: str, dtype, count: int) -> np.ndarray:
+        buffer = self._map_bytes(name, count * np.dtype(dtype).itemsize)
+        return np.frombuffer(buffer, dtype=dtype, count=count)
+
+    def _map_bytes(self, name: str, length: int):
+        if length == 0:
+            return b""
+        with open(os.path.join(self.directory, name), "rb") as f:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(m)
+        return memoryview(m)[:length]
+
+
+_NO_SOURCE = np.iinfo(np.uint32).max
+_NO_CHUNK_ID = np.iinfo(np.int64).min
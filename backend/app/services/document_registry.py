@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Read size when hashing uploaded files
+_HASH_BLOCK = 1024 * 1024
+
+
+def file_hash(path: str) -> str:
+    """sha256 of the file's bytes, as hex."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(_HASH_BLOCK):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_hash(chunk: dict, token_encoding: str) -> str:
+    """
+    Identity of a chunk for re-ingestion: its text, the pages it spans and
+    the tokenizer its ``token_count`` was measured with. A chunk whose hash
+    is unchanged keeps its vector and metadata.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{chunk['page_start']}:{chunk['page_end']}:{token_encoding}\0".encode("utf-8"))
+    digest.update(chunk["text"].encode("utf-8"))
+    return digest.hexdigest()
+
+
+class DocumentRegistry:
+    """
+    SQLite record of ingested documents: the content hash of each file, the
+    document metadata it was indexed with and the hash of every chunk,
+    keyed by ``chunk_id``. ingest_document checks uploads against it, so an
+    unchanged file is skipped and a revised one re-embeds only the chunks
+    that changed. ``next_chunk_id`` is the document's high-water mark: the
+    id its next new chunk gets, above every id any version has used.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " source TEXT PRIMARY KEY,"
+            " content_hash TEXT NOT NULL,"
+            " metadata TEXT,"
+            " chunk_count INTEGER NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " next_chunk_id INTEGER)"
+        )
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(documents)")}
+        if "next_chunk_id" not in columns:
+            # Registries from before the high-water mark; get() falls back to the ids held
+            self._conn.execute("ALTER TABLE documents ADD COLUMN next_chunk_id INTEGER")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS documents_hash ON documents (content_hash)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " source TEXT NOT NULL,"
+            " chunk_id INTEGER NOT NULL,"
+            " chunk_hash TEXT NOT NULL,"
+            " PRIMARY KEY (source, chunk_id)) WITHOUT ROWID"
+        )
+
+    def get(self, source: str) -> Optional[dict]:
+        """
+        The document's record with its ``chunks`` as {chunk_id: chunk_hash}
+        and its ``next_chunk_id``, or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM documents WHERE source = ?", (source,)
+            ).fetchone()
+            if row is None:
+                return None
+            chunks = self._conn.execute(
+                "SELECT chunk_id, chunk_hash FROM chunks WHERE source = ?", (source,)
+            ).fetchall()
+
+        document = dict(row)
+        document["metadata"] = json.loads(row["metadata"]) if row["metadata"] else None
+        document["chunks"] = {chunk["chunk_id"]: chunk["chunk_hash"] for chunk in chunks}
+        if document["next_chunk_id"] is None:
+            document["next_chunk_id"] = max(document["chunks"], default=-1) + 1
+        return document
+
+    def find(self, content_hash: str) -> List[str]:
+        """Sources whose file has exactly this content."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source FROM documents WHERE content_hash = ?", (content_hash,)
+            ).fetchall()
+        return [row["source"] for row in rows]
+
+    def put(
+        self,
+        source: str,
+        content_hash: str,
+        metadata: Optional[dict],
+        chunks: Dict[int, str],
+        next_chunk_id: Optional[int] = None,
+    ):
+        """
+        Record ``source`` as indexed from this content, with {chunk_id:
+        chunk_hash}. ``next_chunk_id`` defaults to one past the highest id.
+        """
+        if next_chunk_id is None:
+            next_chunk_id = max(chunks, default=-1) + 1
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO documents"
+                    " (source, content_hash, metadata, chunk_count, updated_at, next_chunk_id)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        source,
+                        content_hash,
+                        json.dumps(metadata) if metadata else None,
+                        len(chunks),
+                        time.time(),
+                        next_chunk_id,
+                    ),
+                )
+                self._conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+                self._conn.executemany(
+                    "INSERT INTO chunks (source, chunk_id, chunk_hash) VALUES (?, ?, ?)",
+                    [(source, chunk_id, digest) for chunk_id, digest in chunks.items()],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def remove(self, source: str):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM documents WHERE source = ?", (source,))
+                self._conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
@@ -0,0 +1,190 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different inputs share an entry."""
+    return " ".join(text.split())
+
+
+def cache_key(model: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache keyed by (model, normalized text).
+
+    Two tiers: an in-process LRU of float32 vectors, backed by a SQLite file
+    that survives restarts and is shared by every worker. Both tiers are
+    size-bounded; the disk tier evicts least-recently-used rows.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        memory_items: int = 10000,
+        disk_items: int = 200000,
+    ):
+        self.path = path
+        self.memory_items = memory_items
+        self.disk_items = disk_items
+
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_count = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if path:
+            self._open(path)
+
+    # -------------------------
+    # LOOKUP
+    # -------------------------
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        keys = [cache_key(model, text) for text in texts]
+
+        with self._lock:
+            found: Dict[bytes, np.ndarray] = {}
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+
+            from_disk: Dict[bytes, np.ndarray] = {}
+            if self._conn is not None:
+                from_disk = self._read_disk([k for k in set(keys) if k not in found])
+                for key, vector in from_disk.items():
+                    self._remember(key, vector)
+
+            results = []
+            for key in keys:
+                if key in found:
+                    self.memory_hits += 1
+                    results.append(found[key])
+                elif key in from_disk:
+                    self.disk_hits += 1
+                    results.append(from_disk[key])
+                else:
+                    self.misses += 1
+                    results.append(None)
+
+        return results
+
+    def put_many(self, model: str, texts: List[str], vectors: List[np.ndarray]):
+        rows = []
+        now = int(time.time())
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = cache_key(model, text)
+                # A copy: rows of a batch array would keep the whole batch alive
+                vector = np.array(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, model, vector.tobytes(), now))
+
+            if self._conn is not None and rows:
+                self._write_disk(rows)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_items": len(self._memory),
+            "disk_items": self._disk_count,
+        }
+
+    # -------------------------
+    # MEMORY TIER
+    # -------------------------
+    def _remember(self, key: bytes, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    # -------------------------
+    # DISK TIER
+    # -------------------------
+    def _open(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._disk_count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _read_disk(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found: Dict[bytes, np.ndarray] = {}
+        # SQLite caps bound parameters, so look keys up in slices
+        for i in range(0, len(keys), 500):
+            part = keys[i:i + 500]
+            placeholders = ",".join("?" * len(part))
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+            if rows:
+                hit_keys = [key for key, _ in rows]
+                self._conn.execute(
+                    "UPDATE embeddings SET last_used = ? "
+                    f"WHERE key IN ({','.join('?' * len(hit_keys))})",
+                    [int(time.time())] + hit_keys,
+                )
+        return found
+
+    def _write_disk(self, rows: List[tuple]):
+        self._conn.execute("BEGIN")
+        added = self._conn.executemany(
+            "INSERT OR IGNORE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+            rows,
+        ).rowcount
+        if added < len(rows):
+            # Keys already stored hold the same vector; only their recency changes
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(last_used, key) for key, _, _, last_used in rows],
+            )
+        self._conn.execute("COMMIT")
+        # Counted once at open and kept up to date here, never rescanned
+        self._disk_count += added
+
+        if self._disk_count > self.disk_items:
+            # Evict down to 90% so eviction does not run on every insert
+            excess = self._disk_count - int(self.disk_items * 0.9)
+            evicted = self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                " SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,),
+            ).rowcount
+            self._disk_count -= evicted
+            logger.info(f"Evicted {evicted} embeddings from the disk cache")
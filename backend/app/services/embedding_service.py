@@ -1,16 +1,97 @@
-from openai import OpenAI
-from app.core.config import OPENAI_API_KEY
-from typing import List
+from app.core.config import (
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MEMORY_ITEMS,
+    EMBEDDING_CACHE_DISK_ITEMS,
+    EMBEDDING_BATCH_MAX_TOKENS,
+    EMBEDDING_BATCH_MAX_ITEMS,
+    EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_RATE_LIMIT_RPM,
+    EMBEDDING_RATE_LIMIT_TPM,
+    EMBEDDING_REQUEST_DIMENSIONS,
+)
+from app.core.metrics import EMBEDDING_REQUEST_SECONDS
+from app.services.embedding_cache import EmbeddingCache
+from app.services.openai_client import get_async_openai, get_openai, is_retryable
+from app.services.rate_limiter import RateLimiter, parse_reset_duration
+from app.utils.tokenizer import count_tokens_batch
+from tenacity import (
+    retry,
+    stop_after_attempt,
+    wait_exponential,
+    retry_if_exception
+)
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+import base64
 import logging
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
-client = OpenAI(api_key=OPENAI_API_KEY)
 
-def embed_texts(
-    texts: List[str], 
-    model: str = "text-embedding-3-small",
-    batch_size: int = 64
-) -> List[List[float]]:
+_embedding_cache: Optional[EmbeddingCache] = None
+_rate_limiter = RateLimiter(
+    requests_per_minute=EMBEDDING_RATE_LIMIT_RPM,
+    tokens_per_minute=EMBEDDING_RATE_LIMIT_TPM,
+)
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    global _embedding_cache
+
+    if EMBEDDING_CACHE_ENABLED and _embedding_cache is None:
+        _embedding_cache = EmbeddingCache(
+            path=EMBEDDING_CACHE_PATH or None,
+            memory_items=EMBEDDING_CACHE_MEMORY_ITEMS,
+            disk_items=EMBEDDING_CACHE_DISK_ITEMS,
+        )
+
+    return _embedding_cache
+
+
+def _request_options(model: str) -> dict:
+    """Extra embeddings.create arguments: shortened text-embedding-3 vectors."""
+    if EMBEDDING_REQUEST_DIMENSIONS and model.startswith("text-embedding-3"):
+        return {"dimensions": EMBEDDING_REQUEST_DIMENSIONS}
+    return {}
+
+
+def _cache_model(model: str) -> str:
+    """Cache namespace; shortened vectors must not be served as full ones."""
+    dimensions = _request_options(model).get("dimensions")
+    return f"{model}@{dimensions}" if dimensions else model
+
+
+def plan_batches(
+    texts: List[str],
+    model: str,
+    max_tokens: int = EMBEDDING_BATCH_MAX_TOKENS,
+    max_items: int = EMBEDDING_BATCH_MAX_ITEMS,
+) -> List[Tuple[List[str], int]]:
+    """
+    Pack texts, in order, into request batches bounded by tiktoken count and
+    item count. Returns ``(batch, batch_tokens)`` pairs.
+    """
+    batches = []
+    current: List[str] = []
+    current_tokens = 0
+
+    for text, tokens in zip(texts, count_tokens_batch(texts, model)):
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            batches.append((current, current_tokens))
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+
+    if current:
+        batches.append((current, current_tokens))
+    return batches
+
+
+def _prepare(texts: List[str], model: str):
+    """Validate input and resolve cache hits; returns what still needs the API."""
     if not texts:
         raise ValueError("texts list cannot be empty")
 
@@ -18,17 +99,173 @@ def embed_texts(
     if not valid_texts:
         raise ValueError("No valid texts to embed")
 
-    embeddings = []
+    cache = get_embedding_cache()
+    if cache is not None:
+        embeddings = cache.get_many(_cache_model(model), valid_texts)
+    else:
+        embeddings = [None] * len(valid_texts)
+
+    # Only texts missing from the cache go to the API, each one once and
+    # exactly as given: normalization only builds the cache key
+    missing = list(dict.fromkeys(
+        text
+        for text, embedding in zip(valid_texts, embeddings)
+        if embedding is None
+    ))
+    return valid_texts, embeddings, missing
+
+
+def _assemble(valid_texts, embeddings, missing, fetched: Dict[str, np.ndarray]) -> np.ndarray:
+    cache = get_embedding_cache()
+    if cache is not None and len(missing) < len(valid_texts):
+        logger.info(
+            f"Embedding cache served {len(valid_texts) - len(missing)}/{len(valid_texts)} texts"
+        )
 
-    for i in range(0, len(valid_texts), batch_size):
-        batch = valid_texts[i:i + batch_size]
+    rows = [
+        fetched[text] if embedding is None else embedding
+        for text, embedding in zip(valid_texts, embeddings)
+    ]
+    # One contiguous float32 matrix, handed to FAISS without conversion
+    out = np.empty((len(rows), len(rows[0])), dtype=np.float32)
+    for i, row in enumerate(rows):
+        out[i] = row
+    return out
 
-        response = client.embeddings.create(
+
+def _decode(data) -> np.ndarray:
+    """
+    (n, d) float32 rows of an embeddings response. Requested as base64, each
+    vector is decoded straight into its row, never through Python floats.
+    """
+    out = None
+    for item in data:
+        if isinstance(item.embedding, str):
+            vector = np.frombuffer(base64.b64decode(item.embedding), dtype="<f4")
+        else:
+            # Servers that ignore encoding_format answer with float lists
+            vector = item.embedding
+        if out is None:
+            out = np.empty((len(data), len(vector)), dtype=np.float32)
+        out[item.index] = vector
+    return out
+
+
+def _remember(model: str, batch: List[str], batch_embeddings: np.ndarray):
+    cache = get_embedding_cache()
+    if cache is not None:
+        cache.put_many(_cache_model(model), batch, batch_embeddings)
+
+
+@retry(
+    retry=retry_if_exception(is_retryable),
+    stop=stop_after_attempt(EMBEDDING_MAX_RETRIES),
+    wait=wait_exponential(multiplier=1, min=1, max=20),
+    reraise=True
+)
+def _embed_batch(batch: List[str], model: str) -> np.ndarray:
+    with EMBEDDING_REQUEST_SECONDS.time():
+        response = get_openai().embeddings.create(
             model=model,
-            input=batch
+            input=batch,
+            encoding_format="base64",
+            **_request_options(model)
         )
+    return _decode(response.data)
+
+
+def embed_texts(
+    texts: List[str],
+    model: str = "text-embedding-3-small",
+    batch_size: int = EMBEDDING_BATCH_MAX_ITEMS
+) -> np.ndarray:
+    """
+    Embeddings of the non-blank ``texts`` as one C-contiguous float32
+    ``(n, dimension)`` array, which FaissStore indexes without copying.
+    """
+    valid_texts, embeddings, missing = _prepare(texts, model)
+    fetched = {}
+
+    for batch, _ in plan_batches(missing, model, max_items=batch_size):
+        batch_embeddings = _embed_batch(batch, model)
+        fetched.update(zip(batch, batch_embeddings))
+        _remember(model, batch, batch_embeddings)
+
+        logger.info(f"Embedded {len(fetched)}/{len(missing)} uncached texts")
+
+    return _assemble(valid_texts, embeddings, missing, fetched)
+
+
+@retry(
+    retry=retry_if_exception(is_retryable),
+    stop=stop_after_attempt(EMBEDDING_MAX_RETRIES),
+    wait=wait_exponential(multiplier=1, min=1, max=20),
+    reraise=True
+)
+async def _embed_batch_async(batch: List[str], tokens: int, model: str) -> np.ndarray:
+    from openai import RateLimitError
+
+    await _rate_limiter.acquire(tokens)
+
+    try:
+        # Retries are done per batch here, in step with the rate limiter
+        with EMBEDDING_REQUEST_SECONDS.time():
+            raw = await get_async_openai(max_retries=0).embeddings.with_raw_response.create(
+                model=model,
+                input=batch,
+                encoding_format="base64",
+                **_request_options(model)
+            )
+    except RateLimitError as e:
+        _rate_limiter.update_from_headers(e.response.headers)
+        retry_after = parse_reset_duration(e.response.headers.get("retry-after"))
+        if retry_after:
+            _rate_limiter.penalize(retry_after)
+        raise
+
+    _rate_limiter.update_from_headers(raw.headers)
+    response = raw.parse()
+    return _decode(response.data)
+
+
+async def embed_texts_async(
+    texts: List[str],
+    model: str = "text-embedding-3-small",
+    max_concurrency: int = EMBEDDING_MAX_CONCURRENCY,
+    on_progress: Optional[Callable[[int, int], None]] = None
+) -> np.ndarray:
+    """
+    Async ``embed_texts``: token-packed batches are sent with up to
+    ``max_concurrency`` requests in flight, paced by the shared rate limiter
+    and retried per batch; if one batch still fails, the rest are cancelled
+    and its error is raised. Output rows match input order.
+    ``on_progress(done, total)`` is called as uncached texts complete.
+    """
+    # Cache lookups and tokenization are blocking; keep them off the event loop
+    valid_texts, embeddings, missing = await asyncio.to_thread(_prepare, texts, model)
+    batches = await asyncio.to_thread(plan_batches, missing, model)
+    fetched = {}
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(batch: List[str], tokens: int):
+        async with semaphore:
+            batch_embeddings = await _embed_batch_async(batch, tokens, model)
+        fetched.update(zip(batch, batch_embeddings))
+        # SQLite writes; like the lookups in _prepare, kept off the event loop
+        await asyncio.to_thread(_remember, model, batch, batch_embeddings)
+        logger.info(f"Embedded {len(fetched)}/{len(missing)} uncached texts")
+        if on_progress:
+            on_progress(len(fetched), len(missing))
 
-        embeddings.extend([item.embedding for item in response.data])
-        logger.info(f"Embedded {len(embeddings)}/{len(valid_texts)} texts")
+    tasks = [asyncio.create_task(run(batch, tokens)) for batch, tokens in batches]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # A batch that failed its retries fails the call: stop the others
+        # rather than leave them spending the rate limit in the background
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
 
-    return embeddings
+    return _assemble(valid_texts, embeddings, missing, fetched)
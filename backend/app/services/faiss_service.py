@@ -1,35 +1,192 @@
 import faiss
 import numpy as np
+import json
+import logging
 import os
 import pickle
-from typing import List, Tuple, Optional
+import shutil
+import struct
+import threading
+import zlib
+from typing import Any, Collection, Dict, List, Tuple, Optional, Sequence, Set
+
+from app.core.concurrency import RWLock, ReadOnlyStoreError, StoreLock, StoreLockedError
+from app.services.chunk_store import ChunkStore
+from app.services.lexical_index import LexicalIndex, analyze
+from app.services.metadata_index import MetadataIndex
+from app.services.index_factory import (
+    IndexOptions,
+    apply_search_params,
+    build_flat_index,
+    build_index,
+    build_trained_index,
+    describe,
+    empty_like,
+    index_ids,
+    index_vectors,
+    matches,
+    memory_bytes,
+    needs_migration,
+    search_params,
+    supports_removal,
+    with_ids,
+)
+
+logger = logging.getLogger(__name__)
+
+# Append-log record header: magic, payload length, crc32 of payload
+LOG_MAGIC = b"FLOG"
+_LOG_HEADER = struct.Struct("<4sQI")
+
+# What a read-only store takes over from a fresh load of a new generation
+_FOLLOWED_STATE = (
+    "index", "_mapped", "dimension", "chunks", "seq", "generation", "_base_seq",
+    "_tombstones", "_metadata", "lexical", "_log_inode", "_log_offset",
+)
+
+# Compiled filter selectors kept between index changes
+_SELECTOR_CACHE_SIZE = 256
+_MISSING = object()
 
 
 class FaissStore:
+    """
+    FAISS index plus chunk texts/metadata with append-only persistence.
+
+    On-disk layout for ``index_path = data/faiss_index``:
+
+    - ``faiss_index.manifest``   JSON commit point naming the base snapshot
+    - ``faiss_index.<gen>.index`` base FAISS index of generation ``gen``
+    - ``faiss_index.<gen>.lexical/`` BM25 postings of generation ``gen``
+    - ``faiss_index.<gen>.chunks/`` mmap'd chunk texts/metadata (see ChunkStore);
+      ``faiss_index.chunks/`` until a compaction first drops removed rows
+    - ``faiss_index.log``         records appended since the base snapshot
+
+    ``add`` only appends the new batch to the log. The log is folded into a
+    new base generation by a background compaction once it grows past
+    ``compact_threshold_bytes``; startup loads the base and replays the log.
+
+    ``index_options`` selects flat, IVF-Flat, IVF-PQ or HNSW, float16 / int8
+    storage and PCA reduction. Layouts that need training start out flat and
+    are trained and migrated by the same background thread once enough
+    vectors exist; ``convert`` rebuilds any index into another layout.
+
+    Vectors are keyed by the id of their chunk store row (IVF lists hold the ids
+    natively, flat and HNSW indexes are wrapped in an IndexIDMap2), and an
+    inverted MetadataIndex maps values of ``filter_fields`` (always including
+    ``source``) to live ids. ``remove(source)``, ``replace(source, ...)`` and
+    ``update(source, ...)`` therefore cost O(document), and ``filters`` on search are resolved to an
+    IDSelector that FAISS applies while scanning. Removed ids become
+    tombstones that searches exclude the same way; they are purged from the
+    index by the background compaction once they exceed
+    ``tombstone_compact_ratio`` of the index (HNSW, which cannot delete in
+    place, is rebuilt from its live vectors). Their chunk store rows are
+    dropped the same way: once removed rows exceed that ratio of the chunk
+    store, the generation gets a fresh chunk store holding only live rows.
+
+    With ``lexical_index`` the same chunks are also kept in a BM25
+    LexicalIndex under the same ids, updated by every add/remove and
+    snapshotted with each generation. ``dense_hits`` and ``lexical_hits``
+    return ranked ids for either side and ``decode`` turns ids into results,
+    so callers can query both and fuse the rankings (see retrieval).
+
+    Concurrency: ``_lock`` admits a single writer at a time, and ``_rw``
+    separates searches from in-memory mutation. Writers do their slow work
+    (log fsync, chunk file appends, index training, serialisation) holding
+    only ``_lock``, then take the write side of ``_rw`` just long enough to
+    apply the batch or swap in the prepared index/chunk maps. Searches take
+    the read side, so they run in parallel (FAISS releases the GIL) and
+    always see a consistent index and chunk store.
+
+    Across processes, a store at ``index_path`` has one writer: the process
+    holding an exclusive flock on ``<index_path>.lock``, taken on open
+    (StoreLockedError if another process has it). Other processes open it
+    with ``read_only`` and call ``refresh`` to follow the writer: log
+    records it appended are applied in memory, and a new generation is
+    loaded afresh once it compacts. Read-only stores never write a file.
+    """
+
     def __init__(
         self,
         dimension: int,
         use_cosine: bool = True,
         index_path: Optional[str] = None,
+        compact_threshold_bytes: int = 32 * 1024 * 1024,
+        index_options: Optional[IndexOptions] = None,
+        tombstone_compact_ratio: float = 0.2,
+        filter_fields: Sequence[str] = ("source",),
+        lexical_index: bool = False,
+        bm25_k1: float = 1.2,
+        bm25_b: float = 0.75,
+        mmap: bool = False,
+        read_only: bool = False,
+        write_lock: bool = True,
     ):
+        """
+        ``write_lock=False`` skips taking the file lock for a writer whose
+        owner already holds it (the shards of a ShardedFaissStore).
+        """
         self.dimension = dimension
         self.use_cosine = use_cosine
         self.index_path = index_path
+        self.compact_threshold_bytes = compact_threshold_bytes
+        self.index_options = index_options or IndexOptions()
+        self.tombstone_compact_ratio = tombstone_compact_ratio
+        self.bm25_k1 = bm25_k1
+        self.bm25_b = bm25_b
+        self.mmap = mmap
+        # Set while self.index is a read-only view of a memory-mapped file
+        self._mapped = False
 
-        if use_cosine:
-            self.index = faiss.IndexFlatIP(dimension)
+        if self.index_options.min_training_size():
+            self.index = with_ids(build_flat_index(dimension, use_cosine))
         else:
-            self.index = faiss.IndexFlatL2(dimension)
+            self.index = with_ids(build_index(dimension, use_cosine, self.index_options))
+
+        self.chunks = ChunkStore(f"{index_path}.chunks" if index_path else None)
+
+        # Sequence number of the last log record applied in memory
+        self.seq = 0
+        self.generation = 0
+
+        # Removed ids still present in the index, and live ids per field value
+        self._tombstones: Set[int] = set()
+        self._metadata = MetadataIndex(filter_fields)
+        self._selectors: Dict[str, Optional[tuple]] = {}
+        self._id_filters: Dict[str, tuple] = {}
 
-        self.texts: List[str] = []
-        self.metadata: List[dict] = []
+        self.lexical: Optional[LexicalIndex] = None
+        if lexical_index:
+            self.lexical = LexicalIndex(k1=bm25_k1, b=bm25_b)
+
+        self._lock = threading.RLock()
+        self._rw = RWLock()
+        self._compaction_lock = threading.Lock()
+        self._compaction_thread: Optional[threading.Thread] = None
+        self._log_file = None
+        self._log_bytes = 0
+        # Where log reading stopped: inode of the log file and byte offset
+        self._log_inode: Optional[int] = None
+        self._log_offset = 0
+        # Sequence number folded into the loaded base generation
+        self._base_seq = 0
+
+        self.read_only = read_only
+        self._write_lock: Optional[StoreLock] = None
+        if index_path and not read_only and write_lock:
+            self._write_lock = StoreLock(f"{index_path}.lock")
+            if not self._write_lock.acquire():
+                raise StoreLockedError(
+                    f"FAISS store {index_path} is being written by another process "
+                    f"(lock {self._write_lock.path})"
+                )
 
         # 🔥 SAFE LOAD
-        if index_path and os.path.exists(f"{index_path}.index"):
+        if index_path and self.has_saved_state(index_path):
             self.load(index_path)
 
     # -------------------------
-    # ADD VECTORS
+    # ADD / REMOVE VECTORS
     # -------------------------
     def add(
         self,
@@ -37,17 +194,165 @@ class FaissStore:
         texts: List[str],
         metadata: Optional[List[dict]] = None,
     ):
-        vectors = np.array(embeddings, dtype=np.float32)
+        """
+        Index ``embeddings`` with their chunk texts. A C-contiguous float32
+        array (as from embed_texts) is used without copying and, with cosine
+        similarity, normalised in place.
+        """
+        self._commit(embeddings, texts, metadata)
 
-        if self.use_cosine:
+    def replace(
+        self,
+        source: str,
+        embeddings: List[List[float]],
+        texts: List[str],
+        metadata: Optional[List[dict]] = None,
+    ) -> int:
+        """
+        Swap every chunk of ``source`` for the given ones in a single log
+        record, so searches see either the old or the new document, never
+        both. Returns the number of chunks removed.
+        """
+        return self._commit(embeddings, texts, metadata, retire={source: None})
+
+    def update(
+        self,
+        source: str,
+        retire_chunk_ids: Collection[int],
+        embeddings: List[List[float]],
+        texts: List[str],
+        metadata: Optional[List[dict]] = None,
+    ) -> int:
+        """
+        Incremental ``replace``: remove only the chunks of ``source`` whose
+        ``chunk_id`` is in ``retire_chunk_ids`` and add the given ones, in a
+        single log record. Returns the number of chunks removed.
+        """
+        return self._commit(embeddings, texts, metadata, retire={source: retire_chunk_ids})
+
+    def write_batch(
+        self,
+        embeddings: List[List[float]],
+        texts: List[str],
+        metadata: List[dict],
+        retire: Dict[str, Optional[Collection[int]]],
+    ) -> int:
+        """
+        Remove chunks of several documents and add new ones in a single log
+        record. ``retire`` maps a source to the ``chunk_id``s of it to
+        remove, or to None for all of them. Returns the number removed.
+        """
+        return self._commit(embeddings, texts, metadata, retire=retire)
+
+    def remove(self, source: str) -> int:
+        """Remove every chunk of ``source``; returns how many were removed."""
+        return self._commit([], [], [], retire={source: None})
+
+    def chunk_ids(self, source: str) -> List[int]:
+        """``chunk_id`` of every live chunk of ``source``."""
+        with self._rw.read():
+            ids = np.array(sorted(self._metadata.ids("source", source)), dtype=np.int64)
+            return self.chunks.values_of(ids, "chunk_id")
+
+    def _commit(
+        self,
+        embeddings,
+        texts: List[str],
+        metadata: Optional[List[dict]],
+        retire: Optional[Dict[str, Optional[Collection[int]]]] = None,
+    ) -> int:
+        self._check_writable()
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32).reshape(-1, self.dimension)
+        if not vectors.flags.writeable:
+            vectors = vectors.copy()
+
+        if self.use_cosine and len(vectors):
             faiss.normalize_L2(vectors)
 
-        self.index.add(vectors)
-        self.texts.extend(texts)
-        self.metadata.extend(metadata or [{}] * len(texts))
+        metadata = metadata or [{}] * len(texts)
 
-        if self.index_path:
-            self.save(self.index_path)
+        # Tokenising is the slow part of lexical indexing, done before locking
+        term_counts = analyze(texts) if self.lexical is not None else None
+
+        with self._lock:
+            remove_ids = self._retired_ids(retire or {})
+            if not len(vectors) and not len(remove_ids):
+                return 0
+
+            seq = self.seq + 1
+            start = self.chunks.next_id
+            record = {
+                "seq": seq,
+                "remove_ids": remove_ids,
+                # New chunks are keyed by ids the chunk store hands out
+                "ids": np.arange(start, start + len(vectors), dtype=np.int64),
+                "vectors": vectors,
+                "texts": list(texts),
+                "metadata": list(metadata),
+            }
+
+            # Write-ahead: the batch is durable before it becomes visible
+            if self.index_path:
+                self._append_log(record)
+
+            with self._rw.write():
+                self._apply(record, term_counts)
+                self.seq = seq
+
+            if self._compaction_due():
+                self._schedule_compaction()
+
+        if len(remove_ids):
+            documents = next(iter(retire)) if len(retire) == 1 else f"{len(retire)} documents"
+            logger.info(f"Removed {len(remove_ids)} chunks of {documents}")
+        return len(remove_ids)
+
+    def _retired_ids(self, retire: Dict[str, Optional[Collection[int]]]) -> np.ndarray:
+        """Ids of the chunks named by ``retire`` (see ``write_batch``)."""
+        found = [np.empty(0, dtype=np.int64)]
+        for source, chunk_ids in retire.items():
+            ids = np.array(sorted(self._metadata.ids("source", source)), dtype=np.int64)
+            if chunk_ids is not None and len(ids):
+                chunk_ids = set(chunk_ids)
+                retired = [chunk_id in chunk_ids for chunk_id in self.chunks.values_of(ids, "chunk_id")]
+                ids = ids[retired]
+            found.append(ids)
+        return np.concatenate(found)
+
+    def _apply(self, record: dict, term_counts=None):
+        self._invalidate_filters()
+
+        remove_ids = record.get("remove_ids")
+        if remove_ids is not None and len(remove_ids):
+            for field in self._metadata.fields:
+                self._metadata.remove(
+                    field, remove_ids.tolist(), self.chunks.values_of(remove_ids, field)
+                )
+            self._tombstones.update(remove_ids.tolist())
+            if self.lexical is not None:
+                self.lexical.remove(remove_ids)
+
+        vectors = record["vectors"]
+        if not len(vectors):
+            return
+
+        ids = record.get("ids")
+        if ids is None:
+            # Records from before id mapping: ids are the chunk store rows
+            start = self.chunks.next_id
+            ids = np.arange(start, start + len(vectors), dtype=np.int64)
+
+        self._own_index()
+        self.index.add_with_ids(vectors, ids)
+        self.chunks.append(record["texts"], record["metadata"], ids.tolist())
+        for field in self._metadata.fields:
+            self._metadata.add(
+                field, ids.tolist(), [meta.get(field) for meta in record["metadata"]]
+            )
+        if self.lexical is not None:
+            if term_counts is None:
+                term_counts = analyze(record["texts"])  # log replay
+            self.lexical.add(ids, term_counts)
 
     # -------------------------
     # SEARCH
@@ -56,58 +361,923 @@ class FaissStore:
         self,
         embedding: List[float],
         k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
     ) -> List[Tuple[str, float, dict]]:
-        vector = np.array([embedding], dtype=np.float32)
+        return self.search_batch([embedding], k, filters)[0]
+
+    def search_batch(
+        self,
+        embeddings: List[List[float]],
+        k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Tuple[str, float, dict]]]:
+        """
+        Search many query embeddings with a single FAISS call on an (n, d)
+        matrix, so FAISS can use its BLAS / OpenMP batch kernels.
+        Returns one result list per query, in input order.
+
+        ``filters`` (see MetadataIndex) restrict every query to matching
+        chunks; an invalid expression raises FilterError.
+        """
+        vectors = self._query_vectors(embeddings)
+        with self._rw.read():
+            return self._decode(self._dense_hits(vectors, k, filters))
+
+    def dense_hits(
+        self,
+        embeddings: List[List[float]],
+        k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """Like ``search_batch`` but returns (id, distance) pairs."""
+        vectors = self._query_vectors(embeddings)
+        with self._rw.read():
+            return self._dense_hits(vectors, k, filters)
+
+    def lexical_hits(
+        self,
+        queries: List[str],
+        k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """Top ``k`` (id, BM25 score) pairs per query text."""
+        if self.lexical is None:
+            raise RuntimeError("Lexical index is disabled for this store")
+
+        with self._rw.read():
+            id_filter = self._id_filter(filters)
+            if id_filter == ():
+                return [[] for _ in queries]  # nothing matches
+            include, exclude = id_filter
+            return [self.lexical.search(query, k, include, exclude) for query in queries]
+
+    def decode(self, hits: List[List[Tuple[int, float]]]) -> List[List[Tuple[str, float, dict]]]:
+        """Turn (id, score) lists into (text, score, metadata) results."""
+        with self._rw.read():
+            # Ids can have been removed since the caller ranked them
+            return self._decode(hits, skip=self._tombstones)
+
+    @property
+    def has_lexical_index(self) -> bool:
+        return self.lexical is not None
 
+    def _query_vectors(self, embeddings: List[List[float]]) -> np.ndarray:
+        # Copied: the caller's query vectors are also shared across shards
+        vectors = np.array(embeddings, dtype=np.float32).reshape(-1, self.dimension)
         if self.use_cosine:
-            faiss.normalize_L2(vector)
+            faiss.normalize_L2(vectors)
+        return vectors
 
-        distances, indices = self.index.search(vector, k)
+    def _dense_hits(
+        self, vectors: np.ndarray, k: int, filters: Optional[Dict[str, Any]]
+    ) -> List[List[Tuple[int, float]]]:
+        selector = self._selector(filters)
+        if selector == ():
+            return [[] for _ in range(len(vectors))]  # nothing matches
 
-        results = []
-        for i, idx in enumerate(indices[0]):
-            if idx == -1:
-                continue
-            results.append(
-                (
-                    self.texts[idx],
-                    float(distances[0][i]),
-                    self.metadata[idx],
-                )
-            )
-        return results
+        params = None
+        if selector is not None:
+            params = search_params(self.index, self.index_options, selector[0])
+        distances, indices = self.index.search(vectors, k, params=params)
+
+        return [
+            [
+                (int(idx), float(distance))
+                for distance, idx in zip(row_distances, row_indices)
+                if idx != -1
+            ]
+            for row_distances, row_indices in zip(distances, indices)
+        ]
+
+    def _decode(self, hits, skip: Set[int] = frozenset()):
+        batch_results = []
+        for row in hits:
+            results = []
+            for idx, score in row:
+                if idx in skip:
+                    continue
+                # Only the k hits are ever decoded from the chunk store
+                try:
+                    text, metadata = self.chunks.get(idx)
+                except KeyError:
+                    continue  # row dropped by a compaction since it was ranked
+                results.append((text, score, metadata))
+            batch_results.append(results)
+        return batch_results
+
+    def check_filters(self, filters: Optional[Dict[str, Any]]):
+        """Raise FilterError for filters that search would reject."""
+        if filters:
+            self._metadata.check(filters)
+
+    def _selector(self, filters: Optional[Dict[str, Any]]) -> Optional[tuple]:
+        """
+        Selector admitting live ids that match ``filters``, as a tuple that
+        also keeps any wrapped selector alive: None when every id qualifies,
+        ``()`` when none does. Compiled once per filter until the next write.
+        """
+        return self._compiled(self._selectors, filters, self._build_selector)
+
+    def _id_filter(self, filters: Optional[Dict[str, Any]]) -> tuple:
+        """
+        ``filters`` as ``(include, exclude)`` id arrays for the lexical index
+        (None = no restriction), or ``()`` when nothing matches. Removed ids
+        are already masked by the lexical index itself.
+        """
+        return self._compiled(self._id_filters, filters, self._build_id_filter)
+
+    @staticmethod
+    def _compiled(cache: dict, filters: Optional[Dict[str, Any]], build):
+        key = json.dumps(filters, sort_keys=True, default=str) if filters else ""
+        compiled = cache.get(key, _MISSING)
+        if compiled is _MISSING:
+            compiled = build(filters)
+            if len(cache) >= _SELECTOR_CACHE_SIZE:
+                cache.clear()
+            cache[key] = compiled
+        return compiled
+
+    def _invalidate_filters(self):
+        self._selectors = {}
+        self._id_filters = {}
+
+    def _build_selector(self, filters: Optional[Dict[str, Any]]) -> Optional[tuple]:
+        include, exclude = self._metadata.resolve(filters) if filters else (None, set())
+
+        if include is not None:
+            # The inverted index only holds live ids, tombstones are already out
+            allowed = include - exclude if exclude else include
+            if not allowed:
+                return ()
+            return (faiss.IDSelectorBatch(_id_array(allowed)),)
+
+        excluded = exclude | self._tombstones if exclude else self._tombstones
+        if not excluded:
+            return None
+        removed = faiss.IDSelectorBatch(_id_array(excluded))
+        return (faiss.IDSelectorNot(removed), removed)
+
+    def _build_id_filter(self, filters: Optional[Dict[str, Any]]) -> tuple:
+        if not filters:
+            return (None, None)
+        include, exclude = self._metadata.resolve(filters)
+        if include is not None:
+            allowed = include - exclude if exclude else include
+            if not allowed:
+                return ()
+            return (np.sort(_id_array(allowed)), None)
+        return (None, np.sort(_id_array(exclude)) if exclude else None)
 
     # -------------------------
     # SAVE
     # -------------------------
     def save(self, path: str):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        faiss.write_index(self.index, f"{path}.index")
-
-        with open(f"{path}.meta", "wb") as f:
-            pickle.dump(
-                {
-                    "texts": self.texts,
-                    "metadata": self.metadata,
-                    "dimension": self.dimension,
-                    "use_cosine": self.use_cosine,
-                },
-                f,
+        """Write a full base snapshot to ``path`` and commit it."""
+        if path == self.index_path:
+            self._check_writable()
+        with self._compaction_lock:
+            with self._lock:
+                snapshot = self._snapshot(path)
+
+            generation, lexical_segment, chunks = self._write_snapshot(path, snapshot)
+
+            if path == self.index_path:
+                with self._lock:
+                    self.generation = generation
+                    if lexical_segment is not None:
+                        with self._rw.write():
+                            self.lexical.fold(snapshot["lexical"], lexical_segment)
+                    if chunks is not None:
+                        self._swap_chunks(chunks)
+                    self._rewrite_log(after_seq=snapshot["seq"])
+
+    def compact(self):
+        """
+        Train/migrate the index if due, purge tombstones, then fold the log
+        into a new generation.
+        """
+        self._check_writable()
+        with self._compaction_lock:
+            if needs_migration(self.index, self.index_options):
+                self._rebuild(migrate=True)
+                logger.info(
+                    f"Migrated flat index to {describe(self.index)} "
+                    f"({self.index.ntotal} vectors)"
+                )
+            elif self._tombstones:
+                self._purge_tombstones()
+
+        if not self.index_path:
+            return
+        self.save(self.index_path)
+        logger.info(f"Compacted FAISS store into generation {self.generation}")
+
+    def convert(self, options: IndexOptions, dimension: Optional[int] = None):
+        """
+        Rebuild the live vectors into an index laid out as ``options`` and
+        commit it as a new generation. With ``dimension`` the vectors are
+        first cut to their leading ``dimension`` components and renormalised,
+        which for text-embedding-3 models equals asking the API for shortened
+        embeddings; queries must then be embedded at that size too.
+
+        Blocks writers for the whole rebuild; meant for offline conversion
+        (see scripts/convert_index.py).
+        """
+        self._check_writable()
+        with self._compaction_lock, self._lock:
+            vectors, ids = index_vectors(self.index)
+            purged = self._tombstone_ids()
+            keep = ~np.isin(ids, purged)
+            vectors, ids = vectors[keep], ids[keep]
+
+            dimension = dimension or self.dimension
+            if dimension > self.dimension:
+                raise ValueError(
+                    f"Cannot grow vectors from {self.dimension} to {dimension} dimensions"
+                )
+            if dimension < self.dimension:
+                vectors = np.ascontiguousarray(vectors[:, :dimension])
+                if self.use_cosine:
+                    faiss.normalize_L2(vectors)
+
+            if len(vectors) >= options.min_training_size():
+                index = build_trained_index(
+                    vectors, dimension, self.use_cosine, options, ids=ids
+                )
+            else:
+                # Too few vectors to train; migrated later like a new store
+                index = with_ids(build_flat_index(dimension, self.use_cosine))
+                index.add_with_ids(vectors, ids)
+
+            with self._rw.write():
+                self.index = index
+                self._mapped = False
+                self.dimension = dimension
+                self.index_options = options
+                self._forget_tombstones(purged)
+
+        logger.info(
+            f"Converted index to {describe(self.index)} at {dimension} dimensions "
+            f"({self.index.ntotal} vectors)"
+        )
+        if self.index_path:
+            self.save(self.index_path)
+
+    def iter_live(self, batch_size: int = 10000):
+        """
+        Yield (vectors, texts, metadata) batches of the live chunks in id
+        order. Vectors are read back from the index, so with float16/int8
+        storage or PCA they are its reconstructions. For offline tools such
+        as shard rebalancing; writes made while iterating may be missed.
+        """
+        with self._lock, self._rw.read():
+            vectors, ids = index_vectors(self.index)
+            purged = self._tombstone_ids()
+
+        keep = ~np.isin(ids, purged)
+        vectors, ids = vectors[keep], ids[keep]
+        order = np.argsort(ids, kind="stable")
+        vectors, ids = vectors[order], ids[order]
+
+        for start in range(0, len(ids), batch_size):
+            with self._rw.read():
+                rows = [self.chunks.get(int(idx)) for idx in ids[start:start + batch_size]]
+            yield (
+                vectors[start:start + batch_size],
+                [text for text, _ in rows],
+                [metadata for _, metadata in rows],
+            )
+
+    def _purge_tombstones(self):
+        with self._lock:
+            purged = self._tombstone_ids()
+            if supports_removal(self.index):
+                with self._rw.write():
+                    self._own_index()
+                    self.index.remove_ids(purged)
+                    self._forget_tombstones(purged)
+                logger.info(f"Purged {len(purged)} removed vectors from the index")
+                return
+
+        if len(purged) > self.tombstone_compact_ratio * self.index.ntotal:
+            self._rebuild(migrate=False)
+            logger.info(f"Rebuilt index without {len(purged)} removed vectors")
+
+    def _rebuild(self, migrate: bool):
+        """
+        Rebuild the index from its live vectors and swap it in. With
+        ``migrate`` the new index is the configured ANN type, trained on
+        those vectors; otherwise it has the structure of the current one.
+        """
+        with self._lock:
+            if self._mapped:
+                with self._rw.write():
+                    self._own_index()
+            snapshot_total = self.index.ntotal
+            vectors, ids = index_vectors(self.index)
+            purged = self._tombstone_ids()
+            index = None if migrate else empty_like(self.index)
+
+        keep = ~np.isin(ids, purged)
+        vectors, ids = vectors[keep], ids[keep]
+
+        # Training and bulk insertion block neither writers nor searches
+        if index is None:
+            index = build_trained_index(
+                vectors, self.dimension, self.use_cosine, self.index_options, ids=ids
+            )
+        else:
+            index.add_with_ids(vectors, ids)
+
+        with self._lock:
+            # Only appends happen outside compaction, and flat/HNSW storage
+            # (the only kinds rebuilt) is in insertion order
+            added_since = self.index.ntotal - snapshot_total
+            if added_since:
+                index.add_with_ids(*index_vectors(self.index, start=snapshot_total))
+            with self._rw.write():
+                self.index = index
+                self._mapped = False
+                self._forget_tombstones(purged)
+
+    def _tombstone_ids(self) -> np.ndarray:
+        return np.array(sorted(self._tombstones), dtype=np.int64)
+
+    def _forget_tombstones(self, purged: np.ndarray):
+        self._tombstones.difference_update(purged.tolist())
+        self._invalidate_filters()
+
+    def _compaction_due(self) -> bool:
+        return (
+            (self.index_path and self._log_bytes >= self.compact_threshold_bytes)
+            or needs_migration(self.index, self.index_options)
+            or len(self._tombstones) > self.tombstone_compact_ratio * self.index.ntotal
+        )
+
+    def _schedule_compaction(self):
+        if self.read_only:
+            return  # the writing process compacts
+        if self._compaction_thread and self._compaction_thread.is_alive():
+            return
+
+        def run():
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"FAISS compaction failed: {e}", exc_info=True)
+
+        self._compaction_thread = threading.Thread(
+            target=run, name="faiss-compaction", daemon=True
+        )
+        self._compaction_thread.start()
+
+    def _snapshot(self, path: str) -> dict:
+        # Called under self._lock: chunk rows are appended in place, the
+        # index is copied so it can be written without holding the lock
+        keep = None
+        if path == self.index_path:
+            written = self.chunks.write_pending()
+            with self._rw.write():
+                self.chunks.publish(written)
+            chunks = self.chunks.state()
+            removed = len(self.chunks) - len(self)
+            if removed > self.tombstone_compact_ratio * len(self.chunks):
+                # Live rows are copied into the new generation off-lock
+                keep = self._live_ids()
+        else:
+            with self._rw.read():
+                chunks = self.chunks.copy_to(f"{path}.chunks", self._live_ids())
+
+        with self._rw.read():
+            index = faiss.serialize_index(self.index)
+
+        return {
+            "seq": self.seq,
+            "index": index,
+            "chunks": chunks,
+            "keep": keep,
+            "tombstones": sorted(self._tombstones),
+            # Postings are merged and written without the lock
+            "lexical": self.lexical.capture() if self.lexical is not None else None,
+        }
+
+    def _write_snapshot(
+        self, path: str, snapshot: dict
+    ) -> Tuple[int, Optional[dict], Optional[ChunkStore]]:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        manifest = _read_manifest(path)
+        generation = (manifest["generation"] if manifest else 0) + 1
+        base = os.path.basename(path)
+        index_name = f"{base}.{generation}.index"
+
+        with open(os.path.join(directory, index_name), "wb") as f:
+            snapshot["index"].tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # Saves elsewhere copy the chunks to <path>.chunks (see _snapshot)
+        chunk_dir = manifest.get("chunk_dir") if manifest and path == self.index_path else None
+        chunks = None
+        if snapshot["keep"] is not None:
+            # Committed rows are never rewritten in place, so the live ones
+            # are read through a second view while writers go on appending
+            chunk_dir = f"{base}.{generation}.chunks"
+            view = ChunkStore(self.chunks.directory, snapshot["chunks"])
+            snapshot["chunks"] = view.copy_to(
+                os.path.join(directory, chunk_dir), snapshot["keep"]
+            )
+            view.close()
+            chunks = ChunkStore(os.path.join(directory, chunk_dir), snapshot["chunks"])
+            logger.info(
+                f"Dropped {len(view) - len(snapshot['keep'])} removed rows "
+                f"from the chunk store"
             )
 
+        lexical_name = lexical_segment = None
+        if snapshot["lexical"] is not None:
+            lexical_name = f"{base}.{generation}.lexical"
+            lexical_segment = self.lexical.write(
+                os.path.join(directory, lexical_name), snapshot["lexical"]
+            )
+
+        # The manifest replace is the commit point of the new generation
+        committed = {
+            "generation": generation,
+            "seq": snapshot["seq"],
+            "index": index_name,
+            "chunks": snapshot["chunks"],
+            "tombstones": snapshot["tombstones"],
+            "dimension": self.dimension,
+            "use_cosine": self.use_cosine,
+        }
+        if lexical_name:
+            committed["lexical"] = lexical_name
+        if chunk_dir:
+            committed["chunk_dir"] = chunk_dir
+        _write_json_atomic(f"{path}.manifest", committed)
+
+        if manifest:
+            _remove_quietly(os.path.join(directory, manifest["index"]))
+            if "meta" in manifest:
+                _remove_quietly(os.path.join(directory, manifest["meta"]))
+            if "lexical" in manifest:
+                # Searches still reading the old postings keep their mmaps
+                shutil.rmtree(os.path.join(directory, manifest["lexical"]), ignore_errors=True)
+        else:
+            # Superseded single-file layout from before the append log
+            _remove_quietly(f"{path}.index")
+            _remove_quietly(f"{path}.meta")
+
+        return generation, lexical_segment, chunks
+
+    def _live_ids(self) -> np.ndarray:
+        ids = index_ids(self.index)
+        return ids[~np.isin(ids, self._tombstone_ids())]
+
+    def _swap_chunks(self, chunks: ChunkStore):
+        """
+        Switch to the compacted chunk store of a new generation, carrying
+        over rows appended since the snapshot, and delete the old files.
+        Searches still reading the old rows keep their mmaps.
+        """
+        old = self.chunks
+        chunks.append(*old.pending())
+        with self._rw.write():
+            self.chunks = chunks
+            old.close()
+        shutil.rmtree(old.directory, ignore_errors=True)
+
     # -------------------------
     # LOAD  ✅ FIX
     # -------------------------
     def load(self, path: str):
-        self.index = faiss.read_index(f"{path}.index")
+        # Startup path: simply exclude everyone while the state is rebuilt
+        with self._lock, self._rw.write():
+            self._load(path)
+
+    def _load(self, path: str):
+        manifest = _read_manifest(path)
+        directory = os.path.dirname(path)
+
+        meta_file = None
+        if manifest:
+            index_file = os.path.join(directory, manifest["index"])
+            if "meta" in manifest:
+                meta_file = os.path.join(directory, manifest["meta"])
+            self.seq = self._base_seq = manifest["seq"]
+            self.generation = manifest["generation"]
+            self._tombstones = set(manifest.get("tombstones", []))
+        else:
+            index_file = f"{path}.index"
+            meta_file = f"{path}.meta"
+            self.seq = self._base_seq = 0
+            self.generation = 0
+
+        wrapped = False
+        if os.path.exists(index_file):
+            index = self._read_index(index_file)
+            # Indexes from before id mapping are wrapped once and rewritten
+            self.index = with_ids(index)
+            wrapped = self.index is not index
+            self._check_index_type()
 
-        with open(f"{path}.meta", "rb") as f:
-            data = pickle.load(f)
-            self.texts = data["texts"]
-            self.metadata = data["metadata"]
+        self.chunks.close()
+        if manifest and "chunk_dir" in manifest:
+            self.chunks = ChunkStore(os.path.join(directory, manifest["chunk_dir"]), manifest["chunks"])
+        elif manifest and "chunks" in manifest:
+            self.chunks = ChunkStore(f"{path}.chunks", manifest["chunks"])
+        else:
+            self.chunks = ChunkStore(f"{path}.chunks")
+
+        # Pickled texts/metadata from older layouts: import once, then the
+        # compaction below rewrites them into the chunk store
+        migrate = meta_file is not None and os.path.exists(meta_file)
+        if migrate:
+            with open(meta_file, "rb") as f:
+                data = pickle.load(f)
+            self.chunks.append(data["texts"], data["metadata"])
+
+        self._invalidate_filters()
+        self._metadata = MetadataIndex(self._metadata.fields)
+        ids = index_ids(self.index)
+        ids = ids[~np.isin(ids, list(self._tombstones))]
+        for field in self._metadata.fields:
+            self._metadata.add(field, ids.tolist(), self.chunks.values_of(ids, field))
+
+        reindexed = False
+        if self.lexical is not None:
+            lexical_dir = manifest.get("lexical") if manifest else None
+            if lexical_dir and os.path.isdir(os.path.join(directory, lexical_dir)):
+                self.lexical = LexicalIndex.load(
+                    os.path.join(directory, lexical_dir), k1=self.bm25_k1, b=self.bm25_b
+                )
+            else:
+                # Stores written without a lexical index: build it once from
+                # the chunk texts, the compaction below persists it
+                self.lexical = LexicalIndex(k1=self.bm25_k1, b=self.bm25_b)
+                ids = np.sort(ids)
+                self.lexical.add(ids, analyze([self.chunks.get(int(idx))[0] for idx in ids]))
+                reindexed = len(ids) > 0
+                logger.info(f"Built lexical index for {len(ids)} existing chunks")
+
+        replayed = 0
+        log_path = f"{path}.log"
+        self._log_inode, self._log_offset = _inode(log_path), 0
+        # A read-only store must not cut the tail the writer is appending
+        for raw, end in _scan_log(log_path, truncate=not self.read_only):
+            self._log_offset = end
+            record = pickle.loads(raw[_LOG_HEADER.size:])
+            if record["seq"] <= self.seq:
+                continue  # already folded into the base snapshot
+            self._apply(record)
+            self.seq = record["seq"]
+            replayed += 1
+
+        if path == self.index_path:
+            self._log_bytes = _file_size(f"{path}.log")
+            if migrate or wrapped or reindexed or self._compaction_due():
+                self._schedule_compaction()
+
+        logger.info(
+            f"Loaded FAISS store generation {self.generation} "
+            f"({len(self.chunks)} chunks, {replayed} log records replayed)"
+        )
+
+    def _read_index(self, index_file: str) -> faiss.Index:
+        """
+        Read a saved index. With ``mmap``, flat and HNSW vector codes are
+        mapped from the file instead of read, so loading takes milliseconds
+        and pages come in as searches touch them (and are shared between
+        processes). IVF lists are always read into memory.
+        """
+        self._mapped = False
+        if self.mmap and self.index_options.index_type in ("flat", "hnsw"):
+            index = faiss.read_index(index_file, faiss.IO_FLAG_MMAP_IFC)
+            if isinstance(index, faiss.IndexIDMap2):
+                self._mapped = True
+                return index
+            # Indexes from before id mapping get rewrapped, which needs them in memory
+        return faiss.read_index(index_file)
+
+    def _own_index(self):
+        """
+        Copy a memory-mapped index into memory before it is modified: FAISS
+        cannot grow or shrink a mapped one. Happens once, on the first write
+        after loading; the caller holds the write side of ``_rw``.
+        """
+        if not self._mapped:
+            return
+        self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+        apply_search_params(self.index, self.index_options)
+        self._mapped = False
+        logger.info(f"Copied memory-mapped index into memory ({self.index.ntotal} vectors)")
+
+    def _check_index_type(self):
+        if self.index.d != self.dimension:
+            raise ValueError(
+                f"Saved index holds {self.index.d}-dimensional vectors but "
+                f"{self.dimension} are configured"
+            )
+        loaded = describe(self.index)
+        if not matches(self.index, self.index_options) and loaded != "flat/float32":
+            logger.warning(
+                f"Loaded {loaded} index but {self.index_options.factory_string()} is "
+                f"configured; only flat float32 indexes are migrated automatically, "
+                f"keeping {loaded} (see scripts/convert_index.py)"
+            )
+        apply_search_params(self.index, self.index_options)
+
+    # -------------------------
+    # FOLLOW THE WRITER (read-only stores)
+    # -------------------------
+    def refresh(self) -> Optional[Set[str]]:
+        """
+        Catch a read-only store up with what the writing process committed:
+        records appended to the log are applied, and once the writer has
+        compacted into a new generation the store is loaded again off-lock
+        and swapped in. Returns the sources whose chunks changed, or None if
+        that is unknown (records were folded into a generation before this
+        store saw them).
+        """
+        if not self.read_only or not self.index_path:
+            return set()
+
+        with self._lock:
+            changed, gap = self._follow_log()
+            manifest = _read_manifest(self.index_path)
+            if not gap and (manifest["generation"] if manifest else 0) == self.generation:
+                return changed
+
+        seen = self.seq
+        fresh = self._reopen()
+        if seen < fresh._base_seq:
+            changed = None
+        else:
+            for record in _read_log(f"{self.index_path}.log", truncate=False):
+                if seen < record["seq"] <= fresh.seq:
+                    changed |= fresh._record_sources(record)
+
+        with self._lock, self._rw.write():
+            old_chunks = self.chunks
+            for name in _FOLLOWED_STATE:
+                setattr(self, name, getattr(fresh, name))
+            self._invalidate_filters()
+            old_chunks.close()
+        logger.info(f"Followed FAISS store to generation {self.generation}")
+        return changed
+
+    def _follow_log(self) -> Tuple[Set[str], bool]:
+        """
+        Apply log records the writer appended since the last read. Returns
+        the sources they touched and whether records are missing (the log
+        was rewritten by a compaction this store has not loaded yet).
+        """
+        log_path = f"{self.index_path}.log"
+        inode = _inode(log_path)
+        if inode is None:
+            return set(), False
+        offset = self._log_offset
+        if inode != self._log_inode or _file_size(log_path) < offset:
+            offset = 0  # rewritten: start over, skipping records already applied
+        self._log_inode = inode
+
+        changed: Set[str] = set()
+        for raw, end in _scan_log(log_path, offset, truncate=False):
+            record = pickle.loads(raw[_LOG_HEADER.size:])
+            self._log_offset = end
+            if record["seq"] <= self.seq:
+                continue
+            if record["seq"] != self.seq + 1:
+                return changed, True
+            changed |= self._record_sources(record)
+            with self._rw.write():
+                self._apply(record)
+                self.seq = record["seq"]
+        return changed, False
+
+    def _record_sources(self, record: dict) -> Set[str]:
+        """Sources of the chunks a log record adds or removes."""
+        sources = {meta.get("source") for meta in record["metadata"]}
+        remove_ids = record.get("remove_ids")
+        if remove_ids is not None and len(remove_ids):
+            with self._rw.read():
+                sources.update(self.chunks.values_of(remove_ids, "source"))
+        sources.discard(None)
+        return sources
+
+    def _reopen(self) -> "FaissStore":
+        """A new read-only store loaded from the files at ``index_path``."""
+        return FaissStore(
+            dimension=self.dimension,
+            use_cosine=self.use_cosine,
+            index_path=self.index_path,
+            compact_threshold_bytes=self.compact_threshold_bytes,
+            index_options=self.index_options,
+            tombstone_compact_ratio=self.tombstone_compact_ratio,
+            filter_fields=self._metadata.fields,
+            lexical_index=self.lexical is not None,
+            bm25_k1=self.bm25_k1,
+            bm25_b=self.bm25_b,
+            mmap=self.mmap,
+            read_only=True,
+        )
+
+    def _check_writable(self):
+        if self.read_only:
+            raise ReadOnlyStoreError(
+                f"FAISS store {self.index_path} is open read-only in this process; "
+                f"another process writes it"
+            )
+
+    @staticmethod
+    def has_saved_state(path: str) -> bool:
+        return any(
+            os.path.exists(f"{path}{suffix}")
+            for suffix in (".manifest", ".index", ".log")
+        )
+
+    @staticmethod
+    def remove_files(path: str):
+        """Delete every file of the store saved at ``path``."""
+        manifest = _read_manifest(path)
+        directory = os.path.dirname(path)
+        if manifest:
+            _remove_quietly(os.path.join(directory, manifest["index"]))
+            if "meta" in manifest:
+                _remove_quietly(os.path.join(directory, manifest["meta"]))
+            if "lexical" in manifest:
+                shutil.rmtree(os.path.join(directory, manifest["lexical"]), ignore_errors=True)
+            if "chunk_dir" in manifest:
+                shutil.rmtree(os.path.join(directory, manifest["chunk_dir"]), ignore_errors=True)
+        for suffix in (".index", ".meta", ".log", ".manifest"):
+            _remove_quietly(f"{path}{suffix}")
+        shutil.rmtree(f"{path}.chunks", ignore_errors=True)
+
+    def close(self):
+        """Wait for a running compaction, then release the log and chunk files."""
+        thread = self._compaction_thread
+        if thread is not None:
+            thread.join()
+        with self._lock, self._rw.write():
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+            self.chunks.close()
+        if self._write_lock is not None:
+            self._write_lock.release()
+
+    # -------------------------
+    # APPEND LOG
+    # -------------------------
+    def _append_log(self, record: dict):
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        header = _LOG_HEADER.pack(LOG_MAGIC, len(payload), zlib.crc32(payload))
+
+        f = self._open_log()
+        f.write(header)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+        self._log_bytes += len(header) + len(payload)
+
+    def _open_log(self):
+        if self._log_file is None:
+            directory = os.path.dirname(self.index_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._log_file = open(f"{self.index_path}.log", "ab")
+        return self._log_file
+
+    def _rewrite_log(self, after_seq: int):
+        """Drop log records already contained in the committed base."""
+        log_path = f"{self.index_path}.log"
+        tmp_path = f"{log_path}.tmp"
+
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+
+        size = 0
+        with open(tmp_path, "wb") as out:
+            for raw in _read_log_raw(log_path):
+                record = pickle.loads(raw[_LOG_HEADER.size:])
+                if record["seq"] > after_seq:
+                    out.write(raw)
+                    size += len(raw)
+            out.flush()
+            os.fsync(out.fileno())
+
+        os.replace(tmp_path, log_path)
+        _fsync_dir(log_path)
+        self._log_bytes = size
 
     # -------------------------
     # SIZE (used by /ask)
     # -------------------------
     def __len__(self):
-        return len(self.texts)
+        return self.index.ntotal - len(self._tombstones)
+
+    def is_empty(self) -> bool:
+        return len(self) == 0
+
+    def index_stats(self) -> Dict[str, int]:
+        """Live vector count and approximate index memory (see /metrics)."""
+        with self._rw.read():
+            return {"vectors": len(self), "bytes": memory_bytes(self.index)}
+
+
+def _id_array(ids: Set[int]) -> np.ndarray:
+    return np.fromiter(ids, dtype=np.int64, count=len(ids))
+
+
+def _read_log(log_path: str, truncate: bool = True):
+    for raw, _ in _scan_log(log_path, truncate=truncate):
+        yield pickle.loads(raw[_LOG_HEADER.size:])
+
+
+def _read_log_raw(log_path: str):
+    for raw, _ in _scan_log(log_path):
+        yield raw
+
+
+def _scan_log(log_path: str, offset: int = 0, truncate: bool = True):
+    """
+    Yield ``(raw record, end offset)`` for the complete, checksummed records
+    of the append log from byte ``offset`` on. With ``truncate`` a torn or
+    corrupt tail (crash mid-append) is cut away; readers in other processes
+    leave it, as it may be a record still being written.
+    """
+    if not os.path.exists(log_path):
+        return
+
+    valid_end = offset
+    with open(log_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        f.seek(offset)
+        while True:
+            header = f.read(_LOG_HEADER.size)
+            if len(header) < _LOG_HEADER.size:
+                break
+            magic, length, crc = _LOG_HEADER.unpack(header)
+            # A corrupt length must not be trusted with an allocation
+            if magic != LOG_MAGIC or length > size - f.tell():
+                break
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            valid_end = f.tell()
+            yield header + payload, valid_end
+
+    if truncate and valid_end < _file_size(log_path):
+        logger.warning(f"Truncating torn tail of {log_path} at byte {valid_end}")
+        with open(log_path, "r+b") as f:
+            f.truncate(valid_end)
+
+
+def _read_manifest(path: str) -> Optional[dict]:
+    manifest_path = f"{path}.manifest"
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_json_atomic(path: str, data: dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(path)
+
+
+def _fsync_dir(path: str):
+    if os.name != "posix":
+        return
+    fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _inode(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+def _file_size(path: str) -> int:
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,415 @@
+import faiss
+import numpy as np
+import logging
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# How flat, IVF-Flat and HNSW indexes hold each vector component
+VECTOR_STORAGE = ("float32", "float16", "int8")
+_STORAGE_CODECS = {"float32": "Flat", "float16": "SQfp16", "int8": "SQ8"}
+_QTYPE_STORAGE = {
+    faiss.ScalarQuantizer.QT_fp16: "float16",
+    faiss.ScalarQuantizer.QT_8bit: "int8",
+}
+
+# FAISS warns below ~39 training points per centroid
+_MIN_POINTS_PER_CENTROID = 39
+_MAX_POINTS_PER_CENTROID = 256
+
+# int8 learns a per-dimension value range, PCA a projection
+_MIN_SQ_TRAINING_SIZE = 1000
+_MIN_PCA_POINTS_PER_DIMENSION = 10
+
+
+class IndexOptions:
+    """Index type and build/search knobs for FaissStore."""
+    def __init__(
+        self,
+        index_type: str = "flat",
+        nlist: int = 1024,
+        nprobe: int = 16,
+        pq_m: int = 64,
+        pq_nbits: int = 8,
+        hnsw_m: int = 32,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        storage: str = "float32",
+        pca_dimension: int = 0,
+    ):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(
+                f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}"
+            )
+        if storage not in VECTOR_STORAGE:
+            raise ValueError(
+                f"Unknown vector storage '{storage}', expected one of {VECTOR_STORAGE}"
+            )
+        if index_type == "ivf_pq" and storage != "float32":
+            raise ValueError("ivf_pq already compresses vectors; leave storage at float32")
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.storage = storage
+        self.pca_dimension = pca_dimension
+
+    def factory_string(self, use_cosine: bool = True) -> str:
+        codec = _STORAGE_CODECS[self.storage]
+        if self.index_type == "ivf_flat":
+            body = f"IVF{self.nlist},{codec}"
+        elif self.index_type == "ivf_pq":
+            body = f"IVF{self.nlist},PQ{self.pq_m}x{self.pq_nbits}"
+        elif self.index_type == "hnsw":
+            body = f"HNSW{self.hnsw_m},{codec}"
+        else:
+            body = codec
+
+        if self.pca_dimension:
+            # Projections of unit vectors are not unit length; renormalise
+            # so inner product stays cosine similarity
+            norm = ",L2norm" if use_cosine else ""
+            return f"PCA{self.pca_dimension}{norm},{body}"
+        return body
+
+    def is_plain_flat(self) -> bool:
+        return self.factory_string() == "Flat"
+
+    def min_training_size(self) -> int:
+        """Vectors needed before the index can be trained (0 = no training)."""
+        size = 0
+        if self.index_type == "ivf_flat":
+            size = _MIN_POINTS_PER_CENTROID * self.nlist
+        elif self.index_type == "ivf_pq":
+            size = _MIN_POINTS_PER_CENTROID * max(self.nlist, 2 ** self.pq_nbits)
+        elif self.storage == "int8":
+            size = _MIN_SQ_TRAINING_SIZE
+        if self.pca_dimension:
+            size = max(size, _MIN_PCA_POINTS_PER_DIMENSION * self.pca_dimension)
+        return size
+
+    def max_training_size(self) -> int:
+        if self.index_type == "ivf_pq":
+            return _MAX_POINTS_PER_CENTROID * max(self.nlist, 2 ** self.pq_nbits)
+        return _MAX_POINTS_PER_CENTROID * self.nlist
+
+
+def build_index(dimension: int, use_cosine: bool, options: IndexOptions) -> faiss.Index:
+    """Create an empty (possibly untrained) index for ``options``."""
+    if options.pca_dimension and not 0 < options.pca_dimension < dimension:
+        raise ValueError(
+            f"PCA dimension ({options.pca_dimension}) must be below dimension ({dimension})"
+        )
+    stored_dimension = options.pca_dimension or dimension
+    if options.index_type == "ivf_pq" and stored_dimension % options.pq_m:
+        raise ValueError(
+            f"PQ sub-quantizers ({options.pq_m}) must divide dimension ({stored_dimension})"
+        )
+
+    metric = faiss.METRIC_INNER_PRODUCT if use_cosine else faiss.METRIC_L2
+    index = faiss.index_factory(dimension, options.factory_string(use_cosine), metric)
+
+    if options.index_type == "hnsw":
+        unwrap(index).hnsw.efConstruction = options.ef_construction
+
+    apply_search_params(index, options)
+    return index
+
+
+def build_flat_index(dimension: int, use_cosine: bool) -> faiss.Index:
+    if use_cosine:
+        return faiss.IndexFlatIP(dimension)
+    return faiss.IndexFlatL2(dimension)
+
+
+def with_ids(index: faiss.Index) -> faiss.Index:
+    """
+    An index whose vectors carry explicit ids. IVF indexes store ids in their
+    inverted lists already; flat and HNSW ones are wrapped in an IndexIDMap2
+    (an index that already holds vectors is rebuilt around an empty copy,
+    keeping ids ``0..n-1``).
+    """
+    if _is_ivf(index) or isinstance(index, faiss.IndexIDMap2):
+        return index
+
+    count = index.ntotal
+    wrapped = empty_like(index)
+    if count:
+        wrapped.add_with_ids(index.reconstruct_n(0, count), np.arange(count, dtype=np.int64))
+    return wrapped
+
+
+def empty_like(index: faiss.Index) -> faiss.Index:
+    """An empty id-carrying index with the structure and training of ``index``."""
+    inner = unwrap(index)
+    if index_type_of(inner) == "hnsw":
+        # Cloning would copy the whole graph just to throw it away
+        fresh = _empty_hnsw(inner)
+    else:
+        fresh = faiss.clone_index(inner)
+        fresh.reset()  # keeps IVF / scalar quantizer training
+
+    transformed = _without_ids(index)
+    if isinstance(transformed, faiss.IndexPreTransform):
+        fresh = _with_transforms(transformed, fresh)
+    return fresh if _is_ivf(fresh) else faiss.IndexIDMap2(fresh)
+
+
+def unwrap(index: faiss.Index) -> faiss.Index:
+    """The index holding the vectors, below any id mapping and PCA transform."""
+    index = _without_ids(index)
+    if isinstance(index, faiss.IndexPreTransform):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def index_vectors(index: faiss.Index, start: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stored vectors and their ids from storage position ``start`` on. Flat and
+    HNSW storage is in insertion order; IVF lists are not, so for IVF
+    ``start`` must be 0 and vectors come back list by list. float16 / int8
+    storage returns the decoded (approximate) vectors.
+    Vectors come back at the input dimension: PCA-reduced ones are projected
+    back, which the same PCA maps onto exactly the stored vectors again.
+    """
+    transformed = _without_ids(index)
+    if _is_ivf(transformed):
+        ivf = faiss.extract_index_ivf(transformed)
+        ids = index_ids(ivf)
+        vectors = np.empty((len(ids), ivf.d), dtype=np.float32)
+        row = 0
+        for list_no in range(ivf.nlist):
+            for offset in range(ivf.invlists.list_size(list_no)):
+                ivf.reconstruct_from_offset(list_no, offset, faiss.swig_ptr(vectors[row]))
+                row += 1
+        if isinstance(transformed, faiss.IndexPreTransform):
+            full = np.empty((len(ids), transformed.d), dtype=np.float32)
+            if len(ids):
+                transformed.reverse_chain(len(ids), faiss.swig_ptr(vectors), faiss.swig_ptr(full))
+            vectors = full
+        return vectors, ids
+
+    vectors = transformed.reconstruct_n(start, transformed.ntotal - start)
+    if transformed is index:
+        return vectors, np.arange(start, index.ntotal, dtype=np.int64)
+    return vectors, faiss.vector_to_array(index.id_map)[start:]
+
+
+def index_ids(index: faiss.Index) -> np.ndarray:
+    """Ids of all stored vectors."""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.vector_to_array(index.id_map)
+    if _is_ivf(index):
+        invlists = faiss.extract_index_ivf(index).invlists
+        lists = [
+            faiss.rev_swig_ptr(invlists.get_ids(list_no), invlists.list_size(list_no)).copy()
+            for list_no in range(invlists.nlist)
+            if invlists.list_size(list_no)
+        ]
+        return np.concatenate(lists) if lists else np.empty(0, dtype=np.int64)
+    return np.arange(index.ntotal, dtype=np.int64)
+
+
+def supports_removal(index: faiss.Index) -> bool:
+    """HNSW graphs cannot drop vectors in place; they are rebuilt instead."""
+    return index_type_of(index) != "hnsw"
+
+
+def index_type_of(index: faiss.Index) -> Optional[str]:
+    """Map a FAISS index instance back to one of INDEX_TYPES."""
+    index = unwrap(index)
+    if isinstance(index, (faiss.IndexFlat, faiss.IndexScalarQuantizer)):
+        return "flat"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, (faiss.IndexIVFFlat, faiss.IndexIVFScalarQuantizer)):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    return None
+
+
+def storage_of(index: faiss.Index) -> str:
+    """Map a FAISS index instance back to one of VECTOR_STORAGE."""
+    index = unwrap(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return _QTYPE_STORAGE.get(index.sq.qtype, "float32")
+    return "float32"
+
+
+def pca_dimension_of(index: faiss.Index) -> int:
+    """Dimension vectors are reduced to before storage (0 = not reduced)."""
+    inner = unwrap(index)
+    return inner.d if inner.d != index.d else 0
+
+
+def describe(index: faiss.Index) -> str:
+    """Short label such as ``hnsw/int8`` or ``flat/float16/pca256``."""
+    label = f"{index_type_of(index)}/{storage_of(index)}"
+    if pca_dimension_of(index):
+        label += f"/pca{pca_dimension_of(index)}"
+    return label
+
+
+def memory_bytes(index: faiss.Index) -> int:
+    """
+    Approximate memory held by the stored vectors: codes, HNSW links, IVF
+    centroids and ids. Cheap enough to read on every metrics scrape.
+    """
+    inner = unwrap(index)
+    total = inner.ntotal
+    if isinstance(inner, faiss.IndexHNSW):
+        storage = faiss.downcast_index(inner.storage)
+        size = storage.code_size * total + inner.hnsw.neighbors.size() * 4
+    elif isinstance(inner, faiss.IndexIVF):
+        size = inner.code_size * total + 8 * total + inner.nlist * inner.d * 4
+        if isinstance(inner, faiss.IndexIVFPQ):
+            size += inner.pq.M * inner.pq.ksub * inner.pq.dsub * 4
+    else:
+        size = inner.code_size * total
+    if isinstance(index, faiss.IndexIDMap):
+        size += 8 * index.ntotal
+    return int(size)
+
+
+def matches(index: faiss.Index, options: IndexOptions) -> bool:
+    """True when ``index`` already has the layout ``options`` asks for."""
+    return (
+        index_type_of(index) == options.index_type
+        and storage_of(index) == options.storage
+        and pca_dimension_of(index) == options.pca_dimension
+    )
+
+
+def apply_search_params(index: faiss.Index, options: IndexOptions):
+    """Set query-time knobs (nprobe / efSearch) on a built or loaded index."""
+    kind = index_type_of(index)
+    if kind in ("ivf_flat", "ivf_pq"):
+        faiss.extract_index_ivf(index).nprobe = options.nprobe
+    elif kind == "hnsw":
+        unwrap(index).hnsw.efSearch = options.ef_search
+
+
+def search_params(
+    index: faiss.Index,
+    options: IndexOptions,
+    selector: faiss.IDSelector,
+) -> faiss.SearchParameters:
+    """
+    Per-call search parameters restricting results to ``selector``. IVF and
+    HNSW take their own parameter types, which also carry nprobe / efSearch.
+    A fresh object is needed per call: IndexIDMap swaps its selector in place.
+    """
+    kind = index_type_of(index)
+    if kind in ("ivf_flat", "ivf_pq"):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=options.nprobe)
+    if kind == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=options.ef_search)
+    return faiss.SearchParameters(sel=selector)
+
+
+def needs_migration(index: faiss.Index, options: IndexOptions) -> bool:
+    """
+    True when a plain float32 flat index holds enough vectors to become the
+    layout ``options`` asks for (another index type, storage or PCA).
+    """
+    return (
+        not options.is_plain_flat()
+        and _is_plain_flat(index)
+        and index.ntotal > 0
+        and index.ntotal >= options.min_training_size()
+    )
+
+
+def train_index(
+    index: faiss.Index,
+    vectors: np.ndarray,
+    options: IndexOptions,
+    seed: int = 1234,
+):
+    """Train ``index`` on (a random sample of) ``vectors`` if it needs training."""
+    if index.is_trained:
+        return
+
+    sample = vectors
+    limit = options.max_training_size()
+    if len(vectors) > limit:
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(len(vectors), size=limit, replace=False)]
+
+    logger.info(f"Training {options.factory_string()} index on {len(sample)} vectors")
+    index.train(np.ascontiguousarray(sample, dtype=np.float32))
+
+
+def build_trained_index(
+    vectors: np.ndarray,
+    dimension: int,
+    use_cosine: bool,
+    options: IndexOptions,
+    ids: Optional[np.ndarray] = None,
+) -> faiss.Index:
+    """
+    Build an ``options.index_type`` index trained on and holding ``vectors``,
+    under the given ``ids`` if any (see ``with_ids``).
+    """
+    index = build_index(dimension, use_cosine, options)
+    train_index(index, vectors, options)
+    if ids is None:
+        index.add(vectors)
+        return index
+    index = with_ids(index)
+    index.add_with_ids(vectors, ids)
+    return index
+
+
+def _is_ivf(index: faiss.Index) -> bool:
+    return isinstance(unwrap(index), faiss.IndexIVF)
+
+
+def _is_plain_flat(index: faiss.Index) -> bool:
+    return isinstance(_without_ids(index), faiss.IndexFlat)
+
+
+def _without_ids(index: faiss.Index) -> faiss.Index:
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def _empty_hnsw(inner: faiss.Index) -> faiss.Index:
+    m = inner.hnsw.nb_neighbors(1)
+    storage = faiss.downcast_index(inner.storage)
+    if isinstance(storage, faiss.IndexScalarQuantizer):
+        fresh = faiss.IndexHNSWSQ(inner.d, storage.sq.qtype, m, inner.metric_type)
+        # Reuse the learnt value ranges instead of retraining
+        fresh_storage = faiss.downcast_index(fresh.storage)
+        faiss.copy_array_to_vector(
+            faiss.vector_to_array(storage.sq.trained), fresh_storage.sq.trained
+        )
+        fresh_storage.is_trained = fresh.is_trained = True
+    else:
+        fresh = faiss.index_factory(inner.d, f"HNSW{m},Flat", inner.metric_type)
+    fresh.hnsw.efConstruction = inner.hnsw.efConstruction
+    fresh.hnsw.efSearch = inner.hnsw.efSearch
+    return fresh
+
+
+def _with_transforms(source: faiss.IndexPreTransform, index: faiss.Index) -> faiss.Index:
+    """``index`` behind copies of the (trained) transforms of ``source``."""
+    wrapped = faiss.IndexPreTransform(index)
+    for i in reversed(range(source.chain.size())):
+        # Not every transform supports clone_index; a serialised copy always works
+        writer = faiss.VectorIOWriter()
+        faiss.write_VectorTransform(source.chain.at(i), writer)
+        reader = faiss.VectorIOReader()
+        reader.data = writer.data
+        wrapped.prepend_transform(faiss.read_VectorTransform(reader))
+    return wrapped
@@ -0,0 +1,223 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobStore:
+    """
+    SQLite-backed ingestion job table. Jobs survive restarts: anything left
+    ``running`` by a dead process is put back in the queue on startup.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " filename TEXT NOT NULL,"
+            " file_path TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " stage TEXT NOT NULL,"
+            " progress REAL NOT NULL DEFAULT 0,"
+            " chunks_indexed INTEGER,"
+            " error TEXT,"
+            " worker_pid INTEGER,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " metadata TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+        # Tables created before per-document metadata existed
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "metadata" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN metadata TEXT")
+
+    def create(self, filename: str, file_path: str, metadata: Optional[dict] = None) -> dict:
+        """Queue a job; ``metadata`` is added to every chunk of the document."""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, filename, file_path, status, stage, progress,"
+                " created_at, updated_at, metadata)"
+                " VALUES (?, ?, ?, 'queued', 'queued', 0, ?, ?, ?)",
+                (job_id, filename, file_path, now, now, json.dumps(metadata) if metadata else None),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?",
+                list(fields.values()) + [job_id],
+            )
+
+    def claim_next(self) -> Optional[dict]:
+        """Atomically move the oldest queued job to ``running``."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', worker_pid = ?, updated_at = ?"
+                        " WHERE id = ?",
+                        (os.getpid(), time.time(), row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"]) if row else None
+
+    def requeue_interrupted(self) -> int:
+        """Re-queue jobs whose worker process is gone (or is this, fresh, process)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, worker_pid FROM jobs WHERE status = 'running'"
+            ).fetchall()
+        stale = [row["id"] for row in rows if not _worker_alive(row["worker_pid"])]
+        for job_id in stale:
+            self.update(job_id, status="queued", stage="queued", progress=0, worker_pid=None)
+        return len(stale)
+
+    def list_recent(self, limit: int = 50) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+class IngestQueue:
+    """
+    Runs queued ingestion jobs on ``concurrency`` asyncio worker tasks.
+
+    ``handler(job, report)`` does the work and returns the number of chunks
+    indexed; ``report(stage, progress)`` records progress on the job row.
+
+    Several processes may share the job table. Only a process for which
+    ``accepts_jobs()`` is true claims jobs (the one writing the index), and
+    it checks every ``poll_interval`` seconds for jobs queued by the others.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        handler: Callable[[dict, Callable[[str, float], None]], Awaitable[int]],
+        concurrency: int = 2,
+        accepts_jobs: Optional[Callable[[], Awaitable[bool]]] = None,
+        poll_interval: float = 2.0,
+    ):
+        self.store = store
+        self.handler = handler
+        self.concurrency = concurrency
+        self.accepts_jobs = accepts_jobs
+        self.poll_interval = poll_interval
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self):
+        requeued = await asyncio.to_thread(self.store.requeue_interrupted)
+        if requeued:
+            logger.info(f"Re-queued {requeued} interrupted ingestion jobs")
+
+        self._wakeup = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"ingest-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def enqueue(self, filename: str, file_path: str, metadata: Optional[dict] = None) -> dict:
+        job = self.store.create(filename, file_path, metadata)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        logger.info(f"Queued ingestion job {job['id']} for {filename}")
+        return job
+
+    async def _worker(self, worker_id: int):
+        while True:
+            # Clear before claiming so an enqueue in between is not missed
+            self._wakeup.clear()
+            job = None
+            if self.accepts_jobs is None or await self.accepts_jobs():
+                job = await asyncio.to_thread(self.store.claim_next)
+            if job is None:
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                continue
+
+            await self._run(job)
+
+    async def _run(self, job: dict):
+        job_id = job["id"]
+
+        def report(stage: str, progress: float):
+            self.store.update(job_id, stage=stage, progress=round(progress, 3))
+
+        started = time.perf_counter()
+        try:
+            chunks_indexed = await self.handler(job, report)
+        except asyncio.CancelledError:
+            # Shutdown: leave the job for requeue_interrupted on next start
+            raise
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {e}", exc_info=True)
+            self.store.update(job_id, status="failed", error=str(e))
+            return
+
+        self.store.update(
+            job_id,
+            status="completed",
+            stage="done",
+            progress=1.0,
+            chunks_indexed=chunks_indexed,
+        )
+        logger.info(
+            f"Ingestion job {job_id} indexed {chunks_indexed} chunks "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+
+def _worker_alive(pid: Optional[int]) -> bool:
+    if not pid or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import DEFAULT_LLM_MODEL, INGEST_EMBED_BATCH_CHUNKS
+from app.core.metrics import (
+    INGEST_CHUNKS,
+    INGEST_CHUNKS_PER_SECOND,
+    INGEST_CHUNKS_REUSED,
+    INGEST_DOCUMENTS,
+    INGEST_PAGES,
+    INGEST_PAGES_PER_SECOND,
+)
+from app.utils.tokenizer import get_encoding
+from app.utils.text_extractor import iter_pdf_pages, pdf_page_count
+from app.utils.text_splitter import split_pages
+from app.services.document_registry import DocumentRegistry, chunk_hash, file_hash
+from app.services.embedding_service import embed_texts_async
+
+if TYPE_CHECKING:
+    from app.services.faiss_service import FaissStore
+
+logger = logging.getLogger(__name__)
+
+# Share of job progress at the start of each pipeline stage
+STAGE_PROGRESS = {
+    "extracting": 0.0,
+    "embedding": 0.5,
+    "indexing": 0.9,
+}
+
+
+class IngestionError(Exception):
+    """Raised when a document cannot be ingested."""
+    pass
+
+
+class DocumentRevision:
+    """
+    Assigns chunk ids to a new version of a document, reusing the id of
+    every chunk whose hash was already indexed (``previous`` is
+    {chunk_id: chunk_hash}, None to index everything afresh). ``next_id``
+    is the registry's high-water mark for the document.
+    """
+
+    def __init__(self, previous: Optional[Dict[int, str]] = None, next_id: Optional[int] = None):
+        self.incremental = previous is not None
+        # Indexed chunk ids not yet matched, per hash, in document order
+        self._unmatched: Dict[str, List[int]] = {}
+        for chunk_id, digest in sorted((previous or {}).items()):
+            self._unmatched.setdefault(digest, []).append(chunk_id)
+        # New chunks get ids the document has never used, not even for a
+        # chunk an earlier revision retired, so (source, chunk_id) keys
+        # elsewhere never name a different text
+        if next_id is None:
+            next_id = max(previous) + 1 if previous else 0
+        self.next_id = next_id
+        self.chunks: Dict[int, str] = {}
+        self.kept = 0
+
+    def assign(self, chunk: dict) -> bool:
+        """Set ``chunk_id`` on ``chunk``; True when it is new and must be embedded."""
+        digest = chunk.pop("chunk_hash")
+        matches = self._unmatched.get(digest)
+        is_new = not matches
+        if is_new:
+            chunk["chunk_id"] = self.next_id
+            self.next_id += 1
+        else:
+            chunk["chunk_id"] = matches.pop(0)
+            self.kept += 1
+        self.chunks[chunk["chunk_id"]] = digest
+        return is_new
+
+    def retired(self) -> List[int]:
+        """Indexed chunk ids that no chunk of the new version matched."""
+        return [chunk_id for ids in self._unmatched.values() for chunk_id in ids]
+
+
+def indexed_version(
+    registry: DocumentRegistry,
+    faiss_store: "FaissStore",
+    source: str,
+    content_hash: str,
+) -> Optional[dict]:
+    """Registry record of ``source``, if it still describes what the index holds."""
+    previous = registry.get(source)
+    if previous is None:
+        duplicates = registry.find(content_hash)
+        if duplicates:
+            logger.info(f"{source} has the same content as {', '.join(duplicates)}")
+        return None
+
+    if sorted(faiss_store.chunk_ids(source)) != sorted(previous["chunks"]):
+        # e.g. the index was rebuilt or the job died between the two writes
+        logger.warning(f"Document registry is out of date for {source}; re-indexing it in full")
+        return None
+    return previous
+
+
+def chunk_metadata(
+    chunks: List[dict],
+    source: str,
+    document_metadata: Optional[dict],
+    token_encoding: str,
+) -> List[dict]:
+    """Stored metadata of split chunks (their text already taken out)."""
+    return [
+        {
+            **(document_metadata or {}),
+            "source": source,
+            **chunk,
+            "token_encoding": token_encoding,
+        }
+        for chunk in chunks
+    ]
+
+
+async def ingest_document(
+    file_path: str,
+    source: str,
+    faiss_store: "FaissStore",
+    report: Callable[[str, float], None] = lambda stage, progress: None,
+    document_metadata: Optional[dict] = None,
+    registry: Optional[DocumentRegistry] = None,
+    on_commit: Optional[Callable[[str], None]] = None,
+) -> int:
+    """
+    Run extract -> split -> embed -> index for one PDF.
+
+    Pages are extracted and split on a worker thread and handed over in
+    batches of chunks, so embedding starts long before the last page is
+    parsed. All chunks are indexed in one write at the end, so a failed job
+    leaves nothing half-indexed. ``report`` may be called from that thread.
+    ``document_metadata`` (e.g. a department) is stored on every chunk.
+
+    With a ``registry`` the file is compared with what was last indexed for
+    ``source``: an unchanged file is skipped before extraction, and for a
+    revision only new or modified chunks are embedded and added while
+    chunks that are gone are retired; the rest stay in the index as they
+    are. Changed ``document_metadata`` re-indexes every chunk.
+    ``on_commit(source)`` is called once the write has changed the index,
+    so never for an unchanged file, even one whose chunks all matched.
+    Returns the number of chunks indexed.
+    """
+    started = time.perf_counter()
+    revision = DocumentRevision()
+    content_hash = None
+    if registry is not None:
+        content_hash = await asyncio.to_thread(file_hash, file_path)
+        previous = await asyncio.to_thread(
+            indexed_version, registry, faiss_store, source, content_hash
+        )
+        if previous is not None and previous["metadata"] == (document_metadata or None):
+            if previous["content_hash"] == content_hash:
+                INGEST_DOCUMENTS.inc(outcome="unchanged")
+                logger.info(f"{source} is unchanged since it was indexed; skipping")
+                return 0
+            revision = DocumentRevision(previous["chunks"], previous["next_chunk_id"])
+
+    loop = asyncio.get_running_loop()
+    batches: asyncio.Queue = asyncio.Queue()
+    page_count = await asyncio.to_thread(pdf_page_count, file_path)
+
+    extract_span = STAGE_PROGRESS["embedding"] - STAGE_PROGRESS["extracting"]
+    # report writes the job row (SQLite); never on the event loop
+    await asyncio.to_thread(report, "extracting", STAGE_PROGRESS["extracting"])
+
+    extract_seconds = 0.0
+    token_encoding = get_encoding(DEFAULT_LLM_MODEL).name
+    # Set when the job fails, so extraction stops instead of filling the queue for nobody
+    stop_extracting = threading.Event()
+
+    def produce():
+        nonlocal extract_seconds
+
+        def pages():
+            for page_number, text in iter_pdf_pages(file_path):
+                if stop_extracting.is_set():
+                    return
+                report("extracting", extract_span * page_number / max(page_count, 1))
+                yield page_number, text
+
+        try:
+            batch: List[dict] = []
+            # Sized in the answer model's tokens so the counts can be reused
+            # when budgeting context (see answer_service.chunk_token_counts)
+            for chunk in split_pages(pages(), model=DEFAULT_LLM_MODEL):
+                if stop_extracting.is_set():
+                    return
+                chunk["chunk_hash"] = chunk_hash(chunk, token_encoding)
+                batch.append(chunk)
+                if len(batch) >= INGEST_EMBED_BATCH_CHUNKS:
+                    loop.call_soon_threadsafe(batches.put_nowait, batch)
+                    batch = []
+            if batch:
+                loop.call_soon_threadsafe(batches.put_nowait, batch)
+            extract_seconds = time.perf_counter() - started
+        finally:
+            loop.call_soon_threadsafe(batches.put_nowait, None)
+
+    producer = asyncio.create_task(asyncio.to_thread(produce))
+    chunks: List[dict] = []
+    embed_tasks: List[asyncio.Task] = []
+
+    try:
+        while (batch := await batches.get()) is not None:
+            # A failed embedding request fails the job now, not once the whole PDF is parsed
+            for task in embed_tasks:
+                if task.done() and not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+            # Chunks already in the index are neither embedded nor re-added
+            new_chunks = [chunk for chunk in batch if revision.assign(chunk)]
+            if new_chunks:
+                chunks.extend(new_chunks)
+                texts = [chunk["text"] for chunk in new_chunks]
+                embed_tasks.append(asyncio.create_task(embed_texts_async(texts)))
+
+        await producer  # re-raises extraction errors
+
+        if not revision.chunks:
+            raise IngestionError(f"No text could be extracted from {source}")
+
+        logger.info(
+            f"Extracted {len(revision.chunks)} chunks from {source}"
+            + (f", {revision.kept} already indexed" if revision.incremental else "")
+        )
+
+        embed_start = STAGE_PROGRESS["embedding"]
+        embed_span = STAGE_PROGRESS["indexing"] - embed_start
+        embedded = 0
+        await asyncio.to_thread(report, "embedding", embed_start)
+        for task in asyncio.as_completed(embed_tasks):
+            embedded += len(await task)
+            await asyncio.to_thread(report, "embedding", embed_start + embed_span * embedded / len(chunks))
+
+        # Batches were scheduled in document order; gather keeps that order
+        embeddings = np.concatenate(await asyncio.gather(*embed_tasks)) if embed_tasks else []
+    except BaseException as error:
+        stop_extracting.set()
+        for task in embed_tasks:
+            task.cancel()
+        # The extraction thread must not outlive the job, nor its error go unseen
+        await asyncio.wait([producer])
+        extract_error = None if producer.cancelled() else producer.exception()
+        if extract_error is not None and extract_error is not error:
+            logger.warning(f"Extraction of {source} also failed: {extract_error}")
+        raise
+
+    await asyncio.to_thread(report, "indexing", STAGE_PROGRESS["indexing"])
+    texts = [chunk.pop("text") for chunk in chunks]
+    metadata = chunk_metadata(chunks, source, document_metadata, token_encoding)
+    retired = revision.retired()
+    changed = not revision.incremental or bool(chunks or retired)
+    if not revision.incremental:
+        # A re-uploaded document replaces its previous chunks instead of duplicating them
+        await asyncio.to_thread(faiss_store.replace, source, embeddings, texts, metadata)
+    elif changed:
+        await asyncio.to_thread(
+            faiss_store.update, source, retired, embeddings, texts, metadata
+        )
+    if changed and on_commit is not None:
+        on_commit(source)
+    # Recorded only once the index holds this version
+    if registry is not None:
+        await asyncio.to_thread(
+            registry.put,
+            source,
+            content_hash,
+            document_metadata,
+            revision.chunks,
+            revision.next_id,
+        )
+
+    elapsed = time.perf_counter() - started
+    INGEST_PAGES.inc(page_count)
+    INGEST_CHUNKS.inc(len(chunks))
+    INGEST_CHUNKS_REUSED.inc(revision.kept)
+    INGEST_DOCUMENTS.inc(outcome="incremental" if revision.incremental else "full")
+    if extract_seconds > 0:
+        INGEST_PAGES_PER_SECOND.observe(page_count / extract_seconds)
+    INGEST_CHUNKS_PER_SECOND.observe(len(revision.chunks) / elapsed)
+
+    if revision.incremental:
+        logger.info(
+            f"Updated {source} in {elapsed:.2f}s: {len(chunks)} chunks indexed, "
+            f"{revision.kept} unchanged, {len(retired)} retired"
+        )
+    else:
+        logger.info(f"Successfully indexed {len(chunks)} chunks for {source} in {elapsed:.2f}s")
+    return len(chunks)
@@ -0,0 +1,337 @@
+import logging
+import math
+import os
+import re
+import shutil
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Words, plus codes such as "POL-2024-17" or "v2.3.1" kept whole
+_TOKEN = re.compile(r"\w+(?:[-./]\w+)*")
+_CODE_SEPARATORS = re.compile(r"[-./]")
+
+_MAX_TF = np.iinfo(np.uint16).max
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased terms; a code is indexed whole and by its parts."""
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(part for part in _CODE_SEPARATORS.split(token) if part)
+    return terms
+
+
+def analyze(texts: List[str]) -> List[Counter]:
+    """Term frequencies per text; safe to run without the index's lock."""
+    return [Counter(tokenize(text)) for text in texts]
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over chunk texts, keyed by the same ids as the
+    FAISS index.
+
+    Postings are kept in two tiers:
+
+    - a base segment of flat arrays (``offsets`` per term into ``doc_ids``
+      uint32 / ``tfs`` uint16), written next to each FAISS generation and
+      read back through mmap
+    - pending postings added since that generation, appended per batch
+
+    A snapshot merges both tiers, dropping removed documents, into the next
+    base segment (``capture`` under the owner's lock, ``write`` without it,
+    ``fold`` to swap it in). Removed documents are masked out at query time
+    until then.
+
+    No locking of its own; FaissStore serialises writers and excludes
+    searches while mutating it.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+        self._terms: List[str] = []
+        self._term_ids: Dict[str, int] = {}
+
+        # Base segment
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._doc_ids = np.empty(0, dtype=np.uint32)
+        self._tfs = np.empty(0, dtype=np.uint16)
+
+        # Pending postings: per-batch arrays (for snapshots) and per-term
+        # lists of those arrays (for queries)
+        self._batches: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self._pending: Dict[int, List[Tuple[np.ndarray, np.ndarray]]] = {}
+
+        # Per-document length and liveness, indexed by id
+        self._lengths = np.zeros(0, dtype=np.uint32)
+        self._live = np.zeros(0, dtype=bool)
+        self._removed: set = set()
+
+        self._live_docs = 0
+        self._total_length = 0
+
+    def __len__(self):
+        return self._live_docs
+
+    # -------------------------
+    # UPDATE
+    # -------------------------
+    def add(self, ids: np.ndarray, term_counts: List[Counter]):
+        """Index documents ``ids`` with their ``analyze`` output."""
+        if not len(ids):
+            return
+        ids = np.asarray(ids, dtype=np.int64)
+        self._ensure_capacity(int(ids.max()) + 1)
+
+        term_ids, doc_ids, tfs = [], [], []
+        lengths = np.zeros(len(ids), dtype=np.uint32)
+        for position, (idx, counts) in enumerate(zip(ids.tolist(), term_counts)):
+            for term, tf in counts.items():
+                term_ids.append(self._term_id(term))
+                doc_ids.append(idx)
+                tfs.append(min(tf, _MAX_TF))
+            lengths[position] = sum(counts.values())
+
+        self._lengths[ids] = lengths
+        self._live[ids] = lengths > 0
+        self._live_docs += int((lengths > 0).sum())
+        self._total_length += int(lengths.sum())
+
+        if term_ids:
+            batch = (
+                np.array(term_ids, dtype=np.int64),
+                np.array(doc_ids, dtype=np.uint32),
+                np.array(tfs, dtype=np.uint16),
+            )
+            self._batches.append(batch)
+            self._index_batch(batch)
+
+    def remove(self, ids: np.ndarray):
+        ids = np.asarray(ids, dtype=np.int64)
+        ids = ids[(ids < len(self._live))]
+        ids = ids[self._live[ids]]
+        if not len(ids):
+            return
+        self._live[ids] = False
+        self._live_docs -= len(ids)
+        self._total_length -= int(self._lengths[ids].sum())
+        # A zero length marks the document as gone in the next snapshot
+        self._lengths[ids] = 0
+        self._removed.update(ids.tolist())
+
+    # -------------------------
+    # QUERY
+    # -------------------------
+    def search(
+        self,
+        query: str,
+        k: int,
+        include: Optional[np.ndarray] = None,
+        exclude: Optional[np.ndarray] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Top ``k`` (id, BM25 score) for ``query`` among live documents, limited
+        to sorted id arrays ``include`` and outside ``exclude`` when given.
+        """
+        if not self._live_docs:
+            return []
+
+        n_docs = self._live_docs
+        avg_length = self._total_length / n_docs
+
+        matched_ids, matched_scores = [], []
+        for term in set(tokenize(query)):
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                continue
+            doc_ids, tfs = self._postings(term_id)
+            if not len(doc_ids):
+                continue
+
+            # Removed documents still count towards df until the next snapshot
+            df = len(doc_ids)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            tf = tfs.astype(np.float32)
+            # Removed documents have length 0 here; they are masked out below
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_ids] / avg_length)
+            matched_ids.append(doc_ids)
+            matched_scores.append(idf * tf * (self.k1 + 1) / (tf + norm))
+
+        if not matched_ids:
+            return []
+
+        if len(matched_ids) == 1:
+            ids, scores = matched_ids[0].astype(np.int64), matched_scores[0]
+        else:
+            ids, inverse = np.unique(np.concatenate(matched_ids), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(matched_scores))
+
+        keep = self._live[ids]
+        if include is not None:
+            keep &= np.isin(ids, include, assume_unique=True)
+        if exclude is not None and len(exclude):
+            keep &= ~np.isin(ids, exclude, assume_unique=True)
+        ids, scores = ids[keep], scores[keep]
+
+        if len(ids) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            ids, scores = ids[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return [(int(ids[i]), float(scores[i])) for i in order]
+
+    # -------------------------
+    # SNAPSHOTS
+    # -------------------------
+    def capture(self) -> dict:
+        """State for ``write``; call under the owner's write lock."""
+        return {
+            "terms": len(self._terms),
+            "offsets": self._offsets,
+            "doc_ids": self._doc_ids,
+            "tfs": self._tfs,
+            "batches": list(self._batches),
+            "removed": np.array(sorted(self._removed), dtype=np.int64),
+            "lengths": self._lengths[: self._size()].copy(),
+        }
+
+    def write(self, directory: str, state: dict) -> dict:
+        """
+        Merge a captured state into one base segment under ``directory``.
+        Touches nothing live, so it can run without the owner's locks.
+        """
+        n_terms = state["terms"]
+        base_terms = len(state["offsets"]) - 1
+        parts = [(
+            np.repeat(np.arange(base_terms, dtype=np.int64), np.diff(state["offsets"])),
+            np.asarray(state["doc_ids"]),
+            np.asarray(state["tfs"]),
+        )]
+        parts.extend(state["batches"])
+
+        term_ids = np.concatenate([p[0] for p in parts])
+        doc_ids = np.concatenate([p[1] for p in parts])
+        tfs = np.concatenate([p[2] for p in parts])
+
+        if len(state["removed"]):
+            keep = ~np.isin(doc_ids, state["removed"])
+            term_ids, doc_ids, tfs = term_ids[keep], doc_ids[keep], tfs[keep]
+
+        order = np.lexsort((doc_ids, term_ids))
+        term_ids, doc_ids, tfs = term_ids[order], doc_ids[order], tfs[order]
+        offsets = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=n_terms), out=offsets[1:])
+
+        tmp = f"{directory}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        with open(os.path.join(tmp, "terms.txt"), "w", encoding="utf-8") as f:
+            f.write("\n".join(self._terms[:n_terms]))
+        for name, array in (
+            ("offsets", offsets),
+            ("doc_ids", doc_ids.astype(np.uint32)),
+            ("tfs", tfs.astype(np.uint16)),
+            ("lengths", state["lengths"]),
+        ):
+            with open(os.path.join(tmp, f"{name}.npy"), "wb") as f:
+                np.save(f, array)
+                f.flush()
+                os.fsync(f.fileno())
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp, directory)
+
+        return _read_segment(directory)
+
+    def fold(self, state: dict, segment: dict):
+        """Adopt the segment written from ``state``; keeps later additions."""
+        self._offsets = segment["offsets"]
+        self._doc_ids = segment["doc_ids"]
+        self._tfs = segment["tfs"]
+        self._removed.difference_update(state["removed"].tolist())
+
+        self._batches = self._batches[len(state["batches"]):]
+        self._pending = {}
+        for batch in self._batches:
+            self._index_batch(batch)
+
+    @classmethod
+    def load(cls, directory: str, k1: float = 1.2, b: float = 0.75) -> "LexicalIndex":
+        index = cls(k1=k1, b=b)
+        with open(os.path.join(directory, "terms.txt"), "r", encoding="utf-8") as f:
+            content = f.read()
+        index._terms = content.split("\n") if content else []
+        index._term_ids = {term: i for i, term in enumerate(index._terms)}
+
+        segment = _read_segment(directory)
+        index._offsets = segment["offsets"]
+        index._doc_ids = segment["doc_ids"]
+        index._tfs = segment["tfs"]
+
+        lengths = np.array(segment["lengths"], dtype=np.uint32)
+        index._lengths = lengths
+        index._live = lengths > 0
+        index._live_docs = int(index._live.sum())
+        index._total_length = int(lengths.sum())
+        return index
+
+    # -------------------------
+    # INTERNAL
+    # -------------------------
+    def _term_id(self, term: str) -> int:
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            term_id = len(self._terms)
+            self._terms.append(term)
+            self._term_ids[term] = term_id
+        return term_id
+
+    def _index_batch(self, batch: Tuple[np.ndarray, np.ndarray, np.ndarray]):
+        term_ids, doc_ids, tfs = batch
+        order = np.argsort(term_ids, kind="stable")
+        sorted_terms = term_ids[order]
+        bounds = np.flatnonzero(np.diff(sorted_terms)) + 1
+        for group in np.split(order, bounds):
+            self._pending.setdefault(int(term_ids[group[0]]), []).append(
+                (doc_ids[group], tfs[group])
+            )
+
+    def _postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        doc_ids, tfs = [], []
+        if term_id < len(self._offsets) - 1:
+            start, end = int(self._offsets[term_id]), int(self._offsets[term_id + 1])
+            doc_ids.append(self._doc_ids[start:end])
+            tfs.append(self._tfs[start:end])
+        for pending_ids, pending_tfs in self._pending.get(term_id, ()):
+            doc_ids.append(pending_ids)
+            tfs.append(pending_tfs)
+        if len(doc_ids) == 1:
+            return doc_ids[0], tfs[0]
+        return np.concatenate(doc_ids), np.concatenate(tfs)
+
+    def _size(self) -> int:
+        live = np.flatnonzero(self._live)
+        return int(live[-1]) + 1 if len(live) else 0
+
+    def _ensure_capacity(self, size: int):
+        if size <= len(self._lengths):
+            return
+        capacity = max(size, 2 * len(self._lengths), 1024)
+        lengths = np.zeros(capacity, dtype=np.uint32)
+        lengths[: len(self._lengths)] = self._lengths
+        live = np.zeros(capacity, dtype=bool)
+        live[: len(self._live)] = self._live
+        self._lengths, self._live = lengths, live
+
+
+def _read_segment(directory: str) -> dict:
+    return {
+        name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+        for name in ("offsets", "doc_ids", "tfs", "lengths")
+    }
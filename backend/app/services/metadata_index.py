@@ -0,0 +1,122 @@
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Operators accepted in a filter condition; a bare value means "eq" and a
+# list means "in"
+FILTER_OPERATORS = ("eq", "ne", "in", "not_in")
+
+_SCALAR_TYPES = (str, int, float, bool)
+
+
+class FilterError(ValueError):
+    """Raised for a filter expression that cannot be evaluated."""
+    pass
+
+
+class MetadataIndex:
+    """
+    Inverted index from metadata field values to the ids of live chunks.
+
+    Only ``fields`` are indexed, and only scalar values. Filters are
+    resolved to id sets here and handed to FAISS as an IDSelector, so a
+    filtered search scans the same index once instead of over-fetching and
+    discarding hits in Python.
+
+    Filter expressions map a field to a condition, all conditions must hold:
+
+        {"source": "handbook.pdf"}
+        {"department": ["hr", "legal"]}
+        {"department": {"ne": "finance"}, "source": {"not_in": ["old.pdf"]}}
+
+    Not thread-safe; FaissStore mutates it under its write lock.
+    """
+
+    def __init__(self, fields: Sequence[str] = ("source",)):
+        self.fields = tuple(dict.fromkeys(["source", *fields]))
+        self._postings: Dict[str, Dict[Hashable, Set[int]]] = {
+            field: {} for field in self.fields
+        }
+
+    # -------------------------
+    # UPDATE
+    # -------------------------
+    def add(self, field: str, ids: Iterable[int], values: Iterable[Any]):
+        postings = self._postings[field]
+        for idx, value in zip(ids, values):
+            if isinstance(value, _SCALAR_TYPES):
+                postings.setdefault(value, set()).add(idx)
+
+    def remove(self, field: str, ids: Iterable[int], values: Iterable[Any]):
+        postings = self._postings[field]
+        for idx, value in zip(ids, values):
+            if not isinstance(value, _SCALAR_TYPES):
+                continue
+            matching = postings.get(value)
+            if matching is None:
+                continue
+            matching.discard(idx)
+            if not matching:
+                del postings[value]
+
+    # -------------------------
+    # QUERY
+    # -------------------------
+    def ids(self, field: str, value: Hashable) -> Set[int]:
+        """Live ids whose ``field`` equals ``value`` (do not mutate)."""
+        return self._postings[field].get(value, set())
+
+    def check(self, filters: Dict[str, Any]):
+        """Raise FilterError if ``filters`` is malformed or uses unindexed fields."""
+        if not isinstance(filters, dict):
+            raise FilterError("Filters must map field names to conditions")
+        for field, condition in filters.items():
+            _parse_condition(field, condition)
+            if field not in self._postings:
+                raise FilterError(
+                    f"Cannot filter on '{field}'; filterable fields are {list(self.fields)}"
+                )
+
+    def resolve(self, filters: Dict[str, Any]) -> Tuple[Optional[Set[int]], Set[int]]:
+        """
+        Evaluate ``filters`` to ``(include, exclude)``: a result id must be in
+        ``include`` (None = no restriction) and must not be in ``exclude``.
+        """
+        self.check(filters)
+        include: Optional[Set[int]] = None
+        exclude: Set[int] = set()
+
+        for field, condition in filters.items():
+            op, values = _parse_condition(field, condition)
+            postings = self._postings[field]
+            matched = [postings[value] for value in values if value in postings]
+            if op in ("eq", "in"):
+                if len(matched) == 1:
+                    matched_ids = matched[0]
+                else:
+                    matched_ids = set().union(*matched)
+                include = matched_ids if include is None else include & matched_ids
+            else:
+                exclude = exclude.union(*matched)
+
+        return include, exclude
+
+
+def _parse_condition(field: str, condition: Any) -> Tuple[str, List[Hashable]]:
+    if isinstance(condition, dict):
+        if len(condition) != 1:
+            raise FilterError(f"Condition on '{field}' must have exactly one operator")
+        op, operand = next(iter(condition.items()))
+        if op not in FILTER_OPERATORS:
+            raise FilterError(
+                f"Unknown operator '{op}' on '{field}'; expected one of {FILTER_OPERATORS}"
+            )
+    elif isinstance(condition, list):
+        op, operand = "in", condition
+    else:
+        op, operand = "eq", condition
+
+    values = operand if op in ("in", "not_in") else [operand]
+    if not isinstance(values, list) or not all(
+        isinstance(value, _SCALAR_TYPES) for value in values
+    ):
+        raise FilterError(f"Condition on '{field}' must use scalar values")
+    return op, values
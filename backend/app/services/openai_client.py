@@ -0,0 +1,89 @@
+from typing import TYPE_CHECKING, Dict, Optional
+
+from app.core.config import (
+    OPENAI_API_KEY,
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    OPENAI_TIMEOUT_SECONDS,
+)
+
+# The openai package takes about half a second to import (its API type
+# models), so it is imported by the first call rather than at app startup
+if TYPE_CHECKING:
+    import httpx
+    from openai import AsyncOpenAI, OpenAI
+
+_http_client: Optional["httpx.AsyncClient"] = None
+_clients: Dict[int, "AsyncOpenAI"] = {}
+_sync_client: Optional["OpenAI"] = None
+
+
+def get_openai() -> "OpenAI":
+    """Sync client, for the code paths that run on worker threads."""
+    global _sync_client
+
+    if _sync_client is None:
+        from openai import OpenAI
+
+        _sync_client = OpenAI(api_key=OPENAI_API_KEY)
+
+    return _sync_client
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Rate limits, timeouts, dropped connections and 5xx responses."""
+    import openai
+
+    return isinstance(
+        error,
+        (
+            openai.RateLimitError,
+            openai.APITimeoutError,
+            openai.APIConnectionError,
+            openai.InternalServerError,
+        ),
+    )
+
+
+def get_async_http_client() -> "httpx.AsyncClient":
+    """One pooled HTTP client (keep-alive connections) for every async OpenAI call."""
+    global _http_client
+
+    if _http_client is None:
+        import httpx
+        from openai import DefaultAsyncHttpxClient
+
+        _http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=10.0),
+        )
+
+    return _http_client
+
+
+def get_async_openai(max_retries: int = 2) -> "AsyncOpenAI":
+    """``AsyncOpenAI`` on the shared connection pool, one per retry policy."""
+    client = _clients.get(max_retries)
+    if client is None:
+        from openai import AsyncOpenAI
+
+        client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            http_client=get_async_http_client(),
+            max_retries=max_retries,
+        )
+        _clients[max_retries] = client
+    return client
+
+
+async def close_async_clients():
+    """Close the pool on shutdown; the next call opens a fresh one."""
+    global _http_client
+
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _clients.clear()
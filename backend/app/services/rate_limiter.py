@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import re
+import threading
+import time
+from typing import Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parse OpenAI reset headers such as ``"20ms"``, ``"1s"`` or ``"6m0s"``."""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """Continuously refilling bucket holding up to ``capacity`` units per minute."""
+    def __init__(self, capacity_per_minute: float):
+        self.capacity = float(capacity_per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / 60.0
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self.refill(now)
+        # A single request larger than the bucket only has to wait for a full one
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+
+class RateLimiter:
+    """
+    Client-side requests-per-minute and tokens-per-minute limiter.
+
+    ``acquire`` waits until both buckets can cover a request. After each
+    response, ``update_from_headers`` syncs the buckets with the
+    ``x-ratelimit-*`` headers, so the server's view of the remaining budget
+    wins over the local estimate. When a budget is exhausted, every caller
+    pauses until the advertised reset.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._blocked_until = 0.0
+        # Guards bucket state only; never held across an await
+        self._lock = threading.Lock()
+
+    async def acquire(self, tokens: int):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = max(
+                    self.requests.wait_time(1, now),
+                    self.tokens.wait_time(tokens, now),
+                    self._blocked_until - now,
+                )
+                if wait <= 0:
+                    self.requests.level -= 1
+                    self.tokens.level -= min(tokens, self.tokens.capacity)
+                    return
+            await asyncio.sleep(wait)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        with self._lock:
+            now = time.monotonic()
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                limit = _int_header(headers, f"x-ratelimit-limit-{kind}")
+                remaining = _int_header(headers, f"x-ratelimit-remaining-{kind}")
+                reset = parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+
+                bucket.refill(now)
+                if limit:
+                    bucket.capacity = float(limit)
+                if remaining is not None:
+                    bucket.level = min(bucket.level, float(remaining))
+                    if remaining == 0 and reset:
+                        self._blocked_until = max(self._blocked_until, now + reset)
+
+    def penalize(self, seconds: float):
+        """Pause all callers, e.g. for a 429's ``retry-after``."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        logger.warning(f"Rate limited, pausing embedding requests for {seconds:.1f}s")
+
+
+def _int_header(headers: Mapping[str, str], name: str) -> Optional[int]:
+    value = headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.concurrency import run_search
+from app.core.config import HYBRID_CANDIDATES, HYBRID_RRF_K, SEARCH_DEFAULT_MODE
+from app.core.metrics import RAG_STAGE_SECONDS
+from app.services.embedding_service import embed_texts_async
+
+if TYPE_CHECKING:
+    from app.services.faiss_service import FaissStore
+
+# "dense" = FAISS over embeddings, "lexical" = BM25, "hybrid" = both fused
+SEARCH_MODES = ("dense", "lexical", "hybrid")
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Tuple[int, float]]],
+    k: int,
+    rrf_k: int = 60,
+) -> List[Tuple[int, float]]:
+    """
+    Merge ranked (id, score) lists by reciprocal rank: each list adds
+    ``1 / (rrf_k + rank)`` to an id. Only ranks are used, so BM25 scores and
+    vector distances never need to be put on one scale.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, (idx, _) in enumerate(ranking, 1):
+            fused[idx] = fused.get(idx, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+async def retrieve_batch(
+    faiss_store: "FaissStore",
+    queries: List[str],
+    k: int,
+    filters: Optional[Dict[str, Any]] = None,
+    mode: Optional[str] = None,
+) -> Tuple[List[List[Tuple[str, float, dict]]], Optional[np.ndarray]]:
+    """
+    Top ``k`` (text, score, metadata) results per query using ``mode``
+    (default SEARCH_DEFAULT_MODE), plus the query embeddings when the mode
+    needed them. Scores are distances for dense, BM25 for lexical and fused
+    reciprocal-rank scores for hybrid.
+    """
+    mode = mode or SEARCH_DEFAULT_MODE
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}'; expected one of {SEARCH_MODES}")
+
+    if mode == "dense":
+        with RAG_STAGE_SECONDS.time(stage="embed"):
+            embeddings = await embed_texts_async(queries)
+        with RAG_STAGE_SECONDS.time(stage="search"):
+            results = await run_search(faiss_store.search_batch, embeddings, k, filters)
+        return results, embeddings
+
+    if mode == "lexical":
+        with RAG_STAGE_SECONDS.time(stage="search"):
+            hits = await run_search(faiss_store.lexical_hits, queries, k, filters)
+            return await run_search(faiss_store.decode, hits), None
+
+    # Hybrid: BM25 runs on the search pool while the embedding call is in flight
+    depth = max(k, HYBRID_CANDIDATES)
+    lexical = asyncio.ensure_future(
+        run_search(faiss_store.lexical_hits, queries, depth, filters)
+    )
+    try:
+        with RAG_STAGE_SECONDS.time(stage="embed"):
+            embeddings = await embed_texts_async(queries)
+        # BM25 overlapped with the embedding call; search time starts here
+        searched = time.perf_counter()
+        dense = await run_search(faiss_store.dense_hits, embeddings, depth, filters)
+    except BaseException:
+        lexical.cancel()
+        raise
+
+    fused = [
+        reciprocal_rank_fusion([dense_hits, lexical_hits], k, HYBRID_RRF_K)
+        for dense_hits, lexical_hits in zip(dense, await lexical)
+    ]
+    results = await run_search(faiss_store.decode, fused)
+    RAG_STAGE_SECONDS.observe(time.perf_counter() - searched, stage="search")
+    return results, embeddings
+
+
+async def retrieve(
+    faiss_store: "FaissStore",
+    query: str,
+    k: int,
+    filters: Optional[Dict[str, Any]] = None,
+    mode: Optional[str] = None,
+) -> Tuple[List[Tuple[str, float, dict]], Optional[np.ndarray]]:
+    """Single-query ``retrieve_batch``."""
+    results, embeddings = await retrieve_batch(faiss_store, [query], k, filters, mode)
+    return results[0], embeddings[0] if embeddings is not None else None
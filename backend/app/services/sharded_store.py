@@ -0,0 +1,641 @@
+import heapq
+import json
+import logging
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from typing import Any, Callable, Collection, Dict, List, Optional, Tuple, TypeVar
+
+import numpy as np
+
+from app.core.concurrency import ReadOnlyStoreError, StoreLock, StoreLockedError
+from app.services.faiss_service import FaissStore, _write_json_atomic
+from app.services.index_factory import IndexOptions
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# "source" = crc32 of the source name, "time" = newest shard takes new chunks
+PARTITIONS = ("source", "time")
+
+# Ids handed out by dense_hits / lexical_hits keep the shard in the low bits
+_SHARD_BITS = 10
+MAX_SHARDS = 1 << _SHARD_BITS
+
+
+class ShardedFaissStore:
+    """
+    FaissStore split into shards that are searched in parallel.
+
+    On-disk layout for ``index_path = data/faiss_index``:
+
+    - ``faiss_index.shards``        JSON commit point listing the shard stores
+    - ``faiss_index.s<gen>-<i>.*``   one FaissStore per shard
+
+    A plain FaissStore saved at ``index_path`` (no ``.shards`` file) opens as
+    a single shard, so an unsharded store keeps working until ``rebalance``
+    splits it.
+
+    Chunks are placed by ``partition``:
+
+    - ``source``: crc32 of the source name modulo the shard count, so every
+      chunk of a document lives in one shard and ``replace`` / ``remove``
+      touch only that shard
+    - ``time``: new chunks go to the newest shard, and a new shard is started
+      once it holds ``shard_max_vectors``; older shards only see removals
+
+    Searches run on all shards at once on a thread pool (FAISS releases the
+    GIL) and the per-shard top ``k`` lists are merged with a heap. The ids
+    returned by ``dense_hits`` / ``lexical_hits`` carry their shard in the
+    low bits and are only meaningful to ``decode`` of the same store. BM25
+    statistics are per shard, as in most distributed search engines; with
+    thousands of chunks per shard they are close to the global ones.
+
+    Shards are opened on first use: startup loads nothing, a write loads only
+    the shard it goes to and the first search loads the rest in parallel.
+
+    As for FaissStore, one process writes: it holds the flock on
+    ``<index_path>.lock``, which covers the ``.shards`` file and every shard.
+    ``read_only`` stores follow it with ``refresh``.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        use_cosine: bool = True,
+        index_path: Optional[str] = None,
+        num_shards: int = 1,
+        partition: str = "source",
+        shard_max_vectors: int = 1_000_000,
+        search_workers: int = 0,
+        read_only: bool = False,
+        **store_options,
+    ):
+        """``store_options`` are passed to every shard's FaissStore."""
+        if partition not in PARTITIONS:
+            raise ValueError(f"Unknown shard partition '{partition}'; expected one of {PARTITIONS}")
+        if not 1 <= num_shards <= MAX_SHARDS:
+            raise ValueError(f"Shard count must be between 1 and {MAX_SHARDS}")
+
+        self.dimension = dimension
+        self.use_cosine = use_cosine
+        self.index_path = index_path
+        self.shard_max_vectors = shard_max_vectors
+        self.index_options: IndexOptions = store_options.get("index_options") or IndexOptions()
+        self._store_options = store_options
+
+        self.read_only = read_only
+        self._write_lock: Optional[StoreLock] = None
+        if index_path and not read_only:
+            self._write_lock = StoreLock(f"{index_path}.lock")
+            if not self._write_lock.acquire():
+                raise StoreLockedError(
+                    f"FAISS store {index_path} is being written by another process "
+                    f"(lock {self._write_lock.path})"
+                )
+
+        layout = _read_layout(index_path) if index_path else None
+        if layout is None:
+            if index_path and FaissStore.has_saved_state(index_path):
+                # Existing unsharded store: serve it as the only shard
+                layout = {
+                    "generation": 0,
+                    "partition": partition,
+                    "shards": [os.path.basename(index_path)],
+                }
+            else:
+                count = 1 if partition == "time" else num_shards
+                layout = {
+                    "generation": 1,
+                    "partition": partition,
+                    "shards": [self._shard_name(1, i) for i in range(count)],
+                }
+                if not read_only:
+                    self._write_layout(layout)
+        elif layout["partition"] != partition or (
+            partition == "source" and len(layout["shards"]) != num_shards
+        ):
+            logger.warning(
+                f"Saved store has {len(layout['shards'])} shards partitioned by "
+                f"{layout['partition']}, but {num_shards} by {partition} are configured; "
+                f"keeping the saved layout (see scripts/rebalance_shards.py)"
+            )
+
+        self.partition = layout["partition"]
+        self._layout = layout
+        self._shards: List[Optional[FaissStore]] = [None] * len(layout["shards"])
+        self._open_locks = [threading.Lock() for _ in layout["shards"]]
+        self._layout_lock = threading.Lock()
+
+        workers = search_workers or min(MAX_SHARDS, max(len(layout["shards"]), os.cpu_count() or 1))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="faiss-shard")
+
+    # -------------------------
+    # ADD / REMOVE VECTORS
+    # -------------------------
+    def add(
+        self,
+        embeddings: List[List[float]],
+        texts: List[str],
+        metadata: Optional[List[dict]] = None,
+    ):
+        self._check_writable()
+        metadata = metadata or [{}] * len(texts)
+        if self.partition == "time":
+            self._active_shard().add(embeddings, texts, metadata)
+            return
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        groups: Dict[int, List[int]] = {}
+        for row, meta in enumerate(metadata):
+            groups.setdefault(self._owner(meta.get("source")), []).append(row)
+        for shard, rows in groups.items():
+            self._shard(shard).add(
+                vectors[rows],
+                [texts[row] for row in rows],
+                [metadata[row] for row in rows],
+            )
+
+    def replace(
+        self,
+        source: str,
+        embeddings: List[List[float]],
+        texts: List[str],
+        metadata: Optional[List[dict]] = None,
+    ) -> int:
+        """
+        Swap every chunk of ``source`` for the given ones. Atomic when
+        partitioned by source; by time the new chunks land in the newest
+        shard first and older copies are then removed from the other shards,
+        so a search in between can see both. Returns the number of chunks
+        removed.
+        """
+        self._check_writable()
+        if self.partition == "source":
+            return self._shard(self._owner(source)).replace(source, embeddings, texts, metadata)
+
+        active = self._active_shard()
+        removed = active.replace(source, embeddings, texts, metadata)
+        for shard in self._all_shards():
+            if shard is not active:
+                removed += shard.remove(source)
+        return removed
+
+    def update(
+        self,
+        source: str,
+        retire_chunk_ids: Collection[int],
+        embeddings: List[List[float]],
+        texts: List[str],
+        metadata: Optional[List[dict]] = None,
+    ) -> int:
+        """
+        Incremental ``replace`` (see FaissStore.update). By time, kept chunks
+        stay in whichever shard holds them and new ones go to the newest.
+        """
+        self._check_writable()
+        if self.partition == "source":
+            return self._shard(self._owner(source)).update(
+                source, retire_chunk_ids, embeddings, texts, metadata
+            )
+
+        active = self._active_shard()
+        removed = active.update(source, retire_chunk_ids, embeddings, texts, metadata)
+        for shard in self._all_shards():
+            if shard is not active:
+                removed += shard.update(source, retire_chunk_ids, [], [], [])
+        return removed
+
+    def write_batch(
+        self,
+        embeddings: List[List[float]],
+        texts: List[str],
+        metadata: List[dict],
+        retire: Dict[str, Optional[Collection[int]]],
+    ) -> int:
+        """
+        See FaissStore.write_batch. Atomic per shard: by source, each shard
+        gets one write for the documents it owns; by time, new chunks land in
+        the newest shard before older copies are removed from the others.
+        """
+        self._check_writable()
+        if self.partition == "time":
+            active = self._active_shard()
+            removed = active.write_batch(embeddings, texts, metadata, retire)
+            for shard in self._all_shards():
+                if shard is not active:
+                    removed += shard.write_batch([], [], [], retire)
+            return removed
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        rows_by_shard: Dict[int, List[int]] = {}
+        for row, meta in enumerate(metadata):
+            rows_by_shard.setdefault(self._owner(meta.get("source")), []).append(row)
+        retire_by_shard: Dict[int, dict] = {}
+        for source, chunk_ids in retire.items():
+            retire_by_shard.setdefault(self._owner(source), {})[source] = chunk_ids
+
+        removed = 0
+        for shard in sorted(rows_by_shard.keys() | retire_by_shard.keys()):
+            rows = rows_by_shard.get(shard, [])
+            removed += self._shard(shard).write_batch(
+                vectors[rows],
+                [texts[row] for row in rows],
+                [metadata[row] for row in rows],
+                retire_by_shard.get(shard, {}),
+            )
+        return removed
+
+    def remove(self, source: str) -> int:
+        """Remove every chunk of ``source``; returns how many were removed."""
+        self._check_writable()
+        if self.partition == "source":
+            return self._shard(self._owner(source)).remove(source)
+        return sum(self._fan_out(lambda shard: shard.remove(source)))
+
+    def chunk_ids(self, source: str) -> List[int]:
+        """``chunk_id`` of every live chunk of ``source``."""
+        if self.partition == "source":
+            return self._shard(self._owner(source)).chunk_ids(source)
+        return [i for ids in self._fan_out(lambda shard: shard.chunk_ids(source)) for i in ids]
+
+    # -------------------------
+    # SEARCH
+    # -------------------------
+    def search(
+        self,
+        embedding: List[float],
+        k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[str, float, dict]]:
+        return self.search_batch([embedding], k, filters)[0]
+
+    def search_batch(
+        self,
+        embeddings: List[List[float]],
+        k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Tuple[str, float, dict]]]:
+        """FaissStore.search_batch over every shard; only the merged top ``k`` are decoded."""
+        return self.decode(self.dense_hits(embeddings, k, filters))
+
+    def dense_hits(
+        self,
+        embeddings: List[List[float]],
+        k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        per_shard = self._fan_out(lambda shard: shard.dense_hits(embeddings, k, filters))
+        # Inner product: higher is closer; L2: lower is closer
+        return _merge(per_shard, k, largest=self.use_cosine)
+
+    def lexical_hits(
+        self,
+        queries: List[str],
+        k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        if not self.has_lexical_index:
+            raise RuntimeError("Lexical index is disabled for this store")
+        per_shard = self._fan_out(lambda shard: shard.lexical_hits(queries, k, filters))
+        return _merge(per_shard, k, largest=True)
+
+    def decode(self, hits: List[List[Tuple[int, float]]]) -> List[List[Tuple[str, float, dict]]]:
+        """Turn (id, score) lists from this store into (text, score, metadata) results."""
+        wanted: Dict[int, List[Tuple[int, int, int, float]]] = {}
+        for row, row_hits in enumerate(hits):
+            for position, (idx, score) in enumerate(row_hits):
+                wanted.setdefault(idx & (MAX_SHARDS - 1), []).append(
+                    (row, position, idx >> _SHARD_BITS, score)
+                )
+
+        # One single-hit row per id, so hits removed in the meantime (which
+        # the shard skips) leave an empty row instead of shifting the rest
+        decoded = [[None] * len(row_hits) for row_hits in hits]
+        for shard, requests in wanted.items():
+            results = self._shard(shard).decode(
+                [[(local, score)] for _, _, local, score in requests]
+            )
+            for (row, position, _, _), result in zip(requests, results):
+                if result:
+                    decoded[row][position] = result[0]
+
+        return [[result for result in row if result is not None] for row in decoded]
+
+    @property
+    def has_lexical_index(self) -> bool:
+        return bool(self._store_options.get("lexical_index"))
+
+    def check_filters(self, filters: Optional[Dict[str, Any]]):
+        """Raise FilterError for filters that search would reject."""
+        # Every shard indexes the same fields
+        self._shard(0).check_filters(filters)
+
+    # -------------------------
+    # MAINTENANCE
+    # -------------------------
+    def compact(self):
+        self._check_writable()
+        self._fan_out(lambda shard: shard.compact())
+
+    def convert(self, options: IndexOptions, dimension: Optional[int] = None):
+        """FaissStore.convert applied to each shard in turn."""
+        self._check_writable()
+        for shard in self._all_shards():
+            shard.convert(options, dimension)
+        self.index_options = options
+        self.dimension = dimension or self.dimension
+
+    def shards(self) -> List[FaissStore]:
+        """Every shard, opened."""
+        return self._all_shards()
+
+    def rebalance(
+        self,
+        num_shards: Optional[int] = None,
+        partition: Optional[str] = None,
+        batch_size: int = 10000,
+    ):
+        """
+        Move every live chunk into a new set of shards: ``num_shards`` by
+        source hash, or by time (shard then insertion order) into shards of
+        at most ``shard_max_vectors``. The new layout is committed by
+        replacing the ``.shards`` file, then the old shards are deleted.
+
+        Not safe against concurrent writes; meant for offline use (see
+        scripts/rebalance_shards.py).
+        """
+        self._check_writable()
+        partition = partition or self.partition
+        if partition not in PARTITIONS:
+            raise ValueError(f"Unknown shard partition '{partition}'; expected one of {PARTITIONS}")
+        num_shards = num_shards or len(self._shards)
+        if not 1 <= num_shards <= MAX_SHARDS:
+            raise ValueError(f"Shard count must be between 1 and {MAX_SHARDS}")
+
+        with self._layout_lock:
+            old_layout, old_shards = self._layout, self._all_shards()
+            generation = old_layout["generation"] + 1
+            names: List[str] = []
+            targets: List[FaissStore] = []
+
+            def new_shard() -> FaissStore:
+                names.append(self._shard_name(generation, len(names)))
+                targets.append(self._open(names[-1]))
+                return targets[-1]
+
+            for _ in range(num_shards if partition == "source" else 1):
+                new_shard()
+
+            moved = 0
+            for shard in old_shards:
+                for vectors, texts, metadata in shard.iter_live(batch_size):
+                    if partition == "time":
+                        start = 0
+                        while start < len(texts):
+                            if len(targets[-1]) >= self.shard_max_vectors:
+                                new_shard()
+                            end = start + self.shard_max_vectors - len(targets[-1])
+                            targets[-1].add(vectors[start:end], texts[start:end], metadata[start:end])
+                            start = end
+                    else:
+                        groups: Dict[int, List[int]] = {}
+                        for row, meta in enumerate(metadata):
+                            groups.setdefault(
+                                _source_shard(meta.get("source"), num_shards), []
+                            ).append(row)
+                        for target, rows in groups.items():
+                            targets[target].add(
+                                vectors[rows],
+                                [texts[row] for row in rows],
+                                [metadata[row] for row in rows],
+                            )
+                    moved += len(texts)
+
+            for target in targets:
+                target.compact()
+
+            layout = {"generation": generation, "partition": partition, "shards": names}
+            self._write_layout(layout)
+            self._layout = layout
+            self.partition = partition
+            self._shards = list(targets)
+            self._open_locks = [threading.Lock() for _ in names]
+
+            for shard, name in zip(old_shards, old_layout["shards"]):
+                shard.close()
+                if self.index_path:
+                    FaissStore.remove_files(self._shard_path(name))
+
+        logger.info(
+            f"Rebalanced {moved} chunks from {len(old_shards)} into {len(names)} "
+            f"shards partitioned by {partition}"
+        )
+
+    def refresh(self) -> Optional[set]:
+        """
+        FaissStore.refresh for every opened shard of a read-only store, after
+        picking up a changed ``.shards`` file (a shard started by time
+        partitioning, or a rebalance). Returns the sources that changed, or
+        None if unknown.
+        """
+        if not self.read_only or not self.index_path:
+            return set()
+
+        changed: Optional[set] = set()
+        layout = _read_layout(self.index_path)
+        if layout is not None and layout != self._layout:
+            with self._layout_lock:
+                shards = dict(zip(self._layout["shards"], self._shards))
+                locks = dict(zip(self._layout["shards"], self._open_locks))
+                self._open_locks = [locks.get(name) or threading.Lock() for name in layout["shards"]]
+                self._shards = [shards.pop(name, None) for name in layout["shards"]]
+                self._layout = layout
+                self.partition = layout["partition"]
+            for shard in shards.values():
+                if shard is not None:
+                    shard.close()
+            if shards:
+                changed = None  # shards were replaced wholesale
+            logger.info(f"Followed shard layout to {len(layout['shards'])} shards")
+
+        for shard in self._shards:
+            if shard is not None:
+                shard_changed = shard.refresh()
+                changed = None if changed is None or shard_changed is None else changed | shard_changed
+        return changed
+
+    def close(self):
+        for shard in self._shards:
+            if shard is not None:
+                shard.close()
+        self._executor.shutdown(wait=False)
+        if self._write_lock is not None:
+            self._write_lock.release()
+
+    # -------------------------
+    # SIZE (used by /ask)
+    # -------------------------
+    def __len__(self):
+        """Live vectors in every shard; opens them all (see ``is_empty``)."""
+        return sum(len(shard) for shard in self._all_shards())
+
+    def is_empty(self) -> bool:
+        """
+        Whether no shard holds a live vector. Shards already open are checked
+        first, and the rest are opened one at a time only until a non-empty
+        one is found; a shard with nothing on disk is skipped unopened.
+        """
+        if any(shard is not None and not shard.is_empty() for shard in self._shards):
+            return False
+        for i, shard in enumerate(self._shards):
+            if shard is not None:
+                continue
+            path = self._shard_path(self._layout["shards"][i])
+            if path is None or not FaissStore.has_saved_state(path):
+                continue
+            if not self._shard(i).is_empty():
+                return False
+        return True
+
+    def index_stats(self) -> Dict[str, int]:
+        """FaissStore.index_stats summed over the shards opened so far."""
+        stats = [shard.index_stats() for shard in self._shards if shard is not None]
+        return {
+            "vectors": sum(stat["vectors"] for stat in stats),
+            "bytes": sum(stat["bytes"] for stat in stats),
+            "shards_open": len(stats),
+        }
+
+    # -------------------------
+    # INTERNAL
+    # -------------------------
+    def _owner(self, source: Optional[str]) -> int:
+        return _source_shard(source, len(self._shards))
+
+    def _shard(self, i: int) -> FaissStore:
+        shard = self._shards[i]
+        if shard is None:
+            with self._open_locks[i]:
+                shard = self._shards[i]
+                if shard is None:
+                    shard = self._open(self._layout["shards"][i])
+                    self._shards[i] = shard
+        return shard
+
+    def _all_shards(self) -> List[FaissStore]:
+        return self._fan_out(lambda shard: shard)
+
+    def _fan_out(self, fn: Callable[[FaissStore], T]) -> List[T]:
+        """``fn`` on every shard (opening it if needed) in parallel, in shard order."""
+        count = len(self._shards)
+        if count == 1:
+            return [fn(self._shard(0))]
+        return list(self._executor.map(lambda i: fn(self._shard(i)), range(count)))
+
+    def _active_shard(self) -> FaissStore:
+        """Newest shard, started afresh once full (time partitioning)."""
+        active = self._shard(len(self._shards) - 1)
+        if len(active) < self.shard_max_vectors:
+            return active
+
+        with self._layout_lock:
+            # Another writer may have started the next shard meanwhile
+            count = len(self._shards)
+            latest = self._shard(count - 1)
+            if latest is not active:
+                return latest
+            if count >= MAX_SHARDS:
+                logger.warning(f"Shard limit {MAX_SHARDS} reached; newest shard keeps growing")
+                return active
+            name = self._shard_name(self._layout["generation"], count)
+            shard = self._open(name)
+            layout = dict(self._layout, shards=self._layout["shards"] + [name])
+            self._write_layout(layout)
+            self._open_locks.append(threading.Lock())
+            self._shards.append(shard)
+            self._layout = layout
+
+        logger.info(f"Started shard {name} after {len(active)} vectors in the previous one")
+        return shard
+
+    def _open(self, name: str) -> FaissStore:
+        path = self._shard_path(name)
+        return FaissStore(
+            dimension=self.dimension,
+            use_cosine=self.use_cosine,
+            index_path=path,
+            read_only=self.read_only,
+            # Covered by this store's lock
+            write_lock=False,
+            **self._store_options,
+        )
+
+    def _check_writable(self):
+        if self.read_only:
+            raise ReadOnlyStoreError(
+                f"FAISS store {self.index_path} is open read-only in this process; "
+                f"another process writes it"
+            )
+
+    def _shard_name(self, generation: int, i: int) -> str:
+        base = os.path.basename(self.index_path) if self.index_path else "shard"
+        return f"{base}.s{generation}-{i}"
+
+    def _shard_path(self, name: str) -> Optional[str]:
+        if not self.index_path:
+            return None
+        return os.path.join(os.path.dirname(self.index_path), name)
+
+    def _write_layout(self, layout: dict):
+        if not self.index_path:
+            return
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _write_json_atomic(f"{self.index_path}.shards", layout)
+
+
+def is_sharded(index_path: str) -> bool:
+    return os.path.exists(f"{index_path}.shards")
+
+
+def shard_paths(index_path: str) -> List[str]:
+    """Paths of the FaissStores making up the store at ``index_path``."""
+    layout = _read_layout(index_path)
+    if layout is None:
+        return [index_path]
+    directory = os.path.dirname(index_path)
+    return [os.path.join(directory, name) for name in layout["shards"]]
+
+
+def _source_shard(source: Optional[str], num_shards: int) -> int:
+    return zlib.crc32((source or "").encode("utf-8")) % num_shards
+
+
+def _merge(
+    per_shard: List[List[List[Tuple[int, float]]]],
+    k: int,
+    largest: bool,
+) -> List[List[Tuple[int, float]]]:
+    """Top ``k`` per query across shards, with ids tagged by shard."""
+    select = heapq.nlargest if largest else heapq.nsmallest
+    merged = []
+    for rows in zip(*per_shard):
+        candidates = chain.from_iterable(
+            (((idx << _SHARD_BITS) | shard, score) for idx, score in row)
+            for shard, row in enumerate(rows)
+        )
+        merged.append(select(k, candidates, key=lambda hit: hit[1]))
+    return merged
+
+
+def _read_layout(index_path: str) -> Optional[dict]:
+    path = f"{index_path}.shards"
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
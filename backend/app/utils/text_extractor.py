@@ -1,10 +1,147 @@
-import pdfplumber
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
 
-def extract_text_from_pdf(file_path: str) -> str:
-    text = ""
+from app.core.config import (
+    PDF_EXTRACT_BACKEND,
+    PDF_EXTRACT_WORKERS,
+    PDF_PAGES_PER_TASK,
+)
 
-    with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            text += page.extract_text() or ""
+BACKENDS = ("pdfplumber", "pypdfium2", "pypdf")
 
-    return text.strip()
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def extract_text_from_pdf(file_path: str, backend: Optional[str] = None) -> str:
+    """Text of every page, concatenated without a separator as it always was."""
+    return "".join(text for _, text in iter_pdf_pages(file_path, backend)).strip()
+
+
+def extract_pages(file_path: str, backend: Optional[str] = None) -> List[Tuple[int, str]]:
+    """Every ``(page_number, text)`` of a PDF, extracted in the calling process."""
+    backend = backend or PDF_EXTRACT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend '{backend}', expected one of {BACKENDS}")
+    return _extract_range(file_path, backend, 0, pdf_page_count(file_path))
+
+
+def pdf_page_count(file_path: str) -> int:
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(file_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def iter_pdf_pages(
+    file_path: str,
+    backend: Optional[str] = None,
+    pages_per_task: int = PDF_PAGES_PER_TASK,
+) -> Iterator[Tuple[int, str]]:
+    """
+    Yield ``(page_number, text)`` pairs (1-based) in page order.
+
+    Pages are extracted in ranges of ``pages_per_task`` on a shared process
+    pool, so later ranges are parsed in parallel while earlier pages are
+    already being consumed. Small documents skip the pool entirely.
+    """
+    backend = backend or PDF_EXTRACT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend '{backend}', expected one of {BACKENDS}")
+
+    page_count = pdf_page_count(file_path)
+    ranges = [
+        (start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    ]
+
+    pool = get_extraction_pool() if len(ranges) > 1 else None
+    if pool is None:
+        for start, end in ranges:
+            yield from _extract_range(file_path, backend, start, end)
+        return
+
+    futures = [
+        pool.submit(_extract_range, file_path, backend, start, end)
+        for start, end in ranges
+    ]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        # Consumer stopped early (or failed): drop work not yet started
+        for future in futures:
+            future.cancel()
+
+
+def get_extraction_pool() -> Optional[ProcessPoolExecutor]:
+    """Process pool shared by all extraction, or None with a single worker."""
+    global _pool
+
+    workers = PDF_EXTRACT_WORKERS or os.cpu_count() or 1
+    if workers <= 1:
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            # Never fork the (multi-threaded) server process itself
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(method),
+            )
+    return _pool
+
+
+def _extract_range(file_path: str, backend: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract 0-based pages [start, end) with ``backend``; runs in pool workers."""
+    if backend == "pypdfium2":
+        return _extract_pypdfium2(file_path, start, end)
+    if backend == "pypdf":
+        return _extract_pypdf(file_path, start, end)
+    return _extract_pdfplumber(file_path, start, end)
+
+
+def _extract_pdfplumber(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    import pdfplumber
+
+    page_numbers = list(range(start + 1, end + 1))
+    with pdfplumber.open(file_path, pages=page_numbers) as pdf:
+        return [
+            (number, page.extract_text() or "")
+            for number, page in zip(page_numbers, pdf.pages)
+        ]
+
+
+def _extract_pypdfium2(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    import pypdfium2
+
+    pages = []
+    pdf = pypdfium2.PdfDocument(file_path)
+    try:
+        for index in range(start, end):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            text = textpage.get_text_range().replace("\r\n", "\n")
+            textpage.close()
+            page.close()
+            pages.append((index + 1, text))
+    finally:
+        pdf.close()
+    return pages
+
+
+def _extract_pypdf(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    from pypdf import PdfReader
+
+    reader = PdfReader(file_path)
+    return [
+        (index + 1, reader.pages[index].extract_text() or "")
+        for index in range(start, end)
+    ]
@@ -1,3 +1,17 @@
+import re
+from typing import Iterable, Iterator, List, Tuple
+
+from app.core.config import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+from app.utils.tokenizer import get_encoding
+
+# Boundaries tried in order, with the separator that rejoins the pieces
+_BOUNDARIES = (
+    (re.compile(r"\n\s*\n"), "\n\n"),     # paragraphs
+    (re.compile(r"(?<=[.!?])\s+"), " "),   # sentences
+    (re.compile(r"\n"), "\n"),             # lines
+)
+
+
 def split_text(
     text: str,
     chunk_size: int = 500,
@@ -18,3 +32,107 @@ def split_text(
         start = end - overlap
 
     return chunks
+
+
+def split_pages(
+    pages: Iterable[Tuple[int, str]],
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    model: str = "text-embedding-3-small"
+) -> Iterator[dict]:
+    """
+    Token-sized chunks over ``(page_number, text)`` pairs, e.g. straight from
+    ``iter_pdf_pages``. Yields each chunk as soon as it is complete:
+
+        {"text": ..., "page_start": 1, "page_end": 2, "token_count": 231}
+
+    Chunks are packed from whole paragraphs, falling back to sentences and
+    then raw token windows only for pieces longer than ``max_tokens``. Up to
+    ``overlap_tokens`` of trailing paragraphs/sentences are repeated at the
+    start of the next chunk.
+    """
+    if not 0 <= overlap_tokens < max_tokens:
+        raise ValueError("overlap_tokens must be >= 0 and smaller than max_tokens")
+
+    encoding = get_encoding(model)
+    # Units waiting to be emitted: (separator, text, page, tokens)
+    window: List[Tuple[str, str, int, int]] = []
+    window_tokens = 0
+
+    def emit() -> dict:
+        text = "".join(
+            (sep if i else "") + unit_text
+            for i, (sep, unit_text, _, _) in enumerate(window)
+        )
+        return {
+            "text": text,
+            "page_start": window[0][2],
+            "page_end": window[-1][2],
+            "token_count": len(encoding.encode_ordinary(text)),
+        }
+
+    def carry_overlap():
+        nonlocal window, window_tokens
+        kept, kept_tokens = [], 0
+        for unit in reversed(window):
+            cost = unit[3] + 1
+            if kept_tokens + cost > overlap_tokens:
+                break
+            kept.insert(0, unit)
+            kept_tokens += cost
+        window, window_tokens = kept, kept_tokens
+
+    for page, text in pages:
+        # A page break joins like a line break within the running text
+        for sep, unit_text, tokens in _units(text, "\n", max_tokens, encoding):
+            # One token per separator keeps the packed chunk within budget
+            cost = tokens + 1
+            if window and window_tokens + cost > max_tokens:
+                chunk = emit()
+                carry_overlap()
+                # Make room when the overlap plus this unit would not fit
+                while window and window_tokens + cost > max_tokens:
+                    window_tokens -= window.pop(0)[3] + 1
+                yield chunk
+            window.append((sep, unit_text, page, tokens))
+            window_tokens += cost
+
+    if window:
+        yield emit()
+
+
+def _units(
+    text: str,
+    sep: str,
+    max_tokens: int,
+    encoding,
+    level: int = 0
+) -> Iterator[Tuple[str, str, int]]:
+    """
+    Split text into ``(separator, piece, tokens)`` pieces of at most
+    ``max_tokens``, using the coarsest boundary that works. ``separator``
+    is what joins a piece to the one before it.
+    """
+    if level == len(_BOUNDARIES):
+        # No usable boundary left: hard-split on token windows
+        tokens = encoding.encode_ordinary(text)
+        for i in range(0, len(tokens), max_tokens):
+            window = tokens[i:i + max_tokens]
+            piece = encoding.decode(window)
+            if piece.strip():
+                yield sep, piece, len(window)
+                sep = ""
+        return
+
+    pattern, joiner = _BOUNDARIES[level]
+    for part in pattern.split(text):
+        part = part.strip()
+        if not part:
+            continue
+
+        tokens = len(encoding.encode_ordinary(part))
+        if tokens <= max_tokens:
+            yield sep, part, tokens
+        else:
+            yield from _units(part, sep, max_tokens, encoding, level + 1)
+        sep = joiner
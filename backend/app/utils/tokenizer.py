@@ -0,0 +1,59 @@
+import threading
+import tiktoken
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from app.core.config import TOKEN_COUNT_CACHE_ITEMS
+
+_token_counts: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+_token_counts_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = "gpt-4") -> tiktoken.Encoding:
+    """Tokenizer for ``model``, built once per process."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    return len(get_encoding(model).encode_ordinary(text))
+
+
+def count_tokens_batch(texts: List[str], model: str = "gpt-4") -> List[int]:
+    """Token counts for many texts; tiktoken encodes the batch on its own threads."""
+    return [len(tokens) for tokens in get_encoding(model).encode_ordinary_batch(texts)]
+
+
+# -------------------------
+# TOKEN COUNT CACHE
+# -------------------------
+def cached_token_count(text: str, model: str = "gpt-4") -> Optional[int]:
+    """Previously recorded token count of ``text``, without encoding it."""
+    key = (get_encoding(model).name, text)
+    with _token_counts_lock:
+        count = _token_counts.get(key)
+        if count is not None:
+            _token_counts.move_to_end(key)
+    return count
+
+
+def remember_token_count(text: str, count: int, model: str = "gpt-4"):
+    key = (get_encoding(model).name, text)
+    with _token_counts_lock:
+        _token_counts[key] = count
+        _token_counts.move_to_end(key)
+        while len(_token_counts) > TOKEN_COUNT_CACHE_ITEMS:
+            _token_counts.popitem(last=False)
+
+
+def count_tokens_cached(text: str, model: str = "gpt-4") -> int:
+    """``count_tokens`` that encodes any given text only once per process."""
+    count = cached_token_count(text, model)
+    if count is None:
+        count = count_tokens(text, model)
+        remember_token_count(text, count, model)
+    return count
@@ -0,0 +1,116 @@
+"""
+Recall@k / latency report for the ANN index modes against the flat baseline.
+
+    python -m benchmarks.ann_recall --n 100000 --k 10
+    python -m benchmarks.ann_recall --index-path data/faiss_index --json out/ann.json
+
+With ``--index-path`` the vectors of an existing flat store are used instead
+of synthetic ones.
+"""
+import argparse
+import json
+import os
+
+import faiss
+import numpy as np
+
+from app.services.index_factory import (
+    INDEX_TYPES,
+    IndexOptions,
+    build_trained_index,
+    index_vectors,
+)
+from benchmarks.common import (
+    print_table,
+    recall_at_k,
+    synthetic_queries,
+    synthetic_vectors,
+    timed,
+    write_json,
+)
+
+
+def load_store_vectors(index_path: str) -> np.ndarray:
+    manifest_path = f"{index_path}.manifest"
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        index_file = os.path.join(os.path.dirname(index_path), manifest["index"])
+    else:
+        index_file = f"{index_path}.index"
+    vectors, _ = index_vectors(faiss.read_index(index_file))
+    return vectors
+
+
+def run(args) -> dict:
+    if args.index_path:
+        base = load_store_vectors(args.index_path)
+    else:
+        base = synthetic_vectors(args.n, args.dim, seed=args.seed)
+    queries = synthetic_queries(base, args.queries, seed=args.seed + 1)
+    dimension = base.shape[1]
+
+    flat = faiss.IndexFlatIP(dimension)
+    flat.add(base)
+    (_, truth), _ = timed(flat.search, queries, args.k)
+
+    rows = []
+    for mode in args.modes.split(","):
+        options = IndexOptions(
+            index_type=mode,
+            nlist=args.nlist,
+            nprobe=args.nprobe,
+            pq_m=args.pq_m,
+            pq_nbits=args.pq_nbits,
+            hnsw_m=args.hnsw_m,
+            ef_search=args.ef_search,
+        )
+        index, build_seconds = timed(build_trained_index, base, dimension, True, options)
+
+        # Warm up once, then time the full query set one query at a time
+        index.search(queries[:1], args.k)
+        latencies = []
+        found = np.empty_like(truth)
+        for i in range(len(queries)):
+            (_, ids), seconds = timed(index.search, queries[i:i + 1], args.k)
+            found[i] = ids[0]
+            latencies.append(seconds * 1000)
+
+        rows.append({
+            "mode": mode,
+            "factory": options.factory_string(),
+            f"recall@{args.k}": recall_at_k(truth, found, args.k),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "build_s": build_seconds,
+            "bytes_per_vector": faiss.serialize_index(index).nbytes / len(base),
+        })
+
+    print(f"{len(base)} vectors x {dimension} dims, {len(queries)} queries\n")
+    print_table(rows, list(rows[0].keys()))
+    return {"vectors": len(base), "dimension": dimension, "k": args.k, "results": rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--modes", default=",".join(INDEX_TYPES))
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--pq-m", type=int, default=64)
+    parser.add_argument("--pq-nbits", type=int, default=8)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--index-path", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    write_json(args.json, run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Per-request CPU spent on tokenization while answering, before and after the
+cached tokenizer / single-pass context budgeting.
+
+    python -m benchmarks.answer_tokens --requests 500 --chunk-tokens 256
+    python -m benchmarks.answer_tokens --json out/answer_tokens.json
+
+"before" replays the original code path: ``encoding_for_model`` on every
+count, each chunk encoded to count it and again to cut it, and the full
+prompt re-encoded for the log line. "after" runs ``_fit_context`` with a
+cold count cache (new chunks on every request), a warm cache (popular
+chunks), and with counts taken from ingest metadata.
+"""
+import argparse
+import time
+
+import numpy as np
+import tiktoken
+
+from app.services.answer_service import _fit_context
+from app.utils import tokenizer
+from app.utils.tokenizer import count_tokens, count_tokens_cached, get_encoding
+from benchmarks.common import print_table, write_json
+
+SYSTEM_PROMPT = (
+    "You are an expert organizational knowledge assistant. "
+    "Your role is to provide accurate, helpful answers based STRICTLY on the provided context. "
+    "\n\nRules:\n"
+    "1. Answer ONLY using information from the provided context\n"
+    "2. If the answer is not in the context, clearly state: "
+    "'I don't have enough information in the provided documents to answer this question.'\n"
+    "3. Be concise but complete\n"
+    "4. If the context is ambiguous or contradictory, acknowledge this\n"
+    "5. When using information from the context, cite the source number like [Source 1].\n"
+    "6. Do not make assumptions or add information not in the context"
+)
+
+WORDS = (
+    "policy onboarding payroll quarterly review security incident vendor contract "
+    "escalation budget roadmap compliance access request approval deadline team "
+    "customer release engineering handbook benefits travel expense audit"
+).split()
+
+
+def synthetic_chunk(rng, tokens: int, model: str) -> str:
+    encoding = get_encoding(model)
+    words = rng.choice(WORDS, size=tokens * 2)
+    text = " ".join(words)
+    return encoding.decode(encoding.encode_ordinary(text)[:tokens])
+
+
+def legacy_count_tokens(text: str, model: str) -> int:
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    return len(encoding.encode(text))
+
+
+def legacy_request(question, chunks, max_tokens, model):
+    selected, total = [], 0
+    for chunk in chunks:
+        chunk_tokens = legacy_count_tokens(chunk, model)
+        if total + chunk_tokens <= max_tokens:
+            selected.append(chunk)
+            total += chunk_tokens
+        else:
+            if max_tokens - total > 100:
+                encoding = tiktoken.encoding_for_model(model)
+                tokens = encoding.encode(chunk)
+                selected.append(encoding.decode(tokens[:max_tokens - total]) + "...")
+            break
+    context = "\n\n".join(f"[Source {i}]\n{c}" for i, c in enumerate(selected, 1))
+    user_prompt = f"Context:\n{context}\n\nQuestion: {question}\n\nPlease answer."
+    return legacy_count_tokens(SYSTEM_PROMPT + user_prompt, model)
+
+
+def current_request(question, chunks, max_tokens, model, token_counts=None):
+    _, _, context_tokens = _fit_context(chunks, max_tokens, model, token_counts)
+    return context_tokens + count_tokens_cached(SYSTEM_PROMPT, model) + count_tokens(question, model)
+
+
+def measure(requests, fn) -> dict:
+    cpu = []
+    for args in requests:
+        start = time.process_time()
+        fn(*args)
+        cpu.append((time.process_time() - start) * 1e6)
+    return {
+        "mean_us": float(np.mean(cpu)),
+        "p50_us": float(np.percentile(cpu, 50)),
+        "p95_us": float(np.percentile(cpu, 95)),
+    }
+
+
+def run(args) -> dict:
+    rng = np.random.default_rng(args.seed)
+    question = "What is the approval deadline for quarterly vendor contract reviews?"
+    pool = [synthetic_chunk(rng, args.chunk_tokens, args.model) for _ in range(args.pool)]
+
+    def pick(popular: bool):
+        if popular:
+            return [pool[i] for i in rng.integers(0, len(pool), size=args.k)]
+        return [synthetic_chunk(rng, args.chunk_tokens, args.model) for _ in range(args.k)]
+
+    cold = [pick(False) for _ in range(args.requests)]
+    warm = [pick(True) for _ in range(args.requests)]
+    counts = [count_tokens(chunk, args.model) for chunk in pool]
+    index = {chunk: n for chunk, n in zip(pool, counts)}
+
+    def scenario(name, fn, batches, with_counts=False):
+        tokenizer._token_counts.clear()
+        requests = [
+            (question, chunks, args.max_tokens, args.model)
+            + (([index[c] for c in chunks],) if with_counts else ())
+            for chunks in batches
+        ]
+        return {"scenario": name, **measure(requests, fn)}
+
+    rows = [
+        scenario("before (new chunks)", legacy_request, cold),
+        scenario("after (new chunks)", current_request, cold),
+        scenario("before (popular chunks)", legacy_request, warm),
+        scenario("after (popular chunks)", current_request, warm),
+        scenario("after (ingest metadata)", current_request, warm, with_counts=True),
+    ]
+
+    print(
+        f"{args.requests} requests, top-{args.k} chunks of {args.chunk_tokens} tokens, "
+        f"{args.max_tokens}-token budget, model {args.model}\n"
+    )
+    print_table(rows, list(rows[0].keys()))
+    return {
+        "requests": args.requests,
+        "k": args.k,
+        "chunk_tokens": args.chunk_tokens,
+        "max_tokens": args.max_tokens,
+        "model": args.model,
+        "results": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--chunk-tokens", type=int, default=700)
+    parser.add_argument("--max-tokens", type=int, default=3000)
+    parser.add_argument("--pool", type=int, default=200, help="Distinct popular chunks")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    write_json(args.json, run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Load test for the async /ask path against a stub OpenAI server.
+
+    python -m benchmarks.ask_load --concurrency 300 --requests 3000 --latency 0.25
+    python -m benchmarks.ask_load --endpoint /search/ --json out/ask_load.json
+
+The app runs in-process on one event loop (a single worker); ``concurrency``
+clients keep that many questions in flight. With a non-blocking request path
+throughput approaches ``concurrency / (embedding + chat latency)`` and the
+stub sees about ``concurrency`` upstream requests at once, well beyond the
+40-thread cap a sync handler is limited to.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import print_table, write_json
+from benchmarks.stub_openai import StubOpenAI, stub_embedding
+
+
+def configure_environment(stub: StubOpenAI, workdir: str):
+    """Point the app at the stub; must run before any ``app`` import."""
+    os.environ.update({
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_BASE_URL": stub.base_url,
+        "EMBEDDING_DIMENSION": str(stub.dimension),
+        "FAISS_INDEX_PATH": os.path.join(workdir, "faiss_index"),
+        "INGEST_JOBS_DB_PATH": os.path.join(workdir, "ingest_jobs.sqlite3"),
+        # Every request should reach the stub
+        "EMBEDDING_CACHE_ENABLED": "false",
+        "ANSWER_CACHE_ENABLED": "false",
+        "EMBEDDING_RATE_LIMIT_RPM": "100000000",
+        "EMBEDDING_RATE_LIMIT_TPM": "100000000000",
+    })
+
+
+def populate_store(store, chunks: int, dimension: int):
+    texts = [
+        f"Section {i}: policy details for team {i % 37}, reviewed quarterly by the owners."
+        for i in range(chunks)
+    ]
+    vectors = np.stack([stub_embedding(text, dimension) for text in texts])
+    metadata = [{"source": "synthetic.pdf", "chunk_id": i} for i in range(chunks)]
+    store.add(vectors, texts, metadata)
+
+
+async def drive(app, endpoint: str, total: int, concurrency: int) -> dict:
+    import httpx
+    from app.services.openai_client import close_async_clients
+
+    latencies, errors = [], 0
+    next_request = iter(range(total))
+
+    async def client_loop(client):
+        nonlocal errors
+        for i in next_request:
+            body = (
+                {"query": f"policy question {i}"} if endpoint.startswith("/search")
+                else {"question": f"What is the policy for team {i % 37}? ({i})"}
+            )
+            start = time.perf_counter()
+            response = await client.post(endpoint, json=body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=120) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    # The pooled connections belong to this event loop
+    await close_async_clients()
+    return {
+        "requests": total,
+        "errors": errors,
+        "seconds": elapsed,
+        "req_per_s": total / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def run(args) -> dict:
+    stub = StubOpenAI(port=args.port, dimension=args.dim, latency=args.latency).start()
+    workdir = tempfile.mkdtemp(prefix="ask-load-")
+    configure_environment(stub, workdir)
+
+    from app.core.dependencies import get_faiss_store
+    from app.main import app
+
+    populate_store(get_faiss_store(), args.chunks, args.dim)
+
+    rows = []
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        stub.reset_counters()
+        result = asyncio.run(drive(app, args.endpoint, args.requests, concurrency))
+        rows.append({
+            "concurrency": concurrency,
+            **result,
+            "upstream_peak_in_flight": stub.peak_in_flight,
+            "ideal_req_per_s": concurrency / (args.latency * (1 if args.endpoint.startswith("/search") else 2)),
+        })
+
+    stub.stop()
+    print(
+        f"{args.endpoint} against stub OpenAI ({args.latency * 1000:.0f} ms per call), "
+        f"{args.chunks} indexed chunks x {args.dim} dims\n"
+    )
+    print_table(rows, list(rows[0].keys()))
+    return {"endpoint": args.endpoint, "latency_s": args.latency, "results": rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--endpoint", default="/ask/", choices=["/ask/", "/search/"])
+    parser.add_argument("--concurrency", default="40,200,400", help="Comma-separated levels")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.25, help="Stub seconds per OpenAI call")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    write_json(args.json, run(args))
+
+
+if __name__ == "__main__":
+    main()
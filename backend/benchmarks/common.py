@@ -0,0 +1,69 @@
+"""Shared helpers for the offline benchmark scripts."""
+import json
+import os
+import time
+from typing import List, Optional
+
+import numpy as np
+
+
+def synthetic_vectors(
+    n: int,
+    dimension: int,
+    clusters: int = 64,
+    seed: int = 0,
+) -> np.ndarray:
+    """Clustered, L2-normalised float32 vectors shaped like text embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((n, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def synthetic_queries(base: np.ndarray, n: int, noise: float = 0.3, seed: int = 1) -> np.ndarray:
+    """Queries near (but not equal to) stored vectors, like paraphrased questions."""
+    rng = np.random.default_rng(seed)
+    picks = base[rng.integers(0, len(base), size=n)]
+    queries = picks + noise * rng.standard_normal(picks.shape).astype(np.float32) / np.sqrt(base.shape[1])
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return queries.astype(np.float32)
+
+
+def recall_at_k(truth: np.ndarray, found: np.ndarray, k: int) -> float:
+    """Fraction of the exact top-k ids that the approximate search returned."""
+    hits = 0
+    for expected, got in zip(truth[:, :k], found[:, :k]):
+        hits += len(set(expected.tolist()) & set(got.tolist()))
+    return hits / float(truth.shape[0] * k)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def print_table(rows: List[dict], columns: List[str]):
+    widths = {c: max(len(c), *(len(_fmt(r.get(c))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(_fmt(row.get(c)).ljust(widths[c]) for c in columns))
+
+
+def write_json(path: Optional[str], payload: dict):
+    if not path:
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    print(f"\nWrote {path}")
+
+
+def _fmt(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.4f}"
+    return "" if value is None else str(value)
@@ -0,0 +1,216 @@
+"""
+Quality / latency report for dense, lexical (BM25) and hybrid retrieval.
+
+    python -m benchmarks.hybrid_retrieval --n 20000 --k 10
+    python -m benchmarks.hybrid_retrieval --json out/hybrid.json
+
+Runs offline against a FaissStore built from a synthetic corpus. Documents
+are drawn from topic vocabularies and some carry an identifier such as
+``POL-48213``. Their "embeddings" are sums of per-word vectors in which
+words of a topic share a direction and every word has a synonym pointing
+almost the same way, so paraphrases land close together while identifiers
+only leave a faint trace, as with real embedding models.
+
+Two query sets are scored against the one document each was drawn from:
+
+- ``paraphrase``: words of the document, most swapped for their synonyms
+- ``code``:       the document's identifier plus a word of the document
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+# Nothing here calls OpenAI, but the app settings require a key
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+from app.services.faiss_service import FaissStore
+from app.services.retrieval import reciprocal_rank_fusion
+from benchmarks.common import print_table, timed, write_json
+from benchmarks.stub_openai import stub_embedding
+
+COMMON_WORDS = [
+    "the", "of", "and", "for", "with", "per", "all", "must", "may", "should",
+    "team", "staff", "request", "approval", "process", "update", "review", "section",
+]
+
+# How much an identifier moves a text's embedding, relative to a word
+CODE_WEIGHT = 0.3
+
+VOCAB_PER_TOPIC = 200
+
+
+class Corpus:
+    def __init__(self, n: int, dimension: int, topics: int, seed: int):
+        self.dimension = dimension
+        self.rng = np.random.default_rng(seed)
+
+        self.vocab = [[f"t{t}w{w}" for w in range(VOCAB_PER_TOPIC)] for t in range(topics)]
+        centers = self.rng.standard_normal((topics, dimension)).astype(np.float32)
+        self.word_vectors = {}
+        for t, words in enumerate(self.vocab):
+            for word in words:
+                vector = 0.8 * centers[t] + 0.6 * stub_embedding(word, dimension) * np.sqrt(dimension)
+                self.word_vectors[word] = vector / np.linalg.norm(vector)
+                synonym = vector + 0.2 * stub_embedding(f"{word}s", dimension) * np.sqrt(dimension)
+                self.word_vectors[f"{word}s"] = synonym / np.linalg.norm(synonym)
+
+        self.topics = self.rng.integers(0, topics, size=n)
+        self.codes = [
+            f"POL-{code}" if has_code else None
+            for code, has_code in zip(
+                self.rng.choice(90000, size=n, replace=False) + 10000,
+                self.rng.random(n) < 0.5,
+            )
+        ]
+        self.words = []
+        self.texts = []
+        for topic, code in zip(self.topics, self.codes):
+            words = list(self.rng.choice(self.vocab[topic], size=12, replace=False))
+            filler = list(self.rng.choice(COMMON_WORDS, size=8))
+            self.words.append(words)
+            tokens = words + filler + ([code] if code else [])
+            self.rng.shuffle(tokens)
+            self.texts.append(" ".join(tokens))
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in text.split():
+            if token in self.word_vectors:
+                vector += self.word_vectors[token]
+            elif token.startswith("POL-"):
+                vector += CODE_WEIGHT * stub_embedding(token, self.dimension)
+            else:
+                vector += 0.2 * stub_embedding(token, self.dimension)
+        return vector / np.linalg.norm(vector)
+
+    def paraphrase_queries(self, n: int):
+        targets = self.rng.integers(0, len(self.texts), size=n)
+        queries = []
+        for target in targets:
+            words = list(self.rng.choice(self.words[target], size=6, replace=False))
+            queries.append(" ".join(words[:2] + [f"{word}s" for word in words[2:]]))
+        return queries, targets
+
+    def code_queries(self, n: int):
+        with_code = np.flatnonzero([code is not None for code in self.codes])
+        targets = self.rng.choice(with_code, size=n, replace=False)
+        queries = [
+            f"what does {self.codes[t]} say about {self.rng.choice(self.words[t])}"
+            for t in targets
+        ]
+        return queries, targets
+
+
+def score(rankings, targets, k: int) -> dict:
+    hits, reciprocal_ranks = 0, 0.0
+    for ranking, target in zip(rankings, targets):
+        ids = [idx for idx, _ in ranking[:k]]
+        if target in ids:
+            hits += 1
+            reciprocal_ranks += 1.0 / (ids.index(target) + 1)
+    return {f"recall@{k}": hits / len(targets), "mrr": reciprocal_ranks / len(targets)}
+
+
+def run_queries(store: FaissStore, corpus: Corpus, queries, args):
+    """Rankings and per-query latency (ms) for each mode, one query at a time."""
+    depth = max(args.k, args.candidates)
+    rankings = {mode: [] for mode in ("dense", "lexical", "hybrid")}
+    latencies = {mode: [] for mode in rankings}
+
+    for query in queries:
+        embedding = [corpus.embed(query)]
+        dense, dense_s = timed(store.dense_hits, embedding, args.k)
+        lexical, lexical_s = timed(store.lexical_hits, [query], args.k)
+
+        # Hybrid pays for deeper candidate lists plus the fusion; in the API
+        # both sides run concurrently, so only the slower one counts
+        dense_deep, dense_deep_s = timed(store.dense_hits, embedding, depth)
+        lexical_deep, lexical_deep_s = timed(store.lexical_hits, [query], depth)
+        fused, fuse_s = timed(
+            reciprocal_rank_fusion, [dense_deep[0], lexical_deep[0]], args.k, args.rrf_k
+        )
+
+        rankings["dense"].append(dense[0])
+        rankings["lexical"].append(lexical[0])
+        rankings["hybrid"].append(fused)
+        latencies["dense"].append(dense_s * 1000)
+        latencies["lexical"].append(lexical_s * 1000)
+        latencies["hybrid"].append((max(dense_deep_s, lexical_deep_s) + fuse_s) * 1000)
+
+    return rankings, latencies
+
+
+def run(args) -> dict:
+    corpus = Corpus(args.n, args.dim, args.topics, args.seed)
+    embeddings = np.stack([corpus.embed(text) for text in corpus.texts])
+
+    store = FaissStore(args.dim, use_cosine=True, lexical_index=True)
+    _, build_seconds = timed(
+        store.add,
+        embeddings,
+        corpus.texts,
+        [{"source": f"doc-{i}.pdf", "chunk_id": 0} for i in range(args.n)],
+    )
+
+    # Size of the persisted postings (first generation of a fresh path)
+    with tempfile.TemporaryDirectory() as directory:
+        store.save(os.path.join(directory, "bench"))
+        lexical_dir = os.path.join(directory, "bench.1.lexical")
+        lexical_bytes = sum(
+            os.path.getsize(os.path.join(lexical_dir, name)) for name in os.listdir(lexical_dir)
+        )
+
+    rows = []
+    for kind, (queries, targets) in (
+        ("paraphrase", corpus.paraphrase_queries(args.queries)),
+        ("code", corpus.code_queries(args.queries)),
+    ):
+        rankings, latencies = run_queries(store, corpus, queries, args)
+        for mode in ("dense", "lexical", "hybrid"):
+            rows.append({
+                "queries": kind,
+                "mode": mode,
+                **score(rankings[mode], targets, args.k),
+                "p50_ms": float(np.percentile(latencies[mode], 50)),
+                "p95_ms": float(np.percentile(latencies[mode], 95)),
+            })
+
+    print(
+        f"{args.n} chunks x {args.dim} dims, {args.queries} queries per set, "
+        f"{args.candidates} candidates per side for hybrid\n"
+        f"store.add (FAISS + BM25): {build_seconds:.2f}s, "
+        f"postings on disk: {lexical_bytes / 1e6:.1f} MB\n"
+    )
+    print_table(rows, list(rows[0].keys()))
+    return {
+        "chunks": args.n,
+        "dimension": args.dim,
+        "k": args.k,
+        "candidates": args.candidates,
+        "rrf_k": args.rrf_k,
+        "build_s": build_seconds,
+        "lexical_bytes": lexical_bytes,
+        "results": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--topics", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=50)
+    parser.add_argument("--rrf-k", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    write_json(args.json, run(args))
+
+
+if __name__ == "__main__":
+    main()
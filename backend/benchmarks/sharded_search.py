@@ -0,0 +1,112 @@
+"""
+Latency / throughput report for a sharded FAISS store against one index.
+
+    python -m benchmarks.sharded_search --n 500000 --dim 1536 --shards 1,2,4,8
+    python -m benchmarks.sharded_search --concurrency 8 --json out/shards.json
+
+Builds in-memory stores from synthetic vectors (source partitioning, so the
+shards are evenly filled) and runs the same queries against each: one at a
+time for per-query latency, then from ``--concurrency`` threads for
+throughput. Results are checked against the unsharded store; with a flat
+index they must be identical. Fan-out only pays off with more than one
+core and a flat scan big enough to outweigh the merge.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Nothing here calls OpenAI, but the app settings require a key
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+from app.services.faiss_service import FaissStore
+from app.services.sharded_store import ShardedFaissStore
+from benchmarks.common import print_table, synthetic_queries, synthetic_vectors, timed, write_json
+
+
+def build(base: np.ndarray, shards: int, args):
+    if shards == 1:
+        store = FaissStore(base.shape[1], use_cosine=True)
+    else:
+        store = ShardedFaissStore(base.shape[1], use_cosine=True, num_shards=shards)
+    # One "document" per 100 vectors, so source hashing spreads them evenly
+    for start in range(0, len(base), args.batch):
+        rows = range(start, min(start + args.batch, len(base)))
+        store.add(
+            base[start:start + args.batch],
+            [f"chunk {i}" for i in rows],
+            [{"source": f"doc-{i // 100}.pdf", "chunk_id": i} for i in rows],
+        )
+    return store
+
+
+def measure(store, queries: np.ndarray, args) -> dict:
+    store.search_batch(queries[:1], args.k)  # warm up (and open lazy shards)
+    latencies = []
+    results = []
+    for query in queries:
+        found, seconds = timed(store.search_batch, [query], args.k)
+        results.append([text for text, _, _ in found[0]])
+        latencies.append(seconds * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(lambda query: store.search_batch([query], args.k), queries))
+    qps = len(queries) / (time.perf_counter() - start)
+
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        f"qps@{args.concurrency}": qps,
+    }, results
+
+
+def run(args) -> dict:
+    base = synthetic_vectors(args.n, args.dim, seed=args.seed)
+    queries = synthetic_queries(base, args.queries, seed=args.seed + 1)
+
+    rows = []
+    reference = None
+    for shards in (int(s) for s in args.shards.split(",")):
+        store, build_seconds = timed(build, base, shards, args)
+        stats, results = measure(store, queries, args)
+        reference = reference or results
+        same = sum(r == e for r, e in zip(results, reference)) / len(queries)
+        rows.append({"shards": shards, **stats, "same_top_k": same, "build_s": build_seconds})
+        if isinstance(store, ShardedFaissStore):
+            store.close()
+
+    print(
+        f"{args.n} vectors x {args.dim} dims, {args.queries} queries, k={args.k}, "
+        f"{os.cpu_count()} CPUs\n"
+    )
+    print_table(rows, list(rows[0].keys()))
+    return {
+        "vectors": args.n,
+        "dimension": args.dim,
+        "k": args.k,
+        "cpus": os.cpu_count(),
+        "results": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--shards", default="1,2,4,8", help="Comma-separated shard counts; 1 = FaissStore")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    write_json(args.json, run(args))
+
+
+if __name__ == "__main__":
+    main()
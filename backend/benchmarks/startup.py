@@ -0,0 +1,149 @@
+"""
+Cold start report: app import time and time until a saved index can answer.
+
+    python -m benchmarks.startup --n 200000 --dim 768
+    python -m benchmarks.startup --index-type hnsw --json out/startup.json
+
+Every measurement runs in a fresh interpreter, so nothing is already
+imported or cached: ``import app.main`` (what uvicorn pays before the
+server listens), then opening a saved store with and without
+FAISS_MMAP, its first search and the resident memory it took. With
+mmap the flat/HNSW vectors are paged in from the OS page cache on demand
+instead of being read into the heap, so a re-opened index is ready almost
+at once and costs little RSS until queried.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Nothing here calls OpenAI, but the app settings require a key
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+from benchmarks.common import print_table, synthetic_queries, synthetic_vectors, write_json
+
+
+def build(path: str, base: np.ndarray, args):
+    from app.services.faiss_service import FaissStore
+    from app.services.index_factory import IndexOptions
+
+    store = FaissStore(
+        base.shape[1],
+        use_cosine=True,
+        index_path=path,
+        index_options=IndexOptions(index_type=args.index_type),
+    )
+    for start in range(0, len(base), args.batch):
+        rows = range(start, min(start + args.batch, len(base)))
+        store.add(
+            base[start:start + args.batch],
+            [f"chunk {i}" for i in rows],
+            [{"source": f"doc-{i // 100}.pdf", "chunk_id": i} for i in rows],
+        )
+    store.save(path)
+    store.close()
+
+
+def child(args):
+    """Runs in the fresh interpreter; prints one JSON line."""
+    if args.child == "import":
+        start = time.perf_counter()
+        import app.main  # noqa: F401
+        print(json.dumps({"import_s": time.perf_counter() - start}))
+        return
+
+    from app.core.metrics import resident_memory_bytes
+    from app.services.faiss_service import FaissStore
+    from app.services.index_factory import IndexOptions
+
+    query = np.load(args.query)
+    rss_before = resident_memory_bytes()
+    start = time.perf_counter()
+    store = FaissStore(
+        query.shape[1],
+        use_cosine=True,
+        index_path=args.path,
+        index_options=IndexOptions(index_type=args.index_type),
+        mmap=args.child == "mmap",
+    )
+    open_seconds = time.perf_counter() - start
+    rss_open = resident_memory_bytes()
+    start = time.perf_counter()
+    store.search_batch(query, args.k)
+    search_seconds = time.perf_counter() - start
+    print(json.dumps({
+        "open_s": open_seconds,
+        "first_search_ms": search_seconds * 1000,
+        "rss_open_mb": (rss_open - rss_before) / 2**20,
+        "rss_search_mb": (resident_memory_bytes() - rss_before) / 2**20,
+    }))
+
+
+def spawn(mode: str, args, path: str = "", query: str = "") -> dict:
+    command = [
+        sys.executable, "-m", "benchmarks.startup", "--child", mode,
+        "--path", path, "--query", query,
+        "--index-type", args.index_type, "--k", str(args.k),
+    ]
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(args) -> dict:
+    base = synthetic_vectors(args.n, args.dim, seed=args.seed)
+    query = synthetic_queries(base, 1, seed=args.seed + 1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "faiss_index")
+        query_file = os.path.join(directory, "query.npy")
+        np.save(query_file, query)
+        build(path, base, args)
+
+        imports = [spawn("import", args)["import_s"] for _ in range(args.repeat)]
+        rows = []
+        for mode in ("read", "mmap"):
+            runs = [spawn(mode, args, path, query_file) for _ in range(args.repeat)]
+            rows.append({"load": mode, **{key: min(r[key] for r in runs) for key in runs[0]}})
+
+    print(
+        f"{args.n} vectors x {args.dim} dims ({args.index_type}), best of {args.repeat}\n"
+        f"import app.main: {min(imports):.3f}s\n"
+    )
+    print_table(rows, list(rows[0].keys()))
+    return {
+        "vectors": args.n,
+        "dimension": args.dim,
+        "index_type": args.index_type,
+        "import_s": min(imports),
+        "results": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--index-type", default="flat", choices=["flat", "hnsw"])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Write results as JSON to this path")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--path", default="", help=argparse.SUPPRESS)
+    parser.add_argument("--query", default="", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+    write_json(args.json, run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Minimal stand-in for the OpenAI HTTP API, for offline benchmarks and load
+tests. Serves ``/v1/embeddings`` (deterministic vectors derived from the
+text) and ``/v1/chat/completions`` (plain and streamed), each after a fixed
+simulated latency, and tracks how many requests were in flight at once.
+Tests can make it answer with errors (``fail_next``) or advertise other
+rate limits (``rate_limit_headers``).
+
+    stub = StubOpenAI(port=8765, dimension=256, latency=0.2)
+    stub.start()
+    os.environ["OPENAI_BASE_URL"] = stub.base_url
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import threading
+import time
+from typing import List, Optional, Tuple
+from contextlib import asynccontextmanager
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ANSWER_WORDS = ["The", " policy", " is", " described", " in", " [Source 1]", "."]
+
+RATE_LIMIT_HEADERS = {
+    "x-ratelimit-limit-requests": "1000000",
+    "x-ratelimit-remaining-requests": "1000000",
+    "x-ratelimit-reset-requests": "1ms",
+    "x-ratelimit-limit-tokens": "1000000000",
+    "x-ratelimit-remaining-tokens": "1000000000",
+    "x-ratelimit-reset-tokens": "1ms",
+}
+
+
+def stub_embedding(text: str, dimension: int) -> np.ndarray:
+    """Unit vector seeded by the text, so equal texts embed identically."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def _encode(vector: np.ndarray, encoding_format: str):
+    """Like the real API: float lists unless base64 (little-endian float32) is asked for."""
+    if encoding_format == "base64":
+        return base64.b64encode(vector.astype("<f4").tobytes()).decode()
+    return vector.tolist()
+
+
+class StubOpenAI:
+    def __init__(
+        self,
+        port: int = 8765,
+        dimension: int = 1536,
+        latency: float = 0.05,
+        chat_latency: Optional[float] = None,
+    ):
+        self.port = port
+        self.dimension = dimension
+        self.latency = latency
+        self.chat_latency = latency if chat_latency is None else chat_latency
+        self.base_url = f"http://127.0.0.1:{port}/v1"
+
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.calls = {"embeddings": 0, "chat": 0}
+        self.rate_limit_headers = dict(RATE_LIMIT_HEADERS)
+        self._failures: List[Tuple[int, dict]] = []
+
+        self._server = None
+        self._thread = None
+        self.app = self._build_app()
+
+    def start(self):
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True, name="stub-openai")
+        self._thread.start()
+        deadline = time.time() + 10
+        while not self._server.started:
+            if time.time() > deadline:
+                raise RuntimeError("Stub OpenAI server did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
+
+    def reset_counters(self):
+        self.peak_in_flight = 0
+        self.calls = {"embeddings": 0, "chat": 0}
+
+    def fail_next(self, status: int, times: int = 1, headers: Optional[dict] = None):
+        """Answer the next ``times`` embedding requests with HTTP ``status``."""
+        self._failures.extend([(status, headers or {})] * times)
+
+    # -------------------------
+    # ROUTES
+    # -------------------------
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/v1/embeddings")
+        async def embeddings(request: Request):
+            body = await request.json()
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            self.calls["embeddings"] += 1
+            if self._failures:
+                status, headers = self._failures.pop(0)
+                return JSONResponse(
+                    {"error": {"message": f"Stub error {status}", "type": "stub_error", "code": None}},
+                    status_code=status,
+                    headers=headers,
+                )
+            async with self._track():
+                await asyncio.sleep(self.latency)
+
+            encoding_format = body.get("encoding_format", "float")
+            data = [
+                {
+                    "object": "embedding",
+                    "index": i,
+                    "embedding": _encode(stub_embedding(text, self.dimension), encoding_format),
+                }
+                for i, text in enumerate(inputs)
+            ]
+            tokens = sum(len(text.split()) for text in inputs)
+            return JSONResponse(
+                {
+                    "object": "list",
+                    "data": data,
+                    "model": body["model"],
+                    "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+                },
+                headers=self.rate_limit_headers,
+            )
+
+        @app.post("/v1/chat/completions")
+        async def chat(request: Request):
+            body = await request.json()
+            self.calls["chat"] += 1
+            usage = {"prompt_tokens": 500, "completion_tokens": len(ANSWER_WORDS), "total_tokens": 500 + len(ANSWER_WORDS)}
+
+            if body.get("stream"):
+                return StreamingResponse(self._stream(body, usage), media_type="text/event-stream")
+
+            async with self._track():
+                await asyncio.sleep(self.chat_latency)
+            return JSONResponse({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(ANSWER_WORDS)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+        return app
+
+    async def _stream(self, body: dict, usage: dict):
+        def event(choices, **extra) -> str:
+            payload = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": choices,
+                **extra,
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async with self._track():
+            # Time to first token, then the rest trickles in
+            await asyncio.sleep(self.chat_latency / 2)
+            for word in ANSWER_WORDS:
+                yield event([{"index": 0, "delta": {"content": word}, "finish_reason": None}])
+                await asyncio.sleep(self.chat_latency / (2 * len(ANSWER_WORDS)))
+            yield event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if body.get("stream_options", {}).get("include_usage"):
+                yield event([], usage=usage)
+            yield "data: [DONE]\n\n"
+
+    @asynccontextmanager
+    async def _track(self):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,348 @@
+"""
+Benchmark suite for the ingest and query hot paths, with regression checks.
+
+    python -m benchmarks.suite --json out/bench.json
+    python -m benchmarks.suite --sizes 10000,100000,1000000 --json out/full.json
+    python -m benchmarks.suite --only faiss,ask --baseline out/bench.json
+    python -m benchmarks.suite --compare out/v1.json out/v2.json
+
+Runs fully offline: OpenAI is replaced by the local StubOpenAI server (with
+``--stub-latency`` per call, small by default so the app's own overhead
+dominates) and documents by synthetic PDFs. Benchmarks:
+
+- ``split``    ``split_text`` and the token chunker ``split_pages``
+- ``extract``  ``extract_text_from_pdf`` with every PDF backend
+- ``embed``    ``embed_texts`` / ``embed_texts_async`` against the stub
+- ``faiss``    FaissStore add / search / save / load per ``--sizes``
+- ``context``  ``truncate_context`` with cold and warm token counts
+- ``ask``      ``/ask/`` end to end through the FastAPI app
+
+Results are written as JSON with one flat ``metrics`` mapping such as
+``"faiss.100000.search_p95_ms": 1.9``. ``--baseline`` (or ``--compare``)
+checks every metric against an earlier run using the tolerances in
+benchmarks/thresholds.json and exits with status 1 if any regressed, so
+runs can be diffed between versions or gate CI.
+"""
+import argparse
+import asyncio
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.ask_load import configure_environment, drive, populate_store
+from benchmarks.common import print_table, synthetic_queries, synthetic_vectors, timed, write_json
+from benchmarks.stub_openai import StubOpenAI
+from benchmarks.synthetic_pdf import synthetic_pages, write_pdf
+
+THRESHOLDS_PATH = os.path.join(os.path.dirname(__file__), "thresholds.json")
+
+
+def median_seconds(fn: Callable, repeat: int) -> float:
+    return statistics.median(timed(fn)[1] for _ in range(repeat))
+
+
+# -------------------------
+# BENCHMARKS
+# -------------------------
+def bench_split(args, workdir: str) -> Dict[str, float]:
+    from app.utils.text_splitter import split_pages, split_text
+
+    pages = synthetic_pages(args.pages, seed=args.seed)
+    text = "\n\n".join(pages)
+    megabytes = len(text.encode("utf-8")) / 1e6
+    numbered = list(enumerate(pages, 1))
+    return {
+        "split_text.mb_per_s": megabytes / median_seconds(lambda: split_text(text), args.repeat),
+        "split_pages.mb_per_s": megabytes / median_seconds(
+            lambda: list(split_pages(numbered)), args.repeat
+        ),
+    }
+
+
+def bench_extract(args, workdir: str) -> Dict[str, float]:
+    from app.utils.text_extractor import BACKENDS, extract_text_from_pdf
+
+    path = os.path.join(workdir, "synthetic.pdf")
+    write_pdf(path, synthetic_pages(args.pages, seed=args.seed))
+    metrics = {}
+    for backend in BACKENDS:
+        extract_text_from_pdf(path, backend)  # warm up (and start the process pool)
+        seconds = median_seconds(lambda: extract_text_from_pdf(path, backend), args.repeat)
+        metrics[f"extract.{backend}.pages_per_s"] = args.pages / seconds
+    return metrics
+
+
+def bench_embed(args, workdir: str) -> Dict[str, float]:
+    from app.services.embedding_service import embed_texts, embed_texts_async
+    from app.services.openai_client import close_async_clients
+
+    def texts(run: str) -> List[str]:
+        # Fresh texts per run, so nothing is served from a cache
+        return [
+            f"{run} chunk {i}: " + " ".join(synthetic_pages(1, seed=i)[0].split()[:60])
+            for i in range(args.embed_texts)
+        ]
+
+    async def embed_async(batch):
+        try:
+            return await embed_texts_async(batch)
+        finally:
+            await close_async_clients()
+
+    sync_texts, async_texts = texts("sync"), texts("async")
+    _, sync_seconds = timed(embed_texts, sync_texts)
+    _, async_seconds = timed(asyncio.run, embed_async(async_texts))
+    return {
+        "embed_texts.texts_per_s": len(sync_texts) / sync_seconds,
+        "embed_texts_async.texts_per_s": len(async_texts) / async_seconds,
+    }
+
+
+def bench_faiss(args, workdir: str) -> Dict[str, float]:
+    from app.core.dependencies import get_index_options
+    from app.services.faiss_service import FaissStore
+
+    metrics = {}
+    for n in (int(size) for size in args.sizes.split(",")):
+        base = synthetic_vectors(n, args.dim, seed=args.seed)
+        queries = synthetic_queries(base, args.queries, seed=args.seed + 1)
+        texts = [f"chunk {i} of synthetic document {i // 100}" for i in range(n)]
+        metadata = [{"source": f"doc-{i // 100}.pdf", "chunk_id": i} for i in range(n)]
+        path = os.path.join(workdir, f"faiss-{n}", "faiss_index")
+
+        def open_store():
+            # Compaction only when asked for, so save is timed on its own
+            return FaissStore(
+                args.dim,
+                use_cosine=True,
+                index_path=path,
+                compact_threshold_bytes=1 << 62,
+                index_options=get_index_options(),
+                lexical_index=True,
+            )
+
+        store = open_store()
+        start = time.perf_counter()
+        for i in range(0, n, args.batch):
+            store.add(base[i:i + args.batch], texts[i:i + args.batch], metadata[i:i + args.batch])
+        add_seconds = time.perf_counter() - start
+
+        store.search_batch(queries[:1], args.k)
+        latencies = [timed(store.search_batch, [query], args.k)[1] * 1000 for query in queries]
+        _, batch_seconds = timed(store.search_batch, queries, args.k)
+
+        _, save_seconds = timed(store.compact)
+        store.close()
+        loaded, load_seconds = timed(open_store)
+        assert len(loaded) == n, f"Reloaded {len(loaded)} of {n} vectors"
+        loaded.close()
+
+        metrics.update({
+            f"faiss.{n}.add_vectors_per_s": n / add_seconds,
+            f"faiss.{n}.search_p50_ms": float(np.percentile(latencies, 50)),
+            f"faiss.{n}.search_p95_ms": float(np.percentile(latencies, 95)),
+            f"faiss.{n}.search_batch_queries_per_s": len(queries) / batch_seconds,
+            f"faiss.{n}.save_s": save_seconds,
+            f"faiss.{n}.load_s": load_seconds,
+        })
+    return metrics
+
+
+def bench_context(args, workdir: str) -> Dict[str, float]:
+    from app.services.answer_service import truncate_context
+
+    words = " ".join(synthetic_pages(40, seed=args.seed)).split()
+    requests = [
+        [" ".join(words[(r * 5 + c) * 300:(r * 5 + c + 1) * 300]) + f" ({r}.{c})" for c in range(5)]
+        for r in range(200)
+    ]
+
+    # Cold: every request brings chunks never counted before
+    _, cold_seconds = timed(lambda: [truncate_context(chunks, 1500) for chunks in requests])
+    # Warm: the same chunks again, counts come from the cache
+    _, warm_seconds = timed(lambda: [truncate_context(chunks, 1500) for chunks in requests])
+    return {
+        "truncate_context.cold_calls_per_s": len(requests) / cold_seconds,
+        "truncate_context.warm_calls_per_s": len(requests) / warm_seconds,
+    }
+
+
+def bench_ask(args, workdir: str) -> Dict[str, float]:
+    from app.core.dependencies import get_faiss_store
+    from app.main import app
+
+    store = get_faiss_store()
+    if not len(store):
+        populate_store(store, args.ask_chunks, args.dim)
+    result = asyncio.run(drive(app, "/ask/", args.ask_requests, args.concurrency))
+    if result["errors"]:
+        raise RuntimeError(f"{result['errors']} of {result['requests']} /ask/ requests failed")
+    return {
+        "ask.req_per_s": result["req_per_s"],
+        "ask.p50_ms": result["p50_ms"],
+        "ask.p95_ms": result["p95_ms"],
+    }
+
+
+BENCHMARKS = {
+    "split": bench_split,
+    "extract": bench_extract,
+    "embed": bench_embed,
+    "faiss": bench_faiss,
+    "context": bench_context,
+    "ask": bench_ask,
+}
+
+
+# -------------------------
+# REGRESSION CHECK
+# -------------------------
+def load_thresholds(path: str = THRESHOLDS_PATH) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def rule_for(metric: str, thresholds: dict) -> dict:
+    """First rule whose pattern matches ``metric``, over the defaults."""
+    for rule in thresholds["rules"]:
+        if fnmatch.fnmatch(metric, rule["pattern"]):
+            return {**thresholds["default"], **rule}
+    return thresholds["default"]
+
+
+def compare(baseline: dict, current: dict, thresholds: dict) -> List[dict]:
+    rows = []
+    for metric in sorted(set(baseline) | set(current)):
+        old, new = baseline.get(metric), current.get(metric)
+        if old is None or new is None:
+            rows.append({"metric": metric, "baseline": old, "current": new,
+                         "change": None, "status": "new" if old is None else "missing"})
+            continue
+
+        rule = rule_for(metric, thresholds)
+        change = (new - old) / old if old else 0.0
+        worse = -change if rule["better"] == "higher" else change
+        if worse > rule["tolerance"]:
+            status = "REGRESSED"
+        elif worse < -rule["tolerance"]:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append({"metric": metric, "baseline": old, "current": new,
+                     "change": f"{change:+.1%}", "status": status})
+    return rows
+
+
+def report(baseline_path: str, current: dict, thresholds: dict) -> bool:
+    """Print the comparison; True when nothing regressed."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["metrics"]
+    rows = compare(baseline, current, thresholds)
+    print(f"\nAgainst {baseline_path}\n")
+    print_table(rows, ["metric", "baseline", "current", "change", "status"])
+    regressed = [row["metric"] for row in rows if row["status"] == "REGRESSED"]
+    if regressed:
+        print(f"\n{len(regressed)} metric(s) regressed beyond tolerance: {', '.join(regressed)}")
+    return not regressed
+
+
+# -------------------------
+# RUN
+# -------------------------
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def run(args) -> dict:
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise SystemExit(f"Unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    stub = StubOpenAI(port=args.port, dimension=args.dim, latency=args.stub_latency).start()
+    workdir = tempfile.mkdtemp(prefix="bench-suite-")
+    # Before anything imports the app settings
+    configure_environment(stub, workdir)
+
+    meta = environment()
+    metrics: Dict[str, float] = {}
+    rows = []
+    try:
+        for name in names:
+            results, seconds = timed(BENCHMARKS[name], args, workdir)
+            metrics.update(results)
+            rows.extend({"benchmark": name, "metric": metric, "value": value}
+                        for metric, value in results.items())
+            print(f"{name:<8} done in {seconds:.1f}s", file=sys.stderr)
+    finally:
+        stub.stop()
+
+    print(f"\n{meta['commit'] or 'unknown commit'}, {meta['cpus']} CPUs, "
+          f"{args.dim}-dim vectors, stub latency {args.stub_latency * 1000:.0f} ms\n")
+    print_table(rows, ["benchmark", "metric", "value"])
+    return {"meta": meta, "config": vars(args), "metrics": metrics}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", default=None, help=f"Comma-separated subset of {','.join(BENCHMARKS)}")
+    parser.add_argument("--sizes", default="10000,100000", help="Comma-separated FaissStore sizes")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=10000, help="Vectors per FaissStore.add")
+    parser.add_argument("--pages", type=int, default=50, help="Pages of the synthetic PDF")
+    parser.add_argument("--embed-texts", type=int, default=2000)
+    parser.add_argument("--ask-chunks", type=int, default=5000)
+    parser.add_argument("--ask-requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--stub-latency", type=float, default=0.005, help="Stub seconds per OpenAI call")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--thresholds", default=THRESHOLDS_PATH)
+    parser.add_argument("--baseline", default=None, help="Earlier --json output to check against")
+    parser.add_argument(
+        "--compare", nargs=2, metavar=("BASELINE", "CURRENT"), default=None,
+        help="Only compare two earlier --json outputs",
+    )
+    parser.add_argument("--json", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    thresholds = load_thresholds(args.thresholds)
+    if args.compare:
+        with open(args.compare[1], "r", encoding="utf-8") as f:
+            current = json.load(f)["metrics"]
+        sys.exit(0 if report(args.compare[0], current, thresholds) else 1)
+
+    results = run(args)
+    write_json(args.json, results)
+    if args.baseline and not report(args.baseline, results["metrics"], thresholds):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
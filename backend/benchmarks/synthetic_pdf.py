@@ -0,0 +1,78 @@
+"""
+Synthetic text PDFs for the extraction and ingest benchmarks, written
+directly in PDF syntax so no PDF-producing library is needed.
+
+    pages = synthetic_pages(50, seed=0)
+    write_pdf("out/sample.pdf", pages)
+"""
+from typing import List
+
+import numpy as np
+
+WORDS = (
+    "policy onboarding payroll quarterly review security incident vendor contract "
+    "escalation budget roadmap compliance access request approval deadline team "
+    "customer release engineering handbook benefits travel expense audit the of "
+    "and for with must may should staff process update section manager within days"
+).split()
+
+LINES_PER_PAGE = 48
+WORDS_PER_LINE = 14
+
+
+def synthetic_pages(count: int, seed: int = 0) -> List[str]:
+    """Page texts of sentences grouped into paragraphs, one line per PDF text line."""
+    rng = np.random.default_rng(seed)
+    pages = []
+    for page in range(count):
+        lines = [f"Section {page + 1}"]
+        while len(lines) < LINES_PER_PAGE:
+            words = list(rng.choice(WORDS, size=WORDS_PER_LINE))
+            words[0] = words[0].capitalize()
+            lines.append(" ".join(words) + ".")
+            if rng.random() < 0.15:
+                lines.append("")  # paragraph break
+        pages.append("\n".join(lines[:LINES_PER_PAGE]))
+    return pages
+
+
+def write_pdf(path: str, pages: List[str]):
+    """Minimal PDF 1.4: one Helvetica text stream per page, a line per text line."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for text in pages:
+        stream = ["BT", "/F1 10 Tf", "12 TL", "50 760 Td"]
+        for line in text.split("\n"):
+            stream.append(f"({_escape(line)}) Tj T*")
+        stream.append("ET")
+        content = "\n".join(stream).encode("latin-1", errors="replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects),)
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{i} 0 R" for i in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
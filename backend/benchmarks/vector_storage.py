@@ -0,0 +1,144 @@
+"""
+Memory / recall@k / latency report for reduced-precision and reduced-dimension
+vector storage against float32 at full dimension.
+
+    python -m benchmarks.vector_storage --n 100000 --dim 1536 --reduce 256,512
+    python -m benchmarks.vector_storage --index-type hnsw --json out/storage.json
+    python -m benchmarks.vector_storage --index-path data/faiss_index --reduce 512
+
+Each storage mode (float32 / float16 / int8) is measured at full dimension
+and, for every ``--reduce`` size, after PCA and after truncation to the
+leading components. Truncation only preserves quality for embeddings
+trained for it (text-embedding-3); on the synthetic vectors it shows the
+worst case, so run it with ``--index-path`` on a real store to decide.
+"""
+import argparse
+
+import faiss
+import numpy as np
+
+from app.services.index_factory import (
+    INDEX_TYPES,
+    VECTOR_STORAGE,
+    IndexOptions,
+    build_trained_index,
+)
+from benchmarks.ann_recall import load_store_vectors
+from benchmarks.common import (
+    print_table,
+    recall_at_k,
+    synthetic_queries,
+    synthetic_vectors,
+    timed,
+    write_json,
+)
+
+
+def truncate(vectors: np.ndarray, dimension: int) -> np.ndarray:
+    """Leading components, renormalised, as text-embedding-3 ``dimensions`` does."""
+    shortened = np.ascontiguousarray(vectors[:, :dimension])
+    faiss.normalize_L2(shortened)
+    return shortened
+
+
+def measure(index, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    # Warm up once, then time the full query set one query at a time
+    index.search(queries[:1], k)
+    latencies = []
+    found = np.empty_like(truth)
+    for i in range(len(queries)):
+        (_, ids), seconds = timed(index.search, queries[i:i + 1], k)
+        found[i] = ids[0]
+        latencies.append(seconds * 1000)
+    return {
+        f"recall@{k}": recall_at_k(truth, found, k),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+def run(args) -> dict:
+    if args.index_path:
+        base = load_store_vectors(args.index_path)
+    else:
+        base = synthetic_vectors(args.n, args.dim, seed=args.seed)
+    queries = synthetic_queries(base, args.queries, seed=args.seed + 1)
+    dimension = base.shape[1]
+
+    exact = faiss.IndexFlatIP(dimension)
+    exact.add(base)
+    _, truth = exact.search(queries, args.k)
+
+    reductions = [("full", 0)]
+    for size in (int(s) for s in args.reduce.split(",") if s):
+        reductions += [("pca", size), ("truncate", size)]
+
+    rows = []
+    baseline_bytes = None
+    for storage in args.storage.split(","):
+        for reduction, size in reductions:
+            options = IndexOptions(
+                index_type=args.index_type,
+                nlist=args.nlist,
+                nprobe=args.nprobe,
+                hnsw_m=args.hnsw_m,
+                ef_search=args.ef_search,
+                storage=storage,
+                pca_dimension=size if reduction == "pca" else 0,
+            )
+            vectors, query_vectors = base, queries
+            if reduction == "truncate":
+                vectors, query_vectors = truncate(base, size), truncate(queries, size)
+
+            index, build_seconds = timed(
+                build_trained_index, vectors, vectors.shape[1], True, options
+            )
+            bytes_per_vector = faiss.serialize_index(index).nbytes / len(base)
+            baseline_bytes = baseline_bytes or bytes_per_vector
+
+            rows.append({
+                "storage": storage,
+                "reduction": reduction if not size else f"{reduction} {size}",
+                "bytes_per_vector": bytes_per_vector,
+                "vs_float32": baseline_bytes / bytes_per_vector,
+                **measure(index, query_vectors, truth, args.k),
+                "build_s": build_seconds,
+            })
+
+    print(
+        f"{len(base)} vectors x {dimension} dims, {len(queries)} queries, "
+        f"{args.index_type} index\n"
+    )
+    print_table(rows, list(rows[0].keys()))
+    return {
+        "vectors": len(base),
+        "dimension": dimension,
+        "index_type": args.index_type,
+        "k": args.k,
+        "results": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index-type", choices=[t for t in INDEX_TYPES if t != "ivf_pq"], default="flat")
+    parser.add_argument("--storage", default=",".join(VECTOR_STORAGE))
+    parser.add_argument("--reduce", default="256,512", help="Comma-separated reduced dimensions")
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--index-path", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    write_json(args.json, run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Index every PDF in a directory or zip archive.
+
+    python -m scripts.bulk_ingest /data/handbooks
+    python -m scripts.bulk_ingest exports.zip --department legal --documents-per-write 128
+    python -m scripts.bulk_ingest /data/handbooks --fresh --json out/backfill.json
+
+Runs the pipeline behind POST /documents/bulk (see BulkIngest): documents
+are extracted and split in parallel processes, embedded in concurrent
+batches across documents, and indexed with one write per group. Progress
+and throughput are logged as it goes. Stop the API first, as for
+convert_index: the script exits at once while a server process holds the
+store's write lock (or post to /documents/bulk instead).
+
+Finished documents are checkpointed, so re-running the command after an
+interruption carries on where it stopped (``--fresh`` starts over); a run
+that completes removes its checkpoint. With INGEST_INCREMENTAL, documents
+already indexed with the same content are skipped either way.
+"""
+import argparse
+import asyncio
+import json
+import os
+
+from app.core.concurrency import StoreLockedError
+from app.core.config import (
+    DOCUMENT_REGISTRY_PATH,
+    INGEST_BULK_DOCUMENTS_PER_WRITE,
+    INGEST_BULK_GROUPS_IN_FLIGHT,
+    INGEST_INCREMENTAL,
+)
+from app.core.dependencies import open_faiss_store
+from app.core.logging import setup_logging
+from app.services.bulk_ingest import BulkIngest, Checkpoint, default_checkpoint_path
+from app.services.document_registry import DocumentRegistry
+from app.services.openai_client import close_async_clients
+
+
+async def run(args) -> dict:
+    try:
+        store = open_faiss_store()
+    except StoreLockedError as e:
+        raise SystemExit(f"{e}; stop the API first")
+
+    checkpoint_path = args.checkpoint or default_checkpoint_path(args.path)
+    if args.fresh and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = Checkpoint(checkpoint_path)
+    ingest = BulkIngest(
+        faiss_store=store,
+        registry=DocumentRegistry(DOCUMENT_REGISTRY_PATH) if INGEST_INCREMENTAL else None,
+        checkpoint=checkpoint,
+        document_metadata={"department": args.department} if args.department else None,
+        documents_per_write=args.documents_per_write,
+        groups_in_flight=args.groups_in_flight,
+        extract_concurrency=args.extract_concurrency,
+    )
+    try:
+        return await ingest.run(args.path)
+    finally:
+        checkpoint.close()
+        store.close()
+        await close_async_clients()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", help="Directory (searched recursively) or zip archive of PDFs")
+    parser.add_argument("--department", default=None, help="Stored on every chunk, for filtering")
+    parser.add_argument("--documents-per-write", type=int, default=INGEST_BULK_DOCUMENTS_PER_WRITE)
+    parser.add_argument("--groups-in-flight", type=int, default=INGEST_BULK_GROUPS_IN_FLIGHT)
+    parser.add_argument(
+        "--extract-concurrency", type=int, default=0,
+        help="Documents being extracted at once, 0 = two per extraction process",
+    )
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file (default: derived from the path)")
+    parser.add_argument("--fresh", action="store_true", help="Ignore the checkpoint of earlier runs")
+    parser.add_argument("--json", default=None, help="Write the final report as JSON to this path")
+    args = parser.parse_args()
+
+    setup_logging()
+    report = asyncio.run(run(args))
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        directory = os.path.dirname(args.json)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
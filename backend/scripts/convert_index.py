@@ -0,0 +1,103 @@
+"""
+Convert a saved FAISS store to another index layout.
+
+    python -m scripts.convert_index --storage float16
+    python -m scripts.convert_index --index-type hnsw --storage int8 --pca-dimension 256
+    python -m scripts.convert_index --truncate-dimension 512
+
+Options not given on the command line come from the app settings
+(FAISS_INDEX_TYPE, FAISS_VECTOR_STORAGE, FAISS_PCA_DIMENSION, ...). Stop the
+API first: the script exits at once while a server process holds the
+store's write lock.
+
+Plain flat float32 stores are also migrated automatically by the server's
+background compaction once the settings name another layout; this script
+is needed for everything else and for ``--truncate-dimension``, after which
+EMBEDDING_DIMENSION and EMBEDDING_REQUEST_DIMENSIONS must both be set to
+the new size. Sharded stores are converted one shard at a time.
+"""
+import argparse
+import json
+import os
+import time
+
+import faiss
+
+from app.core.concurrency import StoreLockedError
+from app.core.config import EMBEDDING_DIMENSION, FAISS_INDEX_PATH
+from app.core.dependencies import get_index_options, open_faiss_store
+from app.services.index_factory import INDEX_TYPES, VECTOR_STORAGE, IndexOptions, describe
+from app.services.sharded_store import ShardedFaissStore, shard_paths
+
+
+def saved_dimension(index_path: str) -> int:
+    manifest_path = f"{shard_paths(index_path)[0]}.manifest"
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("dimension", EMBEDDING_DIMENSION)
+    return EMBEDDING_DIMENSION
+
+
+def target_options(args) -> IndexOptions:
+    options = get_index_options()
+    return IndexOptions(
+        index_type=args.index_type or options.index_type,
+        nlist=options.nlist,
+        nprobe=options.nprobe,
+        pq_m=options.pq_m,
+        pq_nbits=options.pq_nbits,
+        hnsw_m=options.hnsw_m,
+        ef_construction=options.ef_construction,
+        ef_search=options.ef_search,
+        storage=args.storage or options.storage,
+        pca_dimension=options.pca_dimension if args.pca_dimension is None else args.pca_dimension,
+    )
+
+
+def layout_of(store):
+    """Index layout, dimension and serialised size (summed over shards)."""
+    shards = store.shards() if isinstance(store, ShardedFaissStore) else [store]
+    layouts = sorted({describe(shard.index) for shard in shards})
+    size = sum(faiss.serialize_index(shard.index).nbytes for shard in shards)
+    return ", ".join(layouts), store.dimension, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--index-path", default=FAISS_INDEX_PATH)
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=None)
+    parser.add_argument("--storage", choices=VECTOR_STORAGE, default=None)
+    parser.add_argument("--pca-dimension", type=int, default=None, help="0 turns PCA off")
+    parser.add_argument(
+        "--truncate-dimension", type=int, default=None,
+        help="Keep the leading N components (text-embedding-3 models only)",
+    )
+    args = parser.parse_args()
+
+    options = target_options(args)
+    # Opened with plain flat options so loading never schedules a migration
+    try:
+        store = open_faiss_store(
+            args.index_path, dimension=saved_dimension(args.index_path), index_options=IndexOptions()
+        )
+    except StoreLockedError as e:
+        raise SystemExit(f"{e}; stop the API first")
+    before = layout_of(store)
+
+    start = time.perf_counter()
+    store.convert(options, dimension=args.truncate_dimension)
+    seconds = time.perf_counter() - start
+
+    after = layout_of(store)
+    for label, (layout, dimension, size) in (("before", before), ("after", after)):
+        print(f"{label:<7} {layout:<24} {dimension:>5} dims  {size / 1e6:10.1f} MB")
+    print(f"\nConverted {len(store)} vectors in {seconds:.1f}s")
+    if args.truncate_dimension:
+        print(
+            f"Set EMBEDDING_DIMENSION={store.dimension} and "
+            f"EMBEDDING_REQUEST_DIMENSIONS={store.dimension} before starting the API"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Split, merge or re-partition the shards of a saved FAISS store.
+
+    python -m scripts.rebalance_shards --shards 8
+    python -m scripts.rebalance_shards --partition time --max-vectors 500000
+    python -m scripts.rebalance_shards --shards 1
+
+An unsharded store is split into shards by the first command; every live
+chunk is copied into a new set of shards, committed by replacing the
+``.shards`` file, and the old files are deleted. Options not given on the
+command line come from FAISS_SHARDS, FAISS_SHARD_PARTITION and
+FAISS_SHARD_MAX_VECTORS, which should match the result before the API is
+restarted. Stop the API first: the script exits at once while a server
+process holds the store's write lock.
+"""
+import argparse
+import time
+
+from app.core.concurrency import StoreLockedError
+from app.core.config import (
+    BM25_B,
+    BM25_K1,
+    FAISS_COMPACT_THRESHOLD_BYTES,
+    FAISS_INDEX_PATH,
+    FAISS_SHARD_MAX_VECTORS,
+    FAISS_SHARD_PARTITION,
+    FAISS_SHARDS,
+    FAISS_TOMBSTONE_COMPACT_RATIO,
+    LEXICAL_INDEX_ENABLED,
+    SEARCH_FILTER_FIELDS,
+)
+from app.core.dependencies import get_index_options
+from app.services.sharded_store import PARTITIONS, ShardedFaissStore
+from scripts.convert_index import saved_dimension
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--index-path", default=FAISS_INDEX_PATH)
+    parser.add_argument("--shards", type=int, default=FAISS_SHARDS)
+    parser.add_argument("--partition", choices=PARTITIONS, default=FAISS_SHARD_PARTITION)
+    parser.add_argument("--max-vectors", type=int, default=FAISS_SHARD_MAX_VECTORS)
+    args = parser.parse_args()
+
+    try:
+        store = ShardedFaissStore(
+            dimension=saved_dimension(args.index_path),
+            use_cosine=True,
+            index_path=args.index_path,
+            num_shards=args.shards,
+            partition=args.partition,
+            shard_max_vectors=args.max_vectors,
+            compact_threshold_bytes=FAISS_COMPACT_THRESHOLD_BYTES,
+            index_options=get_index_options(),
+            tombstone_compact_ratio=FAISS_TOMBSTONE_COMPACT_RATIO,
+            filter_fields=SEARCH_FILTER_FIELDS,
+            lexical_index=LEXICAL_INDEX_ENABLED,
+            bm25_k1=BM25_K1,
+            bm25_b=BM25_B,
+        )
+    except StoreLockedError as e:
+        raise SystemExit(f"{e}; stop the API first")
+    before = [len(shard) for shard in store.shards()]
+
+    start = time.perf_counter()
+    store.rebalance(args.shards, args.partition)
+    seconds = time.perf_counter() - start
+
+    after = [len(shard) for shard in store.shards()]
+    print(f"before  {len(before):>4} shards  {before}")
+    print(f"after   {len(after):>4} shards  {after}")
+    print(f"\nMoved {sum(after)} chunks in {seconds:.1f}s ({store.partition} partitioning)")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import asyncio
+import os
+import socket
+from typing import List
+
+import numpy as np
+import pytest
+
+# Settings are read at import time; the tests only call the stub server below
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+DIMENSION = 8
+
+
+def vectors(count: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).random((count, DIMENSION), dtype=np.float32)
+
+
+def chunk_metadata(source: str, count: int, first_chunk_id: int = 0) -> list:
+    return [{"source": source, "chunk_id": first_chunk_id + i} for i in range(count)]
+
+
+@pytest.fixture
+def index_path(tmp_path) -> str:
+    return str(tmp_path / "faiss_index")
+
+
+@pytest.fixture
+def open_store(index_path):
+    """Open FaissStores at ``index_path``; every store opened is closed at teardown."""
+    from app.services.faiss_service import FaissStore
+
+    stores = []
+
+    def open_(**options):
+        options.setdefault("dimension", DIMENSION)
+        options.setdefault("index_path", index_path)
+        store = FaissStore(**options)
+        stores.append(store)
+        return store
+
+    yield open_
+    for store in stores:
+        store.close()
+
+
+# -------------------------
+# TOKENIZER
+# -------------------------
+class WordEncoding:
+    """One token per word: exact, predictable counts without tiktoken's BPE download."""
+    name = "words"
+
+    def encode_ordinary(self, text: str) -> List[str]:
+        return text.split()
+
+    encode = encode_ordinary
+
+    def encode_ordinary_batch(self, texts: List[str], **_) -> List[List[str]]:
+        return [text.split() for text in texts]
+
+    def decode(self, tokens: List[str]) -> str:
+        return " ".join(tokens)
+
+
+@pytest.fixture
+def word_tokenizer(monkeypatch) -> WordEncoding:
+    """Every model tokenizes with WordEncoding for the test."""
+    import tiktoken
+    from app.utils import tokenizer
+
+    encoding = WordEncoding()
+    monkeypatch.setattr(tiktoken, "encoding_for_model", lambda model: encoding)
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: encoding)
+    tokenizer.get_encoding.cache_clear()
+    tokenizer._token_counts.clear()
+    yield encoding
+    tokenizer.get_encoding.cache_clear()
+    tokenizer._token_counts.clear()
+
+
+# -------------------------
+# OPENAI STUB
+# -------------------------
+STUB_DIMENSION = 16
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def stub_server():
+    from benchmarks.stub_openai import StubOpenAI
+
+    stub = StubOpenAI(port=free_port(), dimension=STUB_DIMENSION, latency=0.05).start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def stub(stub_server, monkeypatch):
+    """The stub OpenAI server, fresh state, with the OpenAI clients pointed at it."""
+    from tenacity import wait_none
+
+    from app.services import embedding_service
+    from app.services.rate_limiter import RateLimiter
+    from benchmarks.stub_openai import RATE_LIMIT_HEADERS
+
+    stub_server.reset_counters()
+    stub_server.rate_limit_headers = dict(RATE_LIMIT_HEADERS)
+    monkeypatch.setenv("OPENAI_BASE_URL", stub_server.base_url)
+    monkeypatch.setattr(embedding_service, "EMBEDDING_CACHE_ENABLED", False)
+    monkeypatch.setattr(embedding_service, "_embedding_cache", None)
+    monkeypatch.setattr(embedding_service, "_rate_limiter", RateLimiter(6000, 10_000_000))
+    monkeypatch.setattr(embedding_service._embed_batch_async.retry, "wait", wait_none())
+    return stub_server
+
+
+def run_async(coro):
+    """``asyncio.run`` that also closes the pooled OpenAI client bound to its loop."""
+    from app.services.openai_client import close_async_clients
+
+    async def main():
+        try:
+            return await coro
+        finally:
+            await close_async_clients()
+
+    return asyncio.run(main())
+
+
+def api_client(*routers):
+    """TestClient over just ``routers``; the OpenAI client pool closes with it."""
+    from contextlib import asynccontextmanager
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.services.openai_client import close_async_clients
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        await close_async_clients()
+
+    app = FastAPI(lifespan=lifespan)
+    for router in routers:
+        app.include_router(router)
+    return TestClient(app)
+
+
+@pytest.fixture
+def serve_store(monkeypatch):
+    """Make ``store`` the process-wide store the API uses."""
+    from app.core import dependencies
+
+    def serve(store):
+        monkeypatch.setattr(dependencies, "_faiss_store", store)
+        return store
+
+    return serve
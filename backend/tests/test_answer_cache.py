@@ -0,0 +1,71 @@
+import numpy as np
+
+from app.services import answer_cache as answer_cache_module
+from app.services.answer_cache import AnswerCache
+from app.services.answer_service import RAGResponse
+from tests.conftest import DIMENSION, vectors
+
+CHUNKS = [("a.pdf", 0), ("b.pdf", 3)]
+
+
+def response(answer: str) -> RAGResponse:
+    return RAGResponse(answer, [0], "high", {"prompt": 1, "completion": 1, "total": 2}, "m")
+
+
+def paraphrase(vector: np.ndarray, seed: int = 1) -> np.ndarray:
+    """A vector a little off ``vector``, well above the 0.95 cosine threshold."""
+    return vector + 0.01 * np.random.default_rng(seed).standard_normal(DIMENSION).astype(np.float32)
+
+
+def test_paraphrase_over_the_same_chunks_hits():
+    cache = AnswerCache(DIMENSION)
+    question = vectors(1)[0]
+    cache.store(question, "How many vacation days?", CHUNKS, response("25"))
+
+    assert cache.lookup(paraphrase(question), CHUNKS).answer == "25"
+    # Same question, other context: the stored answer may not hold
+    assert cache.lookup(question, CHUNKS[:1]) is None
+    # Unrelated question over the same chunks
+    assert cache.lookup(-question, CHUNKS) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_invalidate_source_and_clear():
+    cache = AnswerCache(DIMENSION)
+    first, second = vectors(2)
+    cache.store(first, "q1", CHUNKS, response("1"))
+    cache.store(second, "q2", [("c.pdf", 0)], response("2"))
+
+    assert cache.invalidate_source("b.pdf") == 1
+    assert cache.lookup(first, CHUNKS) is None
+    assert cache.lookup(second, [("c.pdf", 0)]).answer == "2"
+
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+    assert cache.index.ntotal == 0
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = AnswerCache(DIMENSION, max_entries=2)
+    questions = vectors(3)
+    cache.store(questions[0], "q0", CHUNKS, response("0"))
+    cache.store(questions[1], "q1", CHUNKS, response("1"))
+    # Touch q0, so q1 is the least recently used when q2 arrives
+    assert cache.lookup(questions[0], CHUNKS) is not None
+    cache.store(questions[2], "q2", CHUNKS, response("2"))
+
+    assert cache.lookup(questions[1], CHUNKS) is None
+    assert cache.lookup(questions[0], CHUNKS).answer == "0"
+    assert cache.lookup(questions[2], CHUNKS).answer == "2"
+
+
+def test_entries_expire(monkeypatch):
+    cache = AnswerCache(DIMENSION, ttl_seconds=60)
+    question = vectors(1)[0]
+    cache.store(question, "q", CHUNKS, response("old"))
+
+    now = answer_cache_module.time.time()
+    monkeypatch.setattr(answer_cache_module.time, "time", lambda: now + 61)
+
+    assert cache.lookup(question, CHUNKS) is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,94 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.api import ask
+from app.core import dependencies
+from app.services.answer_cache import AnswerCache
+from benchmarks.stub_openai import ANSWER_WORDS, stub_embedding
+from tests.conftest import STUB_DIMENSION, api_client
+
+TEXTS = ["vacation policy allows twenty days", "expense reports are due monthly"]
+QUESTION = "How many vacation days are there?"
+
+
+@pytest.fixture
+def client(stub, word_tokenizer, open_store, serve_store, monkeypatch):
+    monkeypatch.setattr(dependencies, "_answer_cache", None)
+    monkeypatch.setattr(dependencies, "ANSWER_CACHE_ENABLED", False)
+    store = serve_store(open_store(dimension=STUB_DIMENSION))
+    store.add(
+        np.stack([stub_embedding(text, STUB_DIMENSION) for text in TEXTS]),
+        TEXTS,
+        [{"source": "a.pdf", "chunk_id": i, "page_start": 1, "page_end": 1} for i in range(2)],
+    )
+    with api_client(ask.router) as client:
+        yield client
+
+
+def stream(client, question: str = QUESTION) -> list:
+    """(event, data) pairs of an /ask/stream response."""
+    with client.stream("POST", "/ask/stream", json={"question": question}) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = "".join(response.iter_text())
+
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_tokens_stream_before_the_closing_done_event(client, stub):
+    events = stream(client)
+
+    names = [name for name, _ in events]
+    assert names == ["token"] * len(ANSWER_WORDS) + ["done"]
+    answer = "".join(data["content"] for name, data in events if name == "token")
+    assert answer == "".join(ANSWER_WORDS)
+
+    done = events[-1][1]
+    assert done["answer"] == answer
+    assert done["cached"] is False
+    # One citation per chunk sent as context, labelled as in the prompt
+    citations = done["citations"]
+    assert [citation["label"] for citation in citations] == ["Source 1", "Source 2"]
+    assert sorted(citation["chunk_id"] for citation in citations) == [0, 1]
+    assert all(citation["source"] == "a.pdf" and citation["page_end"] == 1 for citation in citations)
+    assert done["tokens_used"]["completion"] == len(ANSWER_WORDS)
+    assert stub.calls["chat"] == 1
+
+
+def test_cached_answer_is_sent_as_one_token(client, stub, monkeypatch):
+    monkeypatch.setattr(dependencies, "_answer_cache", AnswerCache(STUB_DIMENSION))
+
+    first = stream(client)
+    second = stream(client)
+
+    assert [name for name, _ in second] == ["token", "done"]
+    assert second[0][1]["content"] == first[-1][1]["answer"]
+    assert second[-1][1]["cached"] is True
+    assert stub.calls["chat"] == 1
+
+
+def test_failure_mid_stream_ends_with_an_error_event(client, monkeypatch):
+    async def failing(**_):
+        yield "The"
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(ask, "generate_answer_streaming", failing)
+
+    events = stream(client)
+
+    assert events[0] == ("token", {"content": "The"})
+    assert events[-1] == ("error", {"error_code": "ASK_FAILED", "message": "Failed to generate answer"})
+    assert "done" not in [name for name, _ in events]
+
+
+def test_empty_question_is_rejected_before_streaming(client):
+    response = client.post("/ask/stream", json={"question": "  "})
+
+    assert response.status_code == 400
+    assert response.json()["detail"]["error_code"] == "EMPTY_QUESTION"
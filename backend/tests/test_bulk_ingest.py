@@ -0,0 +1,123 @@
+import os
+import zipfile
+
+import pytest
+
+from app.services import bulk_ingest
+from app.services.bulk_ingest import BulkIngest, Checkpoint, iter_documents
+from app.services.document_registry import DocumentRegistry
+from benchmarks.synthetic_pdf import synthetic_pages, write_pdf
+from tests.conftest import STUB_DIMENSION, run_async
+
+SOURCES = [f"batch/doc{i}.pdf" for i in range(5)]
+
+
+@pytest.fixture
+def corpus(tmp_path) -> str:
+    """Five small PDFs plus one that cannot be parsed."""
+    root = tmp_path / "corpus"
+    for i, source in enumerate(SOURCES):
+        os.makedirs(root / os.path.dirname(source), exist_ok=True)
+        write_pdf(str(root / source), synthetic_pages(2, seed=i))
+    (root / "broken.pdf").write_bytes(b"not a pdf")
+    (root / "notes.txt").write_text("ignored")
+    return str(root)
+
+
+@pytest.fixture
+def bulk(stub, word_tokenizer, open_store, tmp_path, monkeypatch):
+    # Extract on a thread: the tokenizer patch does not reach a process pool
+    monkeypatch.setattr(bulk_ingest, "get_extraction_pool", lambda: None)
+    store = open_store(dimension=STUB_DIMENSION)
+    registry = DocumentRegistry(str(tmp_path / "documents.sqlite3"))
+
+    def bulk_(**options) -> BulkIngest:
+        options.setdefault("registry", registry)
+        return BulkIngest(
+            store, documents_per_write=2, groups_in_flight=1, extract_concurrency=1, **options
+        )
+
+    bulk_.store = store
+    return bulk_
+
+
+def stored_sources(store) -> dict:
+    """{source: chunk count} of the live chunks."""
+    counts = {}
+    for _, _, metadata in store.iter_live():
+        for meta in metadata:
+            counts[meta["source"]] = counts.get(meta["source"], 0) + 1
+    return counts
+
+
+def test_indexes_every_readable_pdf_and_reports_failures(bulk, corpus, tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "run.jsonl"))
+    status = run_async(bulk(checkpoint=checkpoint).run(corpus))
+
+    assert status["state"] == "completed"
+    assert status["documents_indexed"] == 5 and status["documents_failed"] == 1
+    assert list(status["errors"]) == ["broken.pdf"]
+    assert sorted(stored_sources(bulk.store)) == SOURCES
+    assert status["chunks_indexed"] == len(bulk.store)
+    # A completed run forgets its checkpoint
+    assert not os.path.exists(checkpoint.path)
+
+    # Everything is unchanged the second time
+    status = run_async(bulk().run(corpus))
+    assert status["documents_unchanged"] == 5 and status["documents_indexed"] == 0
+
+
+def test_interrupted_run_resumes_from_its_checkpoint(bulk, corpus, tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    commits = []
+
+    def crash_after_first_write(sources):
+        commits.append(sources)
+        raise RuntimeError("worker killed")
+
+    with pytest.raises(RuntimeError):
+        run_async(bulk(checkpoint=Checkpoint(path), on_commit=crash_after_first_write).run(corpus))
+
+    checkpoint = Checkpoint(path)
+    assert checkpoint.done == set(commits[0]) == set(SOURCES[:2])
+    first = stored_sources(bulk.store)
+
+    status = run_async(bulk(checkpoint=checkpoint).run(corpus))
+
+    # Only the rest was read; nothing was indexed twice
+    assert status["documents_indexed"] == 3 and status["documents_unchanged"] == 0
+    counts = stored_sources(bulk.store)
+    assert sorted(counts) == SOURCES
+    assert {source: counts[source] for source in first} == first
+    assert not os.path.exists(path)
+
+
+def test_checkpoint_survives_a_torn_last_line(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    checkpoint = Checkpoint(path)
+    checkpoint.record([{"source": "a.pdf", "chunks": 3}])
+    checkpoint.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"source": "b.p')
+
+    checkpoint = Checkpoint(path)
+    assert checkpoint.done == {"a.pdf"}
+    checkpoint.record([{"source": "c.pdf", "chunks": 1}])
+    checkpoint.close()
+    assert Checkpoint(path).done == {"a.pdf", "c.pdf"}
+
+
+def test_archive_members_are_read_in_order_and_skipped_when_done(tmp_path):
+    archive = str(tmp_path / "docs.zip")
+    with zipfile.ZipFile(archive, "w") as f:
+        for name in ["b.pdf", "a/c.PDF", "__MACOSX/a/._c.PDF", "readme.md", "a.pdf"]:
+            f.writestr(name, b"%PDF")
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+
+    found = [(source, temporary) for source, _, temporary in iter_documents(archive, str(work_dir))]
+    assert found == [("a.pdf", True), ("a/c.PDF", True), ("b.pdf", True)]
+
+    assert [source for source, _, _ in iter_documents(archive, str(work_dir), skip={"a.pdf"})] == [
+        "a/c.PDF", "b.pdf"
+    ]
@@ -0,0 +1,28 @@
+import sqlite3
+
+from app.services.document_registry import DocumentRegistry
+
+
+def test_registry_from_before_the_high_water_mark(tmp_path):
+    path = str(tmp_path / "documents.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE documents (source TEXT PRIMARY KEY, content_hash TEXT NOT NULL,"
+        " metadata TEXT, chunk_count INTEGER NOT NULL, updated_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO documents VALUES ('a.pdf', 'h', NULL, 2, 0)")
+    conn.execute(
+        "CREATE TABLE chunks (source TEXT NOT NULL, chunk_id INTEGER NOT NULL,"
+        " chunk_hash TEXT NOT NULL, PRIMARY KEY (source, chunk_id)) WITHOUT ROWID"
+    )
+    conn.executemany("INSERT INTO chunks VALUES ('a.pdf', ?, ?)", [(0, "x"), (5, "y")])
+    conn.commit()
+    conn.close()
+
+    registry = DocumentRegistry(path)
+    # Falls back to one past the highest id held
+    assert registry.get("a.pdf")["next_chunk_id"] == 6
+
+    registry.put("a.pdf", "h2", None, {0: "x"}, next_chunk_id=6)
+    assert registry.get("a.pdf")["next_chunk_id"] == 6
+    assert DocumentRegistry(path).get("a.pdf")["chunks"] == {0: "x"}
@@ -0,0 +1,59 @@
+import numpy as np
+
+from app.services.embedding_cache import EmbeddingCache, cache_key
+from tests.conftest import vectors
+
+
+def disk_rows(cache: EmbeddingCache) -> int:
+    return cache._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+def test_keys_ignore_whitespace_and_model_separates_entries(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    vector = vectors(1)[0]
+    cache.put_many("m1", ["hello   world"], [vector])
+
+    found = cache.get_many("m1", ["hello world", " hello\nworld ", "other"])
+    np.testing.assert_array_equal(found[0], vector)
+    np.testing.assert_array_equal(found[1], vector)
+    assert found[2] is None
+    assert cache.get_many("m2", ["hello world"]) == [None]
+
+
+def test_disk_tier_survives_reopen(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path, memory_items=1)
+    batch = vectors(3)
+    cache.put_many("m", ["a", "b", "c"], batch)
+    # Only "c" is still in memory; the others come back from disk
+    assert len(cache._memory) == 1
+
+    reopened = EmbeddingCache(path)
+    assert reopened.stats()["disk_items"] == 3
+    found = reopened.get_many("m", ["a", "b", "c"])
+    np.testing.assert_array_equal(np.stack(found), batch)
+    assert reopened.stats()["disk_hits"] == 3
+
+
+def test_disk_count_is_kept_without_rescanning(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    cache.put_many("m", ["a", "b"], vectors(2))
+    # "a" again, twice in one batch, and one new text
+    cache.put_many("m", ["a", "a", "c"], vectors(3, seed=1))
+
+    assert cache.stats()["disk_items"] == 3 == disk_rows(cache)
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), memory_items=1, disk_items=10)
+    for i in range(10):
+        cache.put_many("m", [f"text {i}"], vectors(1, seed=i))
+    # Make "text 0" the most recently used row on disk
+    cache._conn.execute(
+        "UPDATE embeddings SET last_used = last_used + 100 WHERE key = ?", (cache_key("m", "text 0"),)
+    )
+
+    cache.put_many("m", ["text 10"], vectors(1, seed=10))
+
+    assert cache.stats()["disk_items"] == 9 == disk_rows(cache)
+    assert cache.get_many("m", ["text 0"])[0] is not None
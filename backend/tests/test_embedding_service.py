@@ -0,0 +1,122 @@
+import asyncio
+import functools
+import time
+
+import numpy as np
+import openai
+import pytest
+
+from app.services import embedding_service
+from app.services.openai_client import close_async_clients
+from benchmarks.stub_openai import stub_embedding
+from tests.conftest import STUB_DIMENSION, run_async
+
+
+@pytest.fixture
+def stub(stub, monkeypatch):
+    # One token per word and small batches: packing is predictable
+    monkeypatch.setattr(
+        embedding_service, "count_tokens_batch", lambda texts, model: [len(t.split()) for t in texts]
+    )
+    monkeypatch.setattr(
+        embedding_service, "plan_batches", functools.partial(embedding_service.plan_batches, max_tokens=6)
+    )
+    return stub
+
+
+def embed(texts, **options) -> np.ndarray:
+    return run_async(embedding_service.embed_texts_async(texts, **options))
+
+
+def expected(texts) -> np.ndarray:
+    return np.stack([stub_embedding(text, STUB_DIMENSION) for text in texts])
+
+
+def test_rows_follow_input_order_across_batches(stub):
+    texts = [" ".join(f"w{i}" for _ in range(1 + i % 4)) for i in range(20)]
+
+    out = embed(texts, max_concurrency=4)
+
+    assert stub.calls["embeddings"] == len(embedding_service.plan_batches(texts, "m"))
+    assert stub.calls["embeddings"] > 1
+    assert out.dtype == np.float32 and out.flags["C_CONTIGUOUS"]
+    np.testing.assert_allclose(out, expected(texts), rtol=1e-6)
+
+
+def test_failed_batch_is_retried_alone(stub):
+    texts = [f"alpha {i} beta gamma" for i in range(3)]
+    stub.fail_next(500)
+
+    out = embed(texts, max_concurrency=1)
+
+    # Three batches of one text, one of them sent twice
+    assert stub.calls["embeddings"] == 4
+    np.testing.assert_allclose(out, expected(texts), rtol=1e-6)
+
+
+def test_batch_out_of_retries_cancels_the_others(stub):
+    texts = [f"alpha {i} beta gamma" for i in range(5)]
+    stub.fail_next(500, times=embedding_service.EMBEDDING_MAX_RETRIES)
+
+    async def main():
+        try:
+            with pytest.raises(openai.InternalServerError):
+                await embedding_service.embed_texts_async(texts, max_concurrency=1)
+            # As in the server, the event loop keeps running after the failure
+            await asyncio.sleep(0.3)
+        finally:
+            await close_async_clients()
+
+    asyncio.run(main())
+
+    # The batches queued behind the failing one were never sent
+    assert stub.calls["embeddings"] == embedding_service.EMBEDDING_MAX_RETRIES
+
+
+def test_rate_limiter_follows_response_headers(stub):
+    stub.rate_limit_headers = {
+        "x-ratelimit-limit-requests": "500",
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-reset-requests": "300ms",
+        "x-ratelimit-limit-tokens": "60000",
+        "x-ratelimit-remaining-tokens": "100",
+        "x-ratelimit-reset-tokens": "1s",
+    }
+    embed(["one two three"])
+
+    limiter = embedding_service._rate_limiter
+    assert limiter.requests.capacity == 500
+    assert limiter.tokens.capacity == 60000
+    assert limiter.tokens.level <= 101
+
+    # No requests left until the advertised reset
+    started = time.monotonic()
+    embed(["four five six"])
+    assert time.monotonic() - started >= 0.25
+
+
+def test_rate_limit_error_pauses_for_retry_after(stub):
+    stub.fail_next(429, headers={"retry-after": "0.3"})
+
+    started = time.monotonic()
+    out = embed(["one two three"])
+
+    assert time.monotonic() - started >= 0.25
+    assert stub.calls["embeddings"] == 2
+    np.testing.assert_allclose(out, expected(["one two three"]), rtol=1e-6)
+
+
+def test_cache_key_is_normalized_but_the_text_sent_is_not(stub, monkeypatch, tmp_path):
+    from app.services.embedding_cache import EmbeddingCache
+
+    monkeypatch.setattr(embedding_service, "_embedding_cache", EmbeddingCache(str(tmp_path / "c.sqlite3")))
+    texts = ["tab\tseparated  words", "one two"]
+
+    out = embed(texts)
+    # The stub embeds the exact input it receives
+    np.testing.assert_allclose(out, expected(texts), rtol=1e-6)
+    assert stub.calls["embeddings"] == 1
+
+    # Served from the cache under the normalized key
+    np.testing.assert_allclose(embed(["tab separated words"]), expected(texts[:1]), rtol=1e-6)
+    assert stub.calls["embeddings"] == 1
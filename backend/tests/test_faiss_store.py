@@ -0,0 +1,316 @@
+import json
+import os
+import shutil
+import threading
+
+import pytest
+
+from app.services.faiss_service import FaissStore, _read_log, _read_manifest
+from tests.conftest import DIMENSION, chunk_metadata, vectors
+
+LEGACY_STORE = os.path.join(os.path.dirname(__file__), "..", "data", "faiss_index")
+
+
+def sources(store: FaissStore) -> dict:
+    """{source: sorted chunk_ids} of every live chunk."""
+    found = {}
+    for _, _, metadata in store.iter_live():
+        for meta in metadata:
+            found.setdefault(meta["source"], []).append(meta["chunk_id"])
+    return {source: sorted(ids) for source, ids in found.items()}
+
+
+# -------------------------
+# ADD / REMOVE / RELOAD
+# -------------------------
+def test_add_remove_and_reload(open_store):
+    store = open_store()
+    store.add(vectors(3, seed=1), ["a0", "a1", "a2"], chunk_metadata("a.pdf", 3))
+    store.add(vectors(2, seed=2), ["b0", "b1"], chunk_metadata("b.pdf", 2))
+    assert store.remove("a.pdf") == 3
+    assert len(store) == 2
+    store.close()
+
+    reopened = open_store()
+    assert len(reopened) == 2
+    assert sources(reopened) == {"b.pdf": [0, 1]}
+    text, _, metadata = reopened.search(vectors(2, seed=2)[1], k=1)[0]
+    assert (text, metadata["source"], metadata["chunk_id"]) == ("b1", "b.pdf", 1)
+
+
+def test_replace_and_update_survive_reload(open_store):
+    store = open_store()
+    store.add(vectors(3, seed=1), ["a0", "a1", "a2"], chunk_metadata("a.pdf", 3))
+    store.replace("a.pdf", vectors(2, seed=3), ["new0", "new1"], chunk_metadata("a.pdf", 2, 10))
+    store.update("a.pdf", [10], vectors(1, seed=4), ["new2"], chunk_metadata("a.pdf", 1, 12))
+    store.close()
+
+    reopened = open_store()
+    assert sources(reopened) == {"a.pdf": [11, 12]}
+    assert sorted(reopened.chunk_ids("a.pdf")) == [11, 12]
+
+
+def test_add_only_appends_to_the_log(open_store, index_path):
+    store = open_store()
+    store.add(vectors(2), ["x", "y"], chunk_metadata("a.pdf", 2))
+
+    assert not os.path.exists(f"{index_path}.manifest")
+    records = list(_read_log(f"{index_path}.log"))
+    assert [record["seq"] for record in records] == [1]
+    assert records[0]["texts"] == ["x", "y"]
+
+
+# -------------------------
+# SEARCH
+# -------------------------
+def test_search_batch_matches_single_searches(open_store):
+    store = open_store()
+    store.add(vectors(20, seed=1), [f"a{i}" for i in range(20)], chunk_metadata("a.pdf", 20))
+    store.add(vectors(20, seed=2), [f"b{i}" for i in range(20)], chunk_metadata("b.pdf", 20))
+    store.remove("a.pdf")
+    queries = vectors(6, seed=3)
+
+    batch = store.search_batch(queries, k=4)
+
+    assert len(batch) == 6
+    for query, results in zip(queries, batch):
+        assert results == store.search(query, k=4)
+        assert len(results) == 4
+        assert all(metadata["source"] == "b.pdf" for _, _, metadata in results)
+    scores = [score for _, score, _ in batch[0]]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_search_batch_applies_filters_to_every_query(open_store):
+    store = open_store()
+    store.add(vectors(5, seed=1), [f"a{i}" for i in range(5)], chunk_metadata("a.pdf", 5))
+    store.add(vectors(5, seed=2), [f"b{i}" for i in range(5)], chunk_metadata("b.pdf", 5))
+
+    batch = store.search_batch(vectors(5, seed=1), k=10, filters={"source": "a.pdf"})
+
+    assert [sorted(text for text, _, _ in results) for results in batch] == [
+        [f"a{i}" for i in range(5)]
+    ] * 5
+    assert store.search_batch(vectors(2), k=3, filters={"source": "c.pdf"}) == [[], []]
+
+
+# -------------------------
+# CRASH CONSISTENCY
+# -------------------------
+def test_replay_drops_a_torn_log_tail(open_store, index_path):
+    store = open_store()
+    store.add(vectors(2, seed=1), ["a0", "a1"], chunk_metadata("a.pdf", 2))
+    size_after_first = os.path.getsize(f"{index_path}.log")
+    store.add(vectors(2, seed=2), ["b0", "b1"], chunk_metadata("b.pdf", 2))
+    store.close()
+
+    # Crash in the middle of appending the second record
+    with open(f"{index_path}.log", "r+b") as f:
+        f.truncate(size_after_first + 10)
+
+    reopened = open_store()
+    assert sources(reopened) == {"a.pdf": [0, 1]}
+    assert os.path.getsize(f"{index_path}.log") == size_after_first
+
+    # New records follow the last complete one
+    reopened.add(vectors(1, seed=3), ["c0"], chunk_metadata("c.pdf", 1))
+    reopened.close()
+    assert sources(open_store()) == {"a.pdf": [0, 1], "c.pdf": [0]}
+
+
+def test_replay_ignores_a_corrupt_log_tail(open_store, index_path):
+    store = open_store()
+    store.add(vectors(2), ["a0", "a1"], chunk_metadata("a.pdf", 2))
+    store.close()
+
+    with open(f"{index_path}.log", "ab") as f:
+        f.write(b"FLOG" + os.urandom(40))
+
+    assert sources(open_store()) == {"a.pdf": [0, 1]}
+
+
+def test_replay_skips_records_folded_into_the_base(open_store, index_path):
+    store = open_store()
+    store.add(vectors(2, seed=1), ["a0", "a1"], chunk_metadata("a.pdf", 2))
+    store.compact()
+    store.add(vectors(1, seed=2), ["b0"], chunk_metadata("b.pdf", 1))
+    store.close()
+
+    manifest = _read_manifest(index_path)
+    assert manifest["generation"] == 1 and manifest["seq"] == 1
+    assert [record["seq"] for record in _read_log(f"{index_path}.log")] == [2]
+
+    reopened = open_store()
+    assert len(reopened) == 3
+    assert reopened.seq == 2
+    assert sources(reopened) == {"a.pdf": [0, 1], "b.pdf": [0]}
+
+
+def test_uncommitted_generation_files_are_ignored(open_store, index_path):
+    store = open_store()
+    store.add(vectors(2), ["a0", "a1"], chunk_metadata("a.pdf", 2))
+    store.compact()
+    store.add(vectors(1, seed=2), ["b0"], chunk_metadata("b.pdf", 1))
+    store.close()
+
+    # A compaction that died before replacing the manifest
+    directory = os.path.dirname(index_path)
+    with open(os.path.join(directory, "faiss_index.2.index"), "wb") as f:
+        f.write(b"partial")
+
+    reopened = open_store()
+    assert reopened.generation == 1
+    assert sources(reopened) == {"a.pdf": [0, 1], "b.pdf": [0]}
+
+
+# -------------------------
+# COMPACTION
+# -------------------------
+def test_compaction_racing_writers_loses_nothing(open_store):
+    # A small threshold makes the store also compact in the background
+    store = open_store(compact_threshold_bytes=4096)
+    writers, batches = 4, 25
+    errors = []
+
+    def write(writer: int):
+        try:
+            for batch in range(batches):
+                source = f"w{writer}-{batch}.pdf"
+                texts = [f"{source}#{i}" for i in range(3)]
+                store.add(vectors(3, seed=writer * 1000 + batch), texts, chunk_metadata(source, 3))
+        except Exception as e:  # surfaced below
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        store.compact()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+    expected = {f"w{w}-{b}.pdf": [0, 1, 2] for w in range(writers) for b in range(batches)}
+    assert sources(store) == expected
+    assert store.generation > 0
+    store.close()
+
+    reopened = open_store()
+    assert len(reopened) == writers * batches * 3
+    assert sources(reopened) == expected
+    for _, texts, metadata in reopened.iter_live():
+        for text, meta in zip(texts, metadata):
+            assert text == f"{meta['source']}#{meta['chunk_id']}"
+
+
+def test_compaction_purges_tombstones(open_store, index_path):
+    store = open_store(tombstone_compact_ratio=0.0)
+    store.add(vectors(4), ["a0", "a1", "a2", "a3"], chunk_metadata("a.pdf", 4))
+    store.add(vectors(2, seed=2), ["b0", "b1"], chunk_metadata("b.pdf", 2))
+    store.remove("a.pdf")
+    store.compact()
+
+    assert store.index.ntotal == 2
+    assert _read_manifest(index_path)["tombstones"] == []
+    store.close()
+    assert sources(open_store()) == {"b.pdf": [0, 1]}
+
+
+def chunk_store_bytes(store: FaissStore) -> int:
+    directory = store.chunks.directory
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+def test_compaction_drops_removed_chunk_rows(open_store, index_path):
+    store = open_store()
+    store.add(vectors(6, seed=1), [f"a{i} " * 200 for i in range(6)], chunk_metadata("a.pdf", 6))
+    store.add(vectors(2, seed=2), ["b0", "b1"], chunk_metadata("b.pdf", 2))
+    store.compact()
+    old_directory, old_bytes = store.chunks.directory, chunk_store_bytes(store)
+
+    store.remove("a.pdf")
+    store.compact()
+
+    assert len(store.chunks) == 2
+    assert chunk_store_bytes(store) < old_bytes / 10
+    assert not os.path.exists(old_directory)
+    assert _read_manifest(index_path)["chunk_dir"] == "faiss_index.2.chunks"
+
+    # Ids of dropped rows are not handed out again
+    store.add(vectors(1, seed=3), ["c0"], chunk_metadata("c.pdf", 1))
+    assert store.chunks.ids().tolist() == [6, 7, 8]
+    store.close()
+
+    reopened = open_store()
+    assert sources(reopened) == {"b.pdf": [0, 1], "c.pdf": [0]}
+    text, _, metadata = reopened.search(vectors(2, seed=2)[1], k=1)[0]
+    assert (text, metadata["source"]) == ("b1", "b.pdf")
+    assert reopened.search(vectors(1, seed=3)[0], k=1)[0][0] == "c0"
+
+
+def test_chunk_store_from_before_the_id_column(open_store, index_path):
+    store = open_store()
+    store.add(vectors(2, seed=1), ["a0", "a1"], chunk_metadata("a.pdf", 2))
+    store.compact()
+    store.close()
+
+    # Written before rows were addressed by id: the row number is the id
+    os.remove(f"{index_path}.chunks/id.col")
+    manifest = _read_manifest(index_path)
+    del manifest["chunks"]["next_id"]
+    with open(f"{index_path}.manifest", "w") as f:
+        json.dump(manifest, f)
+
+    reopened = open_store()
+    assert sources(reopened) == {"a.pdf": [0, 1]}
+    reopened.add(vectors(1, seed=2), ["b0"], chunk_metadata("b.pdf", 1))
+    reopened.compact()
+    reopened.close()
+
+    again = open_store()
+    assert again.chunks.ids().tolist() == [0, 1, 2]
+    assert again.search(vectors(2, seed=1)[1], k=1)[0][0] == "a1"
+    assert again.search(vectors(1, seed=2)[0], k=1)[0][0] == "b0"
+
+
+# -------------------------
+# LEGACY MIGRATION
+# -------------------------
+@pytest.mark.skipif(
+    not os.path.exists(f"{LEGACY_STORE}.meta"), reason="committed legacy store not present"
+)
+def test_migrates_the_committed_pickle_store(open_store, index_path):
+    import faiss
+
+    for suffix in (".index", ".meta"):
+        shutil.copy(f"{LEGACY_STORE}{suffix}", f"{index_path}{suffix}")
+    legacy = faiss.read_index(f"{index_path}.index")
+    probe = legacy.reconstruct(5).reshape(1, -1)
+
+    store = open_store(dimension=legacy.d)
+    assert len(store) == legacy.ntotal
+    text, score, metadata = store.search(probe[0], k=1)[0]
+    assert score == pytest.approx(1.0, abs=1e-4)
+    assert metadata["chunk_id"] == 5
+    migrated = sources(store)
+    # Loading scheduled the compaction that rewrites the store; close waits for it
+    store.close()
+
+    assert _read_manifest(index_path) is not None
+    assert not os.path.exists(f"{index_path}.index")
+    assert not os.path.exists(f"{index_path}.meta")
+
+    reopened = open_store(dimension=legacy.d)
+    assert len(reopened) == legacy.ntotal
+    assert reopened.search(probe[0], k=1)[0][0] == text
+    assert sources(reopened) == migrated
+
+
+def test_rejects_a_store_saved_with_another_dimension(open_store):
+    store = open_store()
+    store.add(vectors(1), ["a0"], chunk_metadata("a.pdf", 1))
+    store.compact()
+    store.close()
+
+    with pytest.raises(ValueError):
+        open_store(dimension=DIMENSION * 2)
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from app.services.index_factory import IndexOptions, describe, needs_migration
+from tests.conftest import DIMENSION, chunk_metadata
+
+# Small enough to train in a test: 4 lists, 16 PQ centroids per sub-vector
+MODES = {
+    "ivf_flat/float32": IndexOptions("ivf_flat", nlist=4, nprobe=4),
+    "ivf_flat/float16": IndexOptions("ivf_flat", nlist=4, nprobe=4, storage="float16"),
+    "ivf_pq/float32": IndexOptions("ivf_pq", nlist=4, nprobe=4, pq_m=4, pq_nbits=4),
+    "hnsw/float32": IndexOptions("hnsw", hnsw_m=8),
+    "hnsw/int8": IndexOptions("hnsw", hnsw_m=8, storage="int8"),
+    "flat/float16": IndexOptions(storage="float16"),
+}
+
+
+def unit_vectors(count: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((count, DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("label", MODES)
+def test_index_mode_is_trained_searched_and_reloaded(open_store, label):
+    options = MODES[label]
+    count = max(options.min_training_size(), 200)
+    data = unit_vectors(count)
+    texts = [f"t{i}" for i in range(count)]
+
+    store = open_store(index_options=options)
+    store.add(data, texts, chunk_metadata("a.pdf", count))
+    # Layouts that need training start flat and migrate on compaction
+    store.compact()
+    assert describe(store.index) == label
+    assert not needs_migration(store.index, options)
+
+    queries = range(0, count, count // 20)
+    found = [texts[i] in [text for text, _, _ in store.search(data[i], k=5)] for i in queries]
+    assert sum(found) >= 0.9 * len(found)
+
+    store.remove("a.pdf")
+    store.add(data[:3], ["x0", "x1", "x2"], chunk_metadata("b.pdf", 3))
+    store.compact()
+    store.close()
+
+    reopened = open_store(index_options=options)
+    assert describe(reopened.index) == label
+    assert len(reopened) == 3
+    assert {text for text, _, _ in reopened.search(data[0], k=3)} == {"x0", "x1", "x2"}
+
+
+def test_untrained_layout_serves_flat_until_enough_vectors(open_store):
+    options = MODES["ivf_flat/float32"]
+    store = open_store(index_options=options)
+    store.add(unit_vectors(10), [f"t{i}" for i in range(10)], chunk_metadata("a.pdf", 10))
+
+    assert describe(store.index) == "flat/float32"
+    assert store.search(unit_vectors(10)[4], k=1)[0][0] == "t4"
+
+
+def test_convert_cuts_dimensions_and_changes_layout(open_store):
+    data = unit_vectors(50)
+    store = open_store()
+    store.add(data, [f"t{i}" for i in range(50)], chunk_metadata("a.pdf", 50))
+    store.remove("a.pdf")
+    store.add(data[:20], [f"t{i}" for i in range(20)], chunk_metadata("b.pdf", 20))
+
+    store.convert(IndexOptions("hnsw", hnsw_m=8), dimension=DIMENSION // 2)
+
+    assert describe(store.index) == "hnsw/float32"
+    assert store.index.d == DIMENSION // 2 and len(store) == 20
+    assert store.search(data[7][: DIMENSION // 2], k=1)[0][0] == "t7"
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        dict(index_type="ivf"),
+        dict(storage="bfloat16"),
+        dict(index_type="ivf_pq", storage="float16"),
+    ],
+)
+def test_rejects_invalid_index_options(options):
+    with pytest.raises(ValueError):
+        IndexOptions(**options)
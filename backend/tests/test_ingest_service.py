@@ -0,0 +1,113 @@
+import time
+
+import openai
+import pytest
+
+from app.services import ingest_service
+from app.services.document_registry import DocumentRegistry
+from app.services.ingest_service import DocumentRevision, ingest_document
+from benchmarks.synthetic_pdf import synthetic_pages, write_pdf
+from tests.conftest import STUB_DIMENSION, run_async
+
+SOURCE = "handbook.pdf"
+
+
+@pytest.fixture
+def registry(tmp_path) -> DocumentRegistry:
+    return DocumentRegistry(str(tmp_path / "documents.sqlite3"))
+
+
+@pytest.fixture
+def slow_pdf(monkeypatch):
+    """A 40-page "PDF" that takes a while to extract; records the pages read."""
+    pages_read = []
+
+    def iter_pages(file_path):
+        for number in range(1, 41):
+            time.sleep(0.02)
+            pages_read.append(number)
+            yield number, f"Sentence {number} of the handbook. " * 40
+
+    monkeypatch.setattr(ingest_service, "iter_pdf_pages", iter_pages)
+    monkeypatch.setattr(ingest_service, "pdf_page_count", lambda file_path: 40)
+    return pages_read
+
+
+def test_failed_embedding_stops_extraction(word_tokenizer, stub, open_store, slow_pdf, monkeypatch):
+    monkeypatch.setattr(ingest_service, "INGEST_EMBED_BATCH_CHUNKS", 1)
+    stub.fail_next(400)
+    store = open_store(dimension=STUB_DIMENSION)
+
+    with pytest.raises(openai.BadRequestError):
+        run_async(ingest_document("handbook.pdf", "handbook.pdf", store))
+
+    # The job failed long before the last page, and the extraction thread is done
+    pages_read = len(slow_pdf)
+    assert pages_read < 40, pages_read
+    time.sleep(0.2)
+    assert len(slow_pdf) == pages_read
+    assert len(store) == 0
+
+
+# -------------------------
+# INCREMENTAL RE-INGEST
+# -------------------------
+def revise(revision: DocumentRevision, texts) -> list:
+    """Assign ids to chunks with these texts (hash = text); the ids given."""
+    chunks = [{"chunk_hash": text} for text in texts]
+    for chunk in chunks:
+        revision.assign(chunk)
+    return [chunk["chunk_id"] for chunk in chunks]
+
+
+def test_new_chunks_never_reuse_a_retired_id(registry):
+    first = DocumentRevision()
+    assert revise(first, "abcd") == [0, 1, 2, 3]
+    registry.put(SOURCE, "v1", None, first.chunks, first.next_id)
+
+    previous = registry.get(SOURCE)
+    second = DocumentRevision(previous["chunks"], previous["next_chunk_id"])
+    assert revise(second, "ab") == [0, 1]
+    assert sorted(second.retired()) == [2, 3]
+    registry.put(SOURCE, "v2", None, second.chunks, second.next_id)
+
+    # 2 and 3 named other texts before; "e" gets an id above them
+    previous = registry.get(SOURCE)
+    assert previous["next_chunk_id"] == 4
+    third = DocumentRevision(previous["chunks"], previous["next_chunk_id"])
+    assert revise(third, "abe") == [0, 1, 4]
+
+
+def test_revised_pdf_embeds_only_changed_chunks(word_tokenizer, stub, open_store, registry, tmp_path):
+    path = str(tmp_path / SOURCE)
+    pages = synthetic_pages(6)
+    write_pdf(path, pages)
+    store = open_store(dimension=STUB_DIMENSION)
+
+    def ingest() -> int:
+        return run_async(ingest_document(path, SOURCE, store, registry=registry))
+
+    indexed = ingest()
+    first_ids = sorted(store.chunk_ids(SOURCE))
+    assert indexed == len(first_ids) > 1
+
+    # Unchanged file: skipped before extraction
+    calls = stub.calls["embeddings"]
+    assert ingest() == 0
+    assert stub.calls["embeddings"] == calls
+
+    pages[-1] = synthetic_pages(1, seed=7)[0]
+    write_pdf(path, pages)
+    changed = ingest()
+
+    ids = sorted(store.chunk_ids(SOURCE))
+    kept = set(ids) & set(first_ids)
+    assert 0 < changed < indexed
+    assert len(kept) == len(ids) - changed
+    assert min(set(ids) - kept) > max(first_ids)
+    assert sorted(registry.get(SOURCE)["chunks"]) == ids
+
+    # Exactly the chunks reaching into the revised page were replaced
+    for _, _, metadata in store.iter_live():
+        for meta in metadata:
+            assert (meta["chunk_id"] in kept) == (meta["page_end"] < 6)
@@ -0,0 +1,104 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.services.embedding_service import embed_texts_async
+from app.services.lexical_index import LexicalIndex, analyze, tokenize
+from app.services.retrieval import reciprocal_rank_fusion, retrieve
+from benchmarks.stub_openai import stub_embedding
+from tests.conftest import STUB_DIMENSION, run_async
+
+CORPUS = ["apple banana", "apple apple cherry", "banana", "cherry pie recipe"]
+
+
+def build(texts=CORPUS) -> LexicalIndex:
+    index = LexicalIndex()
+    index.add(np.arange(len(texts)), analyze(texts))
+    return index
+
+
+def bm25(tf: int, length: int, df: int, n_docs: int, avg_length: float, k1=1.2, b=0.75) -> float:
+    idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+    return idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))
+
+
+def test_codes_are_indexed_whole_and_by_their_parts():
+    assert tokenize("See POL-2024-17, v2.3!") == ["see", "pol-2024-17", "pol", "2024", "17", "v2.3", "v2", "3"]
+
+
+def test_scores_follow_bm25():
+    hits = build().search("apple", k=10)
+
+    avg_length = 9 / 4
+    assert [idx for idx, _ in hits] == [1, 0]
+    assert hits[0][1] == pytest.approx(bm25(2, 3, 2, 4, avg_length), rel=1e-5)
+    assert hits[1][1] == pytest.approx(bm25(1, 2, 2, 4, avg_length), rel=1e-5)
+
+
+def test_terms_add_up_and_filters_restrict():
+    index = build()
+
+    assert index.search("cherry pie", k=1)[0][0] == 3
+    # Both terms are equally rare, so the shorter document wins
+    assert [idx for idx, _ in index.search("apple cherry", k=10, include=np.array([0, 3]))] == [0, 3]
+    assert [idx for idx, _ in index.search("banana", k=10, exclude=np.array([0]))] == [2]
+    assert index.search("durian", k=10) == []
+
+
+def test_removed_documents_stay_out_across_snapshots(tmp_path):
+    index = build()
+    index.remove(np.array([1]))
+    assert [idx for idx, _ in index.search("apple", k=10)] == [0]
+    assert len(index) == 3
+
+    state = index.capture()
+    index.add(np.array([4]), analyze(["apple tart"]))
+    index.fold(state, index.write(str(tmp_path / "segment"), state))
+
+    assert sorted(idx for idx, _ in index.search("apple", k=10)) == [0, 4]
+    # The segment holds the snapshot only; the later addition stays pending
+    loaded = LexicalIndex.load(str(tmp_path / "segment"))
+    assert [idx for idx, _ in loaded.search("apple", k=10)] == [0]
+    assert sorted(idx for idx, _ in loaded.search("banana", k=10)) == [0, 2]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    dense = [(1, 0.9), (2, 0.8), (3, 0.7)]
+    lexical = [(3, 12.0), (4, 9.0)]
+
+    fused = reciprocal_rank_fusion([dense, lexical], k=3, rrf_k=60)
+
+    # Only ranks count: second in either list scores the same
+    assert [idx for idx, _ in fused[:2]] == [3, 1]
+    assert fused[0][1] == pytest.approx(1 / 63 + 1 / 61)
+    assert fused[1][1] == pytest.approx(1 / 61)
+    assert fused[2][0] in (2, 4) and fused[2][1] == pytest.approx(1 / 62)
+
+
+def test_hybrid_retrieval_finds_exact_codes_and_meaning(stub, word_tokenizer, open_store):
+    texts = [
+        "laptops must use disk encryption",
+        "policy SEC-42 covers removable media",
+        "vacation requests need manager approval",
+    ]
+    store = open_store(dimension=STUB_DIMENSION, lexical_index=True)
+    store.add(
+        np.stack([stub_embedding(text, STUB_DIMENSION) for text in texts]),
+        texts,
+        [{"source": "a.pdf", "chunk_id": i} for i in range(3)],
+    )
+
+    def top(query: str, mode: str) -> str:
+        results, _ = run_async(retrieve(store, query, k=1, mode=mode))
+        return results[0][0]
+
+    assert top("SEC-42", "lexical") == texts[1]
+    assert top("SEC-42", "hybrid") == texts[1]
+    # The stub embeds identical text identically, so dense finds its twin
+    assert top(texts[2], "dense") == texts[2]
+    assert top(texts[2], "hybrid") == texts[2]
+
+    results, embedding = run_async(retrieve(store, "SEC-42", k=3, mode="hybrid"))
+    assert len(results) == 3 and embedding is not None
+    assert run_async(retrieve(store, "SEC-42", k=3, mode="lexical"))[1] is None
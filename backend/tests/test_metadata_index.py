@@ -0,0 +1,88 @@
+import pytest
+
+from app.services.metadata_index import FilterError, MetadataIndex
+from tests.conftest import vectors
+
+DEPARTMENTS = ["hr", "hr", "legal", "finance", "legal", None]
+
+
+@pytest.fixture
+def index() -> MetadataIndex:
+    index = MetadataIndex(("department",))
+    ids = list(range(len(DEPARTMENTS)))
+    index.add("source", ids, ["a.pdf", "a.pdf", "b.pdf", "b.pdf", "c.pdf", "c.pdf"])
+    index.add("department", ids, DEPARTMENTS)
+    return index
+
+
+def matching(index: MetadataIndex, filters: dict) -> set:
+    include, exclude = index.resolve(filters)
+    candidates = set(range(len(DEPARTMENTS))) if include is None else include
+    return candidates - exclude
+
+
+@pytest.mark.parametrize(
+    "filters, expected",
+    [
+        ({"department": "hr"}, {0, 1}),
+        ({"department": ["legal", "finance"]}, {2, 3, 4}),
+        ({"department": {"in": ["hr"]}}, {0, 1}),
+        ({"department": {"ne": "legal"}}, {0, 1, 3, 5}),
+        ({"department": {"not_in": ["hr", "legal"]}}, {3, 5}),
+        ({"department": "legal", "source": "c.pdf"}, {4}),
+        ({"department": {"ne": "hr"}, "source": {"not_in": ["b.pdf"]}}, {4, 5}),
+        ({"department": "marketing"}, set()),
+    ],
+)
+def test_resolves_every_operator(index, filters, expected):
+    assert matching(index, filters) == expected
+
+
+def test_removed_ids_no_longer_match(index):
+    index.remove("department", [0, 2], ["hr", "legal"])
+
+    assert matching(index, {"department": "hr"}) == {1}
+    assert index.ids("department", "legal") == {4}
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        ["source"],
+        {"author": "me"},
+        {"department": {"gt": "a"}},
+        {"department": {"eq": "hr", "ne": "legal"}},
+        {"department": {"in": "hr"}},
+        {"department": {"nested": 1}},
+        {"department": [["hr"]]},
+    ],
+)
+def test_rejects_malformed_filters(index, filters):
+    with pytest.raises(FilterError):
+        index.check(filters)
+
+
+def test_store_search_honours_filters_through_removal_and_reload(open_store):
+    store = open_store(filter_fields=("source", "department"))
+    for i, department in enumerate(["hr", "legal", "hr"]):
+        store.add(
+            vectors(2, seed=i),
+            [f"d{i}-0", f"d{i}-1"],
+            [{"source": f"d{i}.pdf", "chunk_id": c, "department": department} for c in range(2)],
+        )
+
+    def texts(filters) -> set:
+        return {text for text, _, _ in store.search(vectors(1)[0], k=10, filters=filters)}
+
+    assert texts({"department": "hr"}) == {"d0-0", "d0-1", "d2-0", "d2-1"}
+    assert texts({"department": {"ne": "hr"}}) == {"d1-0", "d1-1"}
+
+    store.remove("d0.pdf")
+    assert texts({"department": "hr"}) == {"d2-0", "d2-1"}
+    store.close()
+
+    store = open_store(filter_fields=("source", "department"))
+    assert texts({"department": "hr", "source": {"not_in": ["d2.pdf"]}}) == set()
+    assert texts({"department": ["hr", "legal"]}) == {"d1-0", "d1-1", "d2-0", "d2-1"}
+    with pytest.raises(FilterError):
+        store.check_filters({"author": "me"})
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from app.api.search import router
+from benchmarks.stub_openai import stub_embedding
+from tests.conftest import STUB_DIMENSION, api_client
+
+DOCUMENTS = {
+    "a.pdf": ["vacation policy allows twenty days", "expense reports are due monthly"],
+    "b.pdf": ["security incident escalation runbook", "policy code SEC-42 covers laptops"],
+}
+
+
+@pytest.fixture
+def client(stub, word_tokenizer, open_store, serve_store):
+    store = serve_store(open_store(
+        dimension=STUB_DIMENSION, filter_fields=("source", "department"), lexical_index=True
+    ))
+    for source, texts in DOCUMENTS.items():
+        store.add(
+            np.stack([stub_embedding(text, STUB_DIMENSION) for text in texts]),
+            texts,
+            [{"source": source, "chunk_id": i, "department": "hr"} for i in range(len(texts))],
+        )
+    with api_client(router) as client:
+        yield client
+
+
+def test_search_finds_the_chunk_of_the_query(client):
+    response = client.post("/search/", json={"query": DOCUMENTS["b.pdf"][0], "top_k": 2})
+
+    assert response.status_code == 200
+    results = response.json()
+    assert len(results) == 2
+    assert results[0]["text"] == DOCUMENTS["b.pdf"][0]
+    assert results[0]["score"] == pytest.approx(1.0, abs=1e-4)
+    assert results[0]["metadata"]["source"] == "b.pdf"
+
+
+def test_search_applies_filters_and_rejects_unknown_fields(client):
+    response = client.post(
+        "/search/", json={"query": DOCUMENTS["b.pdf"][0], "top_k": 4, "filters": {"source": "a.pdf"}}
+    )
+    assert {result["metadata"]["source"] for result in response.json()} == {"a.pdf"}
+
+    response = client.post("/search/", json={"query": "x", "filters": {"author": "me"}})
+    assert response.status_code == 400
+    assert response.json()["detail"]["error_code"] == "INVALID_FILTER"
+
+
+def test_lexical_search_matches_exact_terms(client):
+    response = client.post("/search/", json={"query": "SEC-42", "top_k": 1, "mode": "lexical"})
+
+    assert response.json()[0]["text"] == DOCUMENTS["b.pdf"][1]
+
+
+def test_batch_returns_results_per_query_in_order(client, stub):
+    queries = [DOCUMENTS["a.pdf"][1], DOCUMENTS["b.pdf"][1], DOCUMENTS["a.pdf"][0]]
+
+    response = client.post("/search/batch", json={"queries": queries, "top_k": 1})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["query"] for item in body] == queries
+    assert [item["results"][0]["text"] for item in body] == queries
+    # One embeddings request for the whole batch
+    assert stub.calls["embeddings"] == 1
+
+
+@pytest.mark.parametrize("queries, error_code", [
+    ([], "EMPTY_BATCH"),
+    (["fine", "  "], "EMPTY_QUERY"),
+])
+def test_batch_rejects_bad_input(client, queries, error_code):
+    response = client.post("/search/batch", json={"queries": queries})
+
+    assert response.status_code == 400
+    assert response.json()["detail"]["error_code"] == error_code
@@ -0,0 +1,133 @@
+from app.services.sharded_store import MAX_SHARDS, ShardedFaissStore, _SHARD_BITS, _merge
+from tests.conftest import DIMENSION, chunk_metadata, vectors
+
+
+def open_sharded(index_path: str, **options) -> ShardedFaissStore:
+    return ShardedFaissStore(dimension=DIMENSION, index_path=index_path, num_shards=4, **options)
+
+
+def test_is_empty_opens_shards_only_until_one_has_vectors(index_path):
+    store = open_sharded(index_path)
+    assert store.is_empty()
+    # Nothing on disk yet, so nothing had to be opened
+    assert store.index_stats()["shards_open"] == 0
+
+    store.add(vectors(1), ["a0"], chunk_metadata("a.pdf", 1))
+    store.close()
+
+    reopened = open_sharded(index_path)
+    assert not reopened.is_empty()
+    assert reopened.index_stats()["shards_open"] == 1
+    assert len(reopened) == 1
+    assert reopened.index_stats()["shards_open"] == 4
+
+    reopened.remove("a.pdf")
+    assert reopened.is_empty()
+    reopened.close()
+
+
+def sources(store: ShardedFaissStore) -> dict:
+    """{source: sorted chunk_ids} of every live chunk, over all shards."""
+    found = {}
+    for shard in store.shards():
+        for _, _, metadata in shard.iter_live():
+            for meta in metadata:
+                found.setdefault(meta["source"], []).append(meta["chunk_id"])
+    return {source: sorted(ids) for source, ids in found.items()}
+
+
+def shard_sources(store: ShardedFaissStore) -> list:
+    """Sources held by each shard, in shard order."""
+    return [
+        sorted({meta["source"] for _, _, metadata in shard.iter_live() for meta in metadata})
+        for shard in store.shards()
+    ]
+
+
+def test_merge_tags_ids_with_their_shard():
+    per_shard = [
+        [[(0, 0.9), (1, 0.2)]],
+        [[(0, 0.8)]],
+        [[(5, 0.95)]],
+    ]
+    merged = _merge(per_shard, k=3, largest=True)[0]
+    assert [(idx & (MAX_SHARDS - 1), idx >> _SHARD_BITS, score) for idx, score in merged] == [
+        (2, 5, 0.95), (0, 0, 0.9), (1, 0, 0.8)
+    ]
+
+    # L2 distances: smaller is closer
+    merged = _merge(per_shard, k=2, largest=False)[0]
+    assert [(idx & (MAX_SHARDS - 1), idx >> _SHARD_BITS) for idx, _ in merged] == [(0, 1), (1, 0)]
+
+
+def test_same_local_id_in_two_shards_decodes_to_each_chunk(index_path):
+    store = open_sharded(index_path, partition="time", shard_max_vectors=1)
+    store.add(vectors(1, seed=1), ["a0"], chunk_metadata("a.pdf", 1))
+    store.add(vectors(1, seed=2), ["b0"], chunk_metadata("b.pdf", 1))
+    assert len(store.shards()) == 2
+
+    query = vectors(1, seed=2)[0]
+    hits = store.dense_hits([query], k=2)[0]
+    # Both chunks are local id 0 of their shard
+    assert sorted(idx >> _SHARD_BITS for idx, _ in hits) == [0, 0]
+    assert [text for text, _, _ in store.decode([hits])[0]] == ["b0", "a0"]
+    store.close()
+
+
+def test_time_partition_starts_a_new_shard_when_full(index_path):
+    store = open_sharded(index_path, partition="time", shard_max_vectors=3)
+    store.add(vectors(3, seed=1), ["a0", "a1", "a2"], chunk_metadata("a.pdf", 3))
+    assert len(store.shards()) == 1
+
+    store.add(vectors(2, seed=2), ["b0", "b1"], chunk_metadata("b.pdf", 2))
+    assert [len(shard) for shard in store.shards()] == [3, 2]
+    assert shard_sources(store) == [["a.pdf"], ["b.pdf"]]
+    store.close()
+
+    reopened = open_sharded(index_path, partition="time", shard_max_vectors=3)
+    assert [len(shard) for shard in reopened.shards()] == [3, 2]
+    assert sources(reopened) == {"a.pdf": [0, 1, 2], "b.pdf": [0, 1]}
+    reopened.close()
+
+
+def test_replace_by_time_moves_the_document_to_the_newest_shard(index_path):
+    store = open_sharded(index_path, partition="time", shard_max_vectors=2)
+    store.add(vectors(2, seed=1), ["a0", "a1"], chunk_metadata("a.pdf", 2))
+    store.add(vectors(1, seed=2), ["b0"], chunk_metadata("b.pdf", 1))
+
+    removed = store.replace("a.pdf", vectors(1, seed=3), ["new0"], chunk_metadata("a.pdf", 1, 5))
+
+    assert removed == 2
+    assert shard_sources(store) == [[], ["a.pdf", "b.pdf"]]
+    assert sources(store) == {"a.pdf": [5], "b.pdf": [0]}
+    assert store.search(vectors(1, seed=1)[0], k=1)[0][0] != "a0"
+    store.close()
+
+
+def test_rebalance_keeps_every_live_chunk(index_path):
+    store = open_sharded(index_path, shard_max_vectors=10)
+    for i in range(10):
+        source = f"doc{i}.pdf"
+        store.add(vectors(3, seed=i), [f"{source}#{c}" for c in range(3)], chunk_metadata(source, 3))
+    store.remove("doc3.pdf")
+    store.update("doc5.pdf", [0], [], [])
+    expected = sources(store)
+
+    store.rebalance(num_shards=2)
+    assert len(store.shards()) == 2
+    assert sources(store) == expected
+
+    store.rebalance(partition="time")
+    assert store.partition == "time"
+    assert [len(shard) for shard in store.shards()] == [10, 10, 6]
+    assert sources(store) == expected
+    store.close()
+
+    reopened = open_sharded(index_path, partition="time", shard_max_vectors=10)
+    assert len(reopened) == 26
+    assert sources(reopened) == expected
+    for shard in reopened.shards():
+        for _, texts, metadata in shard.iter_live():
+            for text, meta in zip(texts, metadata):
+                assert text == f"{meta['source']}#{meta['chunk_id']}"
+    reopened.close()
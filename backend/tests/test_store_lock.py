@@ -0,0 +1,96 @@
+import pytest
+
+from app.core.concurrency import ReadOnlyStoreError, StoreLockedError
+from tests.conftest import chunk_metadata, vectors
+
+
+def test_second_writer_is_refused_until_the_first_closes(open_store):
+    writer = open_store()
+    # flock is per open file, so a second open in this process conflicts too
+    with pytest.raises(StoreLockedError):
+        open_store()
+
+    writer.close()
+    open_store().add(vectors(1), ["a0"], chunk_metadata("a.pdf", 1))
+
+
+def test_read_only_store_refuses_writes(open_store):
+    open_store()
+    reader = open_store(read_only=True)
+    with pytest.raises(ReadOnlyStoreError):
+        reader.add(vectors(1), ["a0"], chunk_metadata("a.pdf", 1))
+    with pytest.raises(ReadOnlyStoreError):
+        reader.compact()
+
+
+def test_reader_follows_appends_removals_and_compactions(open_store):
+    writer = open_store(lexical_index=True)
+    writer.add(vectors(2, seed=1), ["alpha a", "alpha b"], chunk_metadata("a.pdf", 2))
+    reader = open_store(read_only=True, lexical_index=True)
+    assert len(reader) == 2
+
+    writer.add(vectors(1, seed=2), ["beta"], chunk_metadata("b.pdf", 1))
+    assert reader.refresh() == {"b.pdf"}
+    assert reader.search(vectors(1, seed=2)[0], k=1)[0][0] == "beta"
+
+    writer.remove("a.pdf")
+    assert reader.refresh() == {"a.pdf"}
+    assert len(reader) == 1
+    assert reader.refresh() == set()
+
+    # Everything was already followed, so the new generation changes nothing
+    writer.compact()
+    assert reader.refresh() == set()
+    assert reader.generation == writer.generation
+
+    # Records folded into a generation before the reader saw them
+    writer.add(vectors(1, seed=3), ["gamma"], chunk_metadata("c.pdf", 1))
+    writer.compact()
+    assert reader.refresh() is None
+    assert len(reader) == 2
+    assert reader.lexical_hits(["gamma"], k=1)[0]
+
+
+def test_follower_takes_over_even_when_it_cannot_follow(monkeypatch):
+    from app.core import dependencies
+
+    class BrokenFollower:
+        def refresh(self):
+            raise OSError("log rotated under the reader")
+
+    class Cache:
+        cleared = 0
+
+        def clear(self):
+            self.cleared += 1
+
+    writer, cache = object(), Cache()
+    monkeypatch.setattr(dependencies, "FAISS_FOLLOW_INTERVAL_SECONDS", 0)
+    monkeypatch.setattr(dependencies, "_faiss_store", BrokenFollower())
+    monkeypatch.setattr(dependencies, "get_answer_cache", lambda: cache)
+    monkeypatch.setattr(dependencies, "open_faiss_store", lambda: writer)
+
+    dependencies._follow_writer()
+
+    assert dependencies._faiss_store is writer
+    assert cache.cleared == 1
+
+
+def test_read_only_worker_answers_404_for_an_unknown_document(open_store, monkeypatch, tmp_path):
+    from fastapi import HTTPException
+
+    from app.api import documents
+
+    writer = open_store()
+    writer.add(vectors(1), ["a0"], chunk_metadata("a.pdf", 1))
+    reader = open_store(read_only=True)
+    monkeypatch.setattr(documents, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(documents, "get_faiss_store", lambda: reader)
+
+    with pytest.raises(HTTPException) as missing:
+        documents.delete_document("missing.pdf")
+    assert missing.value.status_code == 404
+
+    # A document that exists needs the writer
+    with pytest.raises(ReadOnlyStoreError):
+        documents.delete_document("a.pdf")
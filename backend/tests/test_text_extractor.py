@@ -0,0 +1,35 @@
+import pytest
+
+from app.utils.text_extractor import BACKENDS, extract_pages, extract_text_from_pdf, iter_pdf_pages
+from benchmarks.synthetic_pdf import synthetic_pages, write_pdf
+
+
+@pytest.fixture(scope="module")
+def pdf_path(tmp_path_factory) -> str:
+    path = str(tmp_path_factory.mktemp("pdf") / "handbook.pdf")
+    write_pdf(path, synthetic_pages(5))
+    return path
+
+
+def test_extract_text_concatenates_pages_as_before(pdf_path):
+    import pdfplumber
+
+    # What extract_text_from_pdf returned before extraction went page-parallel
+    with pdfplumber.open(pdf_path) as pdf:
+        expected = "".join(page.extract_text() or "" for page in pdf.pages).strip()
+
+    assert extract_text_from_pdf(pdf_path, "pdfplumber") == expected
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_pages_come_in_order_from_the_pool(pdf_path, backend):
+    pages = list(iter_pdf_pages(pdf_path, backend, pages_per_task=2))
+
+    assert [number for number, _ in pages] == [1, 2, 3, 4, 5]
+    assert pages == extract_pages(pdf_path, backend)
+    assert pages[2][1].lstrip().startswith("Section 3")
+
+
+def test_unknown_backend_is_rejected(pdf_path):
+    with pytest.raises(ValueError):
+        extract_text_from_pdf(pdf_path, "ocr")
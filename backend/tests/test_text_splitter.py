@@ -0,0 +1,72 @@
+import pytest
+
+from app.utils.text_splitter import split_pages
+
+
+def sentence(i: int, words: int = 5) -> str:
+    return " ".join([f"s{i}"] + ["word"] * (words - 2) + ["end."])
+
+
+def chunks(pages, **options) -> list:
+    return list(split_pages(pages, **options))
+
+
+def test_chunks_respect_the_token_budget_and_keep_pages(word_tokenizer):
+    pages = [(1, " ".join(sentence(i) for i in range(10))), (2, sentence(10) + "\n\n" + sentence(11))]
+
+    result = chunks(pages, max_tokens=20, overlap_tokens=0)
+
+    assert all(chunk["token_count"] <= 20 for chunk in result)
+    # Every sentence lands in exactly one chunk, in order
+    text = " ".join(chunk["text"] for chunk in result)
+    assert [word for word in text.split() if word.startswith("s")] == [f"s{i}" for i in range(12)]
+    assert result[0]["page_start"] == 1 and result[-1]["page_end"] == 2
+    assert [chunk["page_start"] <= chunk["page_end"] for chunk in result] == [True] * len(result)
+
+
+def test_paragraphs_are_not_split_when_they_fit(word_tokenizer):
+    paragraphs = [" ".join(sentence(p * 10 + i) for i in range(3)) for p in range(3)]
+
+    result = chunks([(1, "\n\n".join(paragraphs))], max_tokens=16, overlap_tokens=0)
+
+    assert [chunk["text"] for chunk in result] == paragraphs
+
+
+def test_overlap_repeats_trailing_sentences(word_tokenizer):
+    sentences = [sentence(i) for i in range(8)]
+
+    result = chunks([(1, " ".join(sentences))], max_tokens=12, overlap_tokens=6)
+
+    held = [[s for s in sentences if s in chunk["text"]] for chunk in result]
+    assert len(held) > 2
+    for previous, current in zip(held, held[1:]):
+        assert current[0] == previous[-1]
+
+
+def test_piece_without_boundaries_is_cut_into_token_windows(word_tokenizer):
+    text = " ".join(f"w{i}" for i in range(25))
+
+    result = chunks([(3, text)], max_tokens=10, overlap_tokens=0)
+
+    assert [chunk["token_count"] for chunk in result] == [10, 10, 5]
+    assert " ".join(chunk["text"] for chunk in result) == text
+    assert {chunk["page_start"] for chunk in result} == {3}
+
+
+def test_chunks_are_yielded_before_the_pages_run_out(word_tokenizer):
+    pulled = []
+
+    def pages():
+        for number in range(1, 100):
+            pulled.append(number)
+            yield number, sentence(number, words=10)
+
+    first = next(split_pages(pages(), max_tokens=20, overlap_tokens=0))
+
+    assert first["page_start"] == 1
+    assert len(pulled) < 5
+
+
+def test_rejects_overlap_not_below_the_budget(word_tokenizer):
+    with pytest.raises(ValueError):
+        chunks([(1, "text")], max_tokens=10, overlap_tokens=10)